@@ -0,0 +1,42 @@
+"""Снимок базы данных без остановки API.
+
+    python backup.py                       # в каталог BEASTIARY_BACKUP_DIR
+    python backup.py --dir backups --keep 3
+    python backup.py --output copy.db      # в указанный файл
+
+Копирование идёт через онлайн-API резервного копирования SQLite шагами по
+--pages страниц: запущенный API продолжает читать и писать, а снимок
+получается согласованным.
+"""
+
+import argparse
+import json
+import config
+from database import engine
+from services.backup import backup_file, write_backup
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бестиарий Лавкрафта: снимок базы данных")
+    parser.add_argument(
+        "--source", default=engine.url.database, help="Файл базы данных"
+    )
+    parser.add_argument("--output", help="Записать снимок в этот файл")
+    parser.add_argument("--dir", default=config.BACKUP_DIR, help="Каталог снимков")
+    parser.add_argument(
+        "--keep", type=int, default=config.BACKUP_KEEP, help="Сколько снимков хранить"
+    )
+    parser.add_argument(
+        "--pages", type=int, default=config.BACKUP_PAGES, help="Страниц за шаг"
+    )
+    args = parser.parse_args()
+
+    if args.output:
+        info = backup_file(args.source, args.output, pages=args.pages)
+    else:
+        info = write_backup(args.source, args.dir, args.keep, pages=args.pages)
+    print(json.dumps(info, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import os
+
+# Настройки приложения из переменных окружения (значения по умолчанию - для разработки)
+
+# Каталог для файлов фоновых задач экспорта
+EXPORT_DIR = os.getenv("BEASTIARY_EXPORT_DIR", "exports")
+# Сколько завершённых задач экспорта (и их файлов) хранить
+EXPORT_JOBS_KEEP = int(os.getenv("BEASTIARY_EXPORT_JOBS_KEEP", "20"))
+# Как часто (в секундах) выполняющаяся задача экспорта отмечается в своём файле
+# состояния; задача без отметки втрое дольше считается брошенной
+EXPORT_JOB_HEARTBEAT = float(os.getenv("BEASTIARY_EXPORT_JOB_HEARTBEAT", "10"))
+
+# Режим обслуживания: "database" - все запросы к SQLite, "memory" - GET-запросы
+# из колоночного хранилища в памяти
+SERVING_MODE = os.getenv("BEASTIARY_SERVING_MODE", "database")
+# Готовый снимок BSTC для режима "memory" (по умолчанию снимок строится из БД)
+SNAPSHOT_PATH = os.getenv("BEASTIARY_SNAPSHOT_PATH") or None
+# Как часто (в секундах) проверять, изменился ли файл базы данных или снимка
+RELOAD_INTERVAL = float(os.getenv("BEASTIARY_RELOAD_INTERVAL", "2"))
+# Запрет записи (по умолчанию включён в режиме "memory")
+READ_ONLY = os.getenv(
+    "BEASTIARY_READ_ONLY", "1" if SERVING_MODE == "memory" else "0"
+) == "1"
+
+# Число процессов-воркеров (задаёт serve.py); при > 1 включается отслеживание
+# записи других процессов
+WORKERS = int(os.getenv("BEASTIARY_WORKERS", "1"))
+# Как часто (в секундах) проверять PRAGMA data_version в многопроцессном режиме
+COHERENCE_INTERVAL = float(os.getenv("BEASTIARY_COHERENCE_INTERVAL", "0.5"))
+
+
+def _limits(name: str, default: str) -> dict:
+    """Лимиты класса маршрутов из BEASTIARY_ADMISSION_<NAME>.
+
+    Формат: "concurrency=4,queue=16,rate=2,burst=10,timeout=30"; rate=0
+    отключает ограничение частоты.
+    """
+    limits = dict(pair.split("=") for pair in default.split(","))
+    value = os.getenv(f"BEASTIARY_ADMISSION_{name.upper()}", "")
+    limits.update(pair.split("=") for pair in value.split(",") if pair)
+    return {
+        "concurrency": int(limits["concurrency"]),
+        "queue": int(limits["queue"]),
+        "rate": float(limits["rate"]),
+        "burst": float(limits["burst"]),
+        "timeout": float(limits["timeout"]),
+    }
+
+
+# Лимиты допуска запросов: быстрые поиски по ключу и тяжёлые просмотры таблицы
+ADMISSION_LIMITS = {
+    "cheap": _limits("cheap", "concurrency=64,queue=256,rate=100,burst=200,timeout=10"),
+    "heavy": _limits("heavy", "concurrency=4,queue=16,rate=2,burst=10,timeout=30"),
+}
+
+# Строить кэши в памяти (индекс имён, колонки статистики) в фоне сразу после запуска
+PREWARM = os.getenv("BEASTIARY_PREWARM", "1") == "1"
+
+# Проверка адресов медиа существ (изображение, аудио, видео) в фоне. Выключена
+# по умолчанию: сервер сам ходит по адресам, которые задают клиенты /add и /update
+MEDIA_PREFETCH = os.getenv("BEASTIARY_MEDIA_PREFETCH", "0") == "1"
+# Разрешить проверку адресов в частных сетях, loopback и link-local (только
+# для закрытых установок: иначе это запросы к внутренним сервисам от имени сервера)
+MEDIA_ALLOW_PRIVATE = os.getenv("BEASTIARY_MEDIA_ALLOW_PRIVATE", "0") == "1"
+# Каталог кэша результатов проверки и миниатюр
+MEDIA_CACHE_DIR = os.getenv("BEASTIARY_MEDIA_CACHE_DIR", "media_cache")
+# Сколько адресов проверяется одновременно (и размер пула соединений)
+MEDIA_CONCURRENCY = int(os.getenv("BEASTIARY_MEDIA_CONCURRENCY", "8"))
+# Срок жизни удачной проверки и проверки с ошибкой (в секундах)
+MEDIA_TTL = float(os.getenv("BEASTIARY_MEDIA_TTL", "86400"))
+MEDIA_ERROR_TTL = float(os.getenv("BEASTIARY_MEDIA_ERROR_TTL", "600"))
+# Таймаут одного запроса (в секундах)
+MEDIA_TIMEOUT = float(os.getenv("BEASTIARY_MEDIA_TIMEOUT", "10"))
+# Сторона миниатюры в пикселях (0 - не строить; нужен Pillow)
+MEDIA_THUMBNAIL_SIZE = int(os.getenv("BEASTIARY_MEDIA_THUMBNAIL_SIZE", "128"))
+# Изображения больше этого размера проверяются только по заголовку, без миниатюры
+MEDIA_MAX_IMAGE_BYTES = int(os.getenv("BEASTIARY_MEDIA_MAX_IMAGE_BYTES", str(5 * 1024 * 1024)))
+
+# Проверять ответы моделями response_model (режим отладки). По умолчанию
+# ответы из строк базы данных сериализуются напрямую
+VALIDATE_RESPONSES = os.getenv("BEASTIARY_VALIDATE_RESPONSES", "0") == "1"
+
+# Наибольший ответ (в байтах), который собирается в памяти для раздачи
+# одинаковым одновременным запросам; ответы больше выполняются каждым запросом
+COALESCE_MAX_BYTES = int(os.getenv("BEASTIARY_COALESCE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+# Где кодируются большие ответы (CSV и JSON экспорта): 'thread', 'process'
+# или 'inline' (в цикле событий), и сколько в пуле потоков или процессов
+OFFLOAD_MODE = os.getenv("BEASTIARY_OFFLOAD", "thread")
+OFFLOAD_WORKERS = int(os.getenv("BEASTIARY_OFFLOAD_WORKERS", "2"))
+
+# Каталог снимков базы данных (POST /beastiary/backup, backup.py) и сколько
+# последних снимков в нём хранить
+BACKUP_DIR = os.getenv("BEASTIARY_BACKUP_DIR", "backups")
+BACKUP_KEEP = int(os.getenv("BEASTIARY_BACKUP_KEEP", "7"))
+# Снимок копируется шагами по столько страниц с паузой между шагами (в
+# секундах), чтобы писатели не ждали окончания всего копирования
+BACKUP_PAGES = int(os.getenv("BEASTIARY_BACKUP_PAGES", "256"))
+BACKUP_STEP_SLEEP = float(os.getenv("BEASTIARY_BACKUP_STEP_SLEEP", "0.005"))
+# Сколько раз запись в базу может перезапустить пошаговое копирование, прежде
+# чем снимок будет скопирован за один шаг
+BACKUP_MAX_RESTARTS = int(os.getenv("BEASTIARY_BACKUP_MAX_RESTARTS", "10"))
+
+# Замер задержки цикла событий: период замеров и число последних замеров
+# для процентилей (в секундах и штуках). Если цикл заблокирован дольше
+# порога, в лог пишется стек блокирующего кода
+LOOP_LAG_INTERVAL = float(os.getenv("BEASTIARY_LOOP_LAG_INTERVAL", "0.1"))
+LOOP_LAG_THRESHOLD = float(os.getenv("BEASTIARY_LOOP_LAG_THRESHOLD", "0.25"))
+LOOP_LAG_WINDOW = int(os.getenv("BEASTIARY_LOOP_LAG_WINDOW", "600"))
+
+# Наибольшее число подзапросов в одном POST /beastiary/batch
+BATCH_MAX_ITEMS = int(os.getenv("BEASTIARY_BATCH_MAX_ITEMS", "20"))
+
+# Отдельные бестиарии (заголовок X-Bestiary-Tenant или путь /tenants/{имя}/...):
+# каталог файлов SQLite, сколько движков держать открытыми, общий лимит
+# одновременных сессий, размер пула каждого движка и можно ли создавать
+# новый бестиарий при первом обращении
+TENANTS_DIR = os.getenv("BEASTIARY_TENANTS_DIR", "tenants")
+TENANT_MAX_ENGINES = int(os.getenv("BEASTIARY_TENANT_MAX_ENGINES", "32"))
+TENANT_MAX_CONNECTIONS = int(os.getenv("BEASTIARY_TENANT_MAX_CONNECTIONS", "64"))
+TENANT_POOL_SIZE = int(os.getenv("BEASTIARY_TENANT_POOL_SIZE", "1"))
+TENANT_POOL_OVERFLOW = int(os.getenv("BEASTIARY_TENANT_POOL_OVERFLOW", "4"))
+TENANT_CREATE = os.getenv("BEASTIARY_TENANT_CREATE", "0") == "1"
+
+# Счётчики просмотров (/info) для /beastiary/top: копятся в памяти и раз в
+# FLUSH_INTERVAL секунд записываются в базу пачкой, по строке на существо и
+# интервал BUCKET секунд; интервалы старше RETENTION_DAYS дней удаляются
+POPULARITY = os.getenv("BEASTIARY_POPULARITY", "1") == "1"
+POPULARITY_FLUSH_INTERVAL = float(os.getenv("BEASTIARY_POPULARITY_FLUSH_INTERVAL", "5"))
+POPULARITY_BUCKET = int(os.getenv("BEASTIARY_POPULARITY_BUCKET", "3600"))
+POPULARITY_RETENTION_DAYS = float(os.getenv("BEASTIARY_POPULARITY_RETENTION_DAYS", "90"))
+
+# Групповой коммит добавления и обновления существ: записи, пришедшие за
+# WINDOW секунд (но не больше MAX_BATCH), выполняются одной транзакцией
+GROUP_COMMIT = os.getenv("BEASTIARY_GROUP_COMMIT", "0") == "1"
+GROUP_COMMIT_WINDOW = float(os.getenv("BEASTIARY_GROUP_COMMIT_WINDOW", "0.002"))
+GROUP_COMMIT_MAX_BATCH = int(os.getenv("BEASTIARY_GROUP_COMMIT_MAX_BATCH", "64"))
+
+# Сколько дней хранить надгробия удалённых существ для /beastiary/changes
+# (0 - бессрочно). Зеркало, отставшее сильнее, получит 410 и выполнит полную
+# синхронизацию
+CHANGES_TOMBSTONE_RETENTION_DAYS = float(
+    os.getenv("BEASTIARY_CHANGES_TOMBSTONE_RETENTION_DAYS", "30")
+)
@@ -1,5 +1,8 @@
+from sqlalchemy import Engine, event
 from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from fastapi import HTTPException, Request
+from services.tenants import TENANT_HEADER, InvalidTenant, UnknownTenant, tenant_engines
 
 # Путь к базе данных SQLite с асинхронным драйвером
 DATABASE_URL = "sqlite+aiosqlite:///beastiary.db"
@@ -8,12 +11,44 @@ DATABASE_URL = "sqlite+aiosqlite:///beastiary.db"
 engine = create_async_engine(DATABASE_URL, echo=True)  # echo=True для отладки, можно убрать
 
 
+# SQL-функция casefold(text): сравнение имён без учёта регистра по правилам
+# Python (str.casefold), как в режиме памяти. Встроенные lower и LIKE SQLite
+# переводят в нижний регистр только ASCII, и 'шуб' не нашёл бы 'Шуб-Ниггурат'.
+# Регистрируется на каждом соединении любого движка (основного, бестиариев, тестов)
+@event.listens_for(Engine, "connect")
+def _register_sql_functions(dbapi_connection, connection_record):
+    dbapi_connection.create_function(
+        "casefold",
+        1,
+        lambda text: text.casefold() if isinstance(text, str) else text,
+        deterministic=True,
+    )
+
+
 # Создаём базовый класс для моделей (в 2.x используется DeclarativeBase вместо declarative_base())
 class Base(DeclarativeBase):
     pass
 
 
-# Асинхронная зависимость для получения сессии
-async def get_db():
-    async with AsyncSession(engine, expire_on_commit=False) as db:
-        yield db
+# Асинхронная зависимость для получения сессии. С заголовком
+# X-Bestiary-Tenant (или путём /tenants/{имя}/...) сессия открывается
+# в файле этого бестиария (services/tenants.py), без него - в основной базе
+async def get_db(request: Request):
+    name = request.headers.get(TENANT_HEADER)
+    if not name:
+        async with AsyncSession(engine, expire_on_commit=False) as db:
+            yield db
+        return
+
+    try:
+        tenant = await tenant_engines.acquire(name)
+    except InvalidTenant:
+        raise HTTPException(status_code=400, detail="Некорректное имя бестиария")
+    except UnknownTenant:
+        raise HTTPException(status_code=404, detail=f"Бестиарий '{name}' не найден")
+    try:
+        async with tenant_engines.slot():
+            async with AsyncSession(tenant.engine, expire_on_commit=False) as db:
+                yield db
+    finally:
+        tenant_engines.release(tenant)
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import json
 import sys
@@ -6,8 +7,22 @@ from fastapi import FastAPI
 from fastapi.responses import JSONResponse
 from starlette.requests import Request
 from starlette.middleware.base import BaseHTTPMiddleware
-from database import Base, engine
-from routers import beastiary
+import config
+from database import engine
+from routers import beastiary, beastiary_memory
+from services.admission import AdmissionMiddleware
+from services.coherence import DataVersionWatcher
+from services.export_jobs import export_jobs
+from services.group_commit import group_commit
+from services.loop_monitor import loop_monitor
+from services.media import media_prefetcher
+from services.memory_store import memory_serving
+from services.offload import offload
+from services.popularity import view_counters
+from services.schema import ensure_schema
+from services.single_flight import SingleFlightMiddleware
+from services.startup import cache_state, pool_stats, prewarm, readiness, warm_pool
+from services.tenants import TenantPathMiddleware, tenant_engines
 
 # Принудительно устанавливаем кодировку консоли на UTF-8 (для Windows)
 if sys.platform == "win32":
@@ -48,15 +63,60 @@ class PrettyJSONMiddleware(BaseHTTPMiddleware):
         return response
 
 
+async def _prewarm_then_ready():
+    try:
+        await prewarm(engine, readiness)
+    except Exception as e:
+        # Кэши построятся лениво при первых запросах
+        logger.error(f"Ошибка прогрева кэшей: {e}")
+    readiness.mark_ready()
+
+
 # Асинхронный обработчик жизненного цикла
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    logger.info("Создание таблиц в базе данных...")
     # Код перед запуском приложения (startup)
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    logger.info("Таблицы созданы, приложение запущено!")
+    readiness.begin()
+    loop_monitor.start()
+    outcome = await readiness.step("schema", ensure_schema(engine))
+    logger.info(f"Схема базы данных: {outcome}")
+    connections = await readiness.step("pool", warm_pool(engine))
+    logger.info(f"Пул соединений прогрет: {connections}")
+    if config.SERVING_MODE == "memory":
+        await readiness.step(
+            "memory_store",
+            memory_serving.start(engine, beastiary.serialize_creature),
+        )
+    watcher = None
+    if config.WORKERS > 1:
+        # Другие воркеры пишут в те же файлы: кэши этого процесса надо сбрасывать
+        watcher = DataVersionWatcher(engine, tenants=tenant_engines)
+        await watcher.start()
+    recovered = await asyncio.to_thread(export_jobs.recover)
+    if recovered:
+        logger.info(f"Брошенных задач экспорта помечено ошибкой: {recovered}")
+    if config.MEDIA_PREFETCH:
+        await media_prefetcher.start(engine)
+    if config.POPULARITY and not config.READ_ONLY:
+        view_counters.start()
+    if config.PREWARM:
+        # Запросы принимаются сразу, а /ready ответит 200 после прогрева
+        readiness.task = asyncio.create_task(_prewarm_then_ready())
+    else:
+        readiness.mark_ready()
+    logger.info("Приложение запущено!")
     yield  # Здесь приложение работает
+    if readiness.task is not None:
+        readiness.task.cancel()
+    if watcher is not None:
+        await watcher.stop()
+    await media_prefetcher.stop()
+    await group_commit.stop()
+    await view_counters.stop()
+    await memory_serving.stop()
+    offload.shutdown()
+    await loop_monitor.stop()
+    await tenant_engines.close()
 
 
 app = FastAPI(
@@ -66,9 +126,41 @@ app = FastAPI(
     version="1.0.0"
 )
 app.add_middleware(PrettyJSONMiddleware)
+# Чем позже добавлен middleware, тем он внешнее: отклонённые запросы не доходят
+# до приложения, а одинаковые одновременные запросы проходят допуск один раз
+app.add_middleware(AdmissionMiddleware)
+app.add_middleware(SingleFlightMiddleware)
+# Путь /tenants/{имя}/... переписывается до всех остальных middleware
+app.add_middleware(TenantPathMiddleware)
+if config.SERVING_MODE == "memory":
+    # Маршруты чтения из памяти подключаются первыми и перекрывают маршруты базы
+    app.include_router(beastiary_memory.router, prefix="/beastiary")
 app.include_router(beastiary.router, prefix="/beastiary", tags=["Beastiary"])
 
 
+@app.get("/health", tags=["Service"])
+async def health():
+    """Живость процесса: отвечает, пока цикл событий обслуживает запросы."""
+    return {"Статус": "ok", "Задержка_цикла": loop_monitor.stats()}
+
+
+@app.get("/ready", tags=["Service"])
+def ready():
+    """Готовность к трафику: 200 после прогрева пула и кэшей, иначе 503.
+
+    Кроме этапов запуска отдаёт занятость пула соединений, состояние кэшей
+    в памяти и задержку цикла событий.
+    """
+    content = readiness.as_dict()
+    content["Пул"] = pool_stats(engine)
+    content["Кэши"] = cache_state(engine)
+    content["Задержка_цикла"] = loop_monitor.stats()
+    content["Бестиарии"] = tenant_engines.stats()
+    return JSONResponse(
+        content=content, status_code=200 if readiness.ready else 503
+    )
+
+
 @app.get("/")
 def root():
     logger.info("Запрос на главную страницу.")
@@ -1,5 +1,5 @@
 from typing import Optional
-from sqlalchemy import Column, Integer, String, Text
+from sqlalchemy import Column, Integer, String, Text, event, text
 from pydantic import BaseModel, Field, ConfigDict ,conlist
 from database import Base
 
@@ -22,6 +22,105 @@ class CreatureDB(Base):
     relations = Column(Text, nullable=True)
     audio_url = Column(String(350), nullable=True)
     video_url = Column(String(350), nullable=True)
+    # Номер последнего изменения строки; выставляется триггером (см. ниже)
+    change_seq = Column(Integer, nullable=True, index=True)
+
+
+class CreatureViewsDB(Base):
+    """Просмотры существа за один интервал времени (services/popularity.py)."""
+
+    __tablename__ = "creature_views"
+
+    name = Column(String(50), primary_key=True)
+    # Начало интервала (секунды Unix, кратно BEASTIARY_POPULARITY_BUCKET)
+    bucket = Column(Integer, primary_key=True, index=True)
+    views = Column(Integer, nullable=False, default=0)
+
+
+class CreatureTombstoneDB(Base):
+    """Надгробие удалённого существа для синхронизации (/beastiary/changes)."""
+
+    __tablename__ = "creature_tombstones"
+
+    name = Column(String(50), primary_key=True)
+    change_seq = Column(Integer, nullable=False, index=True)
+    # Время удаления (секунды Unix)
+    deleted_at = Column(Integer, nullable=False)
+
+
+class ChangeSequenceDB(Base):
+    """Счётчик номеров изменений: одна строка id=1 с последним выданным номером."""
+
+    __tablename__ = "change_sequence"
+
+    id = Column(Integer, primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+    # Наибольший номер среди удалённых по сроку хранения надгробий: синхронизация
+    # с меньшего номера могла бы пропустить удаления
+    pruned_through = Column(Integer, nullable=False, default=0, server_default="0")
+
+
+def _change_triggers() -> list:
+    """Триггеры, которые нумеруют изменения существ.
+
+    Номер выдаёт сама база, поэтому его получает любая запись в creatures:
+    из любого маршрута, процесса serve.py или стороннего скрипта. Вставка
+    и изменение данных выставляют строке change_seq следующего номера,
+    удаление (и переименование) оставляет надгробие с номером.
+    """
+    next_seq = "UPDATE change_sequence SET value = value + 1 WHERE id = 1;"
+    seq = "(SELECT value FROM change_sequence WHERE id = 1)"
+    tombstone = (
+        "INSERT OR REPLACE INTO creature_tombstones (name, change_seq, deleted_at) "
+        f"SELECT OLD.name, {seq}, CAST(strftime('%s', 'now') AS INTEGER)"
+    )
+    # Изменение самого change_seq триггер не запускает - иначе он вызывал бы сам себя
+    data_columns = ", ".join(
+        column.name
+        for column in CreatureDB.__table__.columns
+        if column.name not in ("id", "change_seq")
+    )
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS creatures_change_insert
+        AFTER INSERT ON creatures BEGIN
+            {next_seq}
+            UPDATE creatures SET change_seq = {seq} WHERE id = NEW.id;
+            DELETE FROM creature_tombstones WHERE name = NEW.name;
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS creatures_change_update
+        AFTER UPDATE OF {data_columns} ON creatures BEGIN
+            {next_seq}
+            {tombstone} WHERE OLD.name != NEW.name;
+            UPDATE creatures SET change_seq = {seq} WHERE id = NEW.id;
+            DELETE FROM creature_tombstones WHERE name = NEW.name;
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS creatures_change_delete
+        AFTER DELETE ON creatures BEGIN
+            {next_seq}
+            {tombstone};
+        END""",
+    ]
+
+
+def install_change_tracking(conn):
+    """Создаёт строку счётчика и триггеры номеров изменений (идемпотентно).
+
+    Счётчик начинается с наибольшего номера среди строк, чтобы номера
+    существующих строк (после миграции) не повторились.
+    """
+    conn.execute(
+        text(
+            "INSERT OR IGNORE INTO change_sequence (id, value) "
+            "SELECT 1, coalesce(max(change_seq), 0) FROM creatures"
+        )
+    )
+    for trigger in _change_triggers():
+        conn.execute(text(trigger))
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _install_after_create(target, connection, **kw):
+    install_change_tracking(connection)
 
 
 class Creature(BaseModel):
@@ -68,4 +167,13 @@ class CreatureUpdate(BaseModel):
 #     Среда_обитания: str
 #     Цитата: str
 #     Категория: str
-#     Способности: str
\ No newline at end of file
+#     Способности: str
+
+
+class BatchItem(BaseModel):
+    id: Optional[str] = Field(None, max_length=50, description="Метка подзапроса (возвращается в ответе)")
+    path: str = Field(..., max_length=500, description="GET-маршрут чтения с параметрами, например /beastiary/dangerous?min=90")
+
+
+class BatchRequest(BaseModel):
+    requests: conlist(BatchItem, min_length=1) = Field(..., description="Подзапросы")  # type: ignore
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel, HttpUrl, ConfigDict
 
 
@@ -49,8 +49,47 @@ class ListBestiaryResponse(BaseModel):
     Смещение: int
 
 
+class MediaInfo(BaseModel):
+    Url: str
+    Доступен: Optional[bool] = None
+    Код_ответа: Optional[int] = None
+    Тип: Optional[str] = None
+    Размер: Optional[int] = None
+    Ширина: Optional[int] = None
+    Высота: Optional[int] = None
+    Миниатюра: Optional[str] = None
+    Проверено: Optional[float] = None
+    Ошибка: Optional[str] = None
+
+
+class CreatureMedia(BaseModel):
+    Изображение: Optional[MediaInfo] = None
+    Аудио: Optional[MediaInfo] = None
+    Видео: Optional[MediaInfo] = None
+
+
+class CreatureInfoResponse(CreatureResponse):
+    Медиа: Optional[CreatureMedia] = None
+
+
+class FacetCount(BaseModel):
+    Имя: str
+    Количество: int
+
+
+class SearchFacets(BaseModel):
+    Категории: List[FacetCount]
+    Статусы: List[FacetCount]
+    Уровни_опасности: List[FacetCount]
+
+
 class SearchCreaturesResponse(BaseModel):
     Существа: List[CreatureResponse]
+    Фасеты: Optional[SearchFacets] = None
+
+
+class SuggestResponse(BaseModel):
+    Подсказки: List[str]
 
 
 class CreaturesByCategoryResponse(BaseModel):
@@ -86,6 +125,75 @@ class StatsResponse(BaseModel):
     Самое_опасное: Optional[DangerStat]
 
 
+class HistogramBucket(BaseModel):
+    Диапазон: str
+    Количество: int
+
+
+class ColumnDistribution(BaseModel):
+    Минимум: Optional[int]
+    Максимум: Optional[int]
+    Среднее: float
+    Процентили: Dict[str, int]
+    Гистограмма: List[HistogramBucket]
+
+
+class CategoryDistribution(BaseModel):
+    Имя: str
+    Количество: int
+    Уровень_опасности: ColumnDistribution
+    Минимальное_безумие: ColumnDistribution
+
+
+class DistributionResponse(BaseModel):
+    Всего: int
+    Уровень_опасности: ColumnDistribution
+    Минимальное_безумие: ColumnDistribution
+    По_категориям: List[CategoryDistribution]
+
+
+class ExportJobResponse(BaseModel):
+    Id: str
+    Статус: str
+    Формат: str
+    Сжатие: bool
+    Версия_данных: int
+    Записано: int
+    Всего: Optional[int]
+    Размер: Optional[int]
+    Ошибка: Optional[str]
+
+
+class BackupResponse(BaseModel):
+    Файл: str
+    Размер: int
+    Страниц: int
+    Шагов: int
+    Длительность: float
+    Удалено: List[str]
+
+
+class TopCreature(BaseModel):
+    Имя: str
+    Просмотры: int
+
+
+class TopResponse(BaseModel):
+    Окно: str
+    Существа: List[TopCreature]
+
+
+class BatchItemResult(BaseModel):
+    Id: Optional[str]
+    Путь: str
+    Статус: int
+    Тело: Any
+
+
+class BatchResponse(BaseModel):
+    Результаты: List[BatchItemResult]
+
+
 class AddCreatureResponse(BaseModel):
     Существо: str
     Сообщение: str
@@ -98,3 +206,42 @@ class UpdateCreatureResponse(BaseModel):
 
 class RemoveCreatureResponse(BaseModel):
     Сообщение: str
+
+
+class BulkOperationResponse(BaseModel):
+    Сообщение: str
+    Затронуто: int
+    Пробный_запуск: bool
+
+
+class AdmissionClassStats(BaseModel):
+    Класс: str
+    Лимит_параллельности: int
+    Выполняется: int
+    В_очереди: int
+    Принято: int
+    Ожидали_в_очереди: int
+    Отклонено_лимитом_частоты: int
+    Отклонено_перегрузкой: int
+
+
+class AdmissionStatsResponse(BaseModel):
+    Классы: List[AdmissionClassStats]
+
+
+class CoalescingStatsResponse(BaseModel):
+    Выполнено: int
+    Объединено: int
+    Выполнено_повторно: int
+    В_процессе: int
+
+
+class GroupCommitStatsResponse(BaseModel):
+    Включён: bool
+    Групп: int
+    Записей: int
+    Средний_размер: Optional[float] = None
+    Наибольший_размер: int
+    Коммит_p50_мс: Optional[float] = None
+    Коммит_max_мс: Optional[float] = None
+    Повторено_по_одной: int
@@ -1,14 +1,46 @@
-import csv
 import logging
-from io import StringIO
-from random import choice
-from sqlalchemy import select, func
+import os
+from collections import Counter
+from random import randrange
+from sqlalchemy import select, func, update, delete
+from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.sql import asc, desc  # noqa: F401
 from sqlalchemy.ext.asyncio import AsyncSession
-from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import JSONResponse, Response
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+import config
 from database import get_db
-from models.creature import Creature, CreatureDB, CreatureUpdate
+from services.admission import admission
+from services.backup import MEDIA_TYPE as BACKUP_MEDIA_TYPE, backups
+from services.batch import run_batch
+from services.change_feed import FeedFull, get_feed, stream_events
+from services.changes import database_key, on_change, publish
+from services.columnar_snapshot import MEDIA_TYPE, stream_columnar_snapshot
+from services.distribution import ensure_columns
+from services.export_jobs import export_jobs
+from services.group_commit import group_commit
+from services.media import media_prefetcher
+from services.name_index import ensure_name_index
+from services.offload import csv_chunk, json_chunk, offload
+from services.popularity import WINDOW, view_counters
+from services.ndjson import (
+    MEDIA_TYPE as NDJSON_MEDIA_TYPE,
+    iterate_payloads,
+    ndjson_response,
+    stream_query,
+    wants_ndjson,
+)
+from services.serialization import respond, trusted_creature
+from services.single_flight import single_flight
+from services.sync import (
+    AheadOfServer,
+    HistoryPruned,
+    open_changes,
+    prune_tombstones_periodically,
+)
+from services import tenants
+from models.creature import BatchRequest, Creature, CreatureDB, CreatureUpdate
 from models.models_for_docs import (
     ListBestiaryResponse,
     SearchCreaturesResponse,
@@ -17,10 +49,20 @@ from models.models_for_docs import (
     DangerousCreaturesResponse,
     RandomCreatureResponse,
     StatsResponse,
+    DistributionResponse,
     AddCreatureResponse,
     UpdateCreatureResponse,
     RemoveCreatureResponse,
-    CreatureResponse,
+    BulkOperationResponse,
+    BackupResponse,
+    BatchResponse,
+    TopResponse,
+    ExportJobResponse,
+    AdmissionStatsResponse,
+    CoalescingStatsResponse,
+    GroupCommitStatsResponse,
+    SuggestResponse,
+    CreatureInfoResponse,
 )
 
 
@@ -28,6 +70,39 @@ router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
+def require_writable():
+    """Зависимость маршрутов записи: запрещает запись в режиме только чтения."""
+    if config.READ_ONLY:
+        raise HTTPException(
+            status_code=403, detail="Бестиарий открыт только для чтения"
+        )
+
+
+# Сколько строк экспорта читается из курсора и кодируется за один шаг
+EXPORT_BATCH_SIZE = 200
+# Сколько существ возвращает нечёткий поиск
+FUZZY_LIMIT = 50
+
+# Колонки CSV-экспорта (ключи transform_creature)
+EXPORT_FIELDNAMES = [
+    "Id",
+    "Имя",
+    "Описание",
+    "Уровень_опасности",
+    "Среда_обитания",
+    "Цитата",
+    "Категория",
+    "Способности",
+    "Связанные_произведения",
+    "Url_изображения",
+    "Статус",
+    "Минимальное_безумие",
+    "Связи",
+    "Url_аудио",
+    "Url_видео",
+]
+
+
 def transform_creature(creature: CreatureDB, for_csv: bool = False) -> dict:
     """Преобразует строковые поля в списки."""
 
@@ -84,90 +159,421 @@ def transform_creature(creature: CreatureDB, for_csv: bool = False) -> dict:
     return data
 
 
+def serialize_creature(creature: CreatureDB) -> dict:
+    """Существо в виде, готовом к выдаче без проверки CreatureResponse."""
+    return trusted_creature(transform_creature(creature))
+
+
+def creature_to_row(creature: Creature) -> dict:
+    """Преобразует Pydantic-модель существа в словарь колонок для записи в БД."""
+    row = creature.model_dump()
+    for key in ("abilities", "related_works", "relations"):
+        row[key] = ",".join(row[key])
+    return row
+
+
+def update_to_values(creature_update: CreatureUpdate) -> dict:
+    """Собирает словарь колонок для UPDATE из заданных полей частичного обновления."""
+    values = {}
+    for key, value in creature_update.model_dump(exclude_unset=True).items():
+        if key in ["abilities", "related_works", "relations"] and value is not None:
+            value = ",".join(value)
+        if value is not None:
+            values[key] = value
+    return values
+
+
+def build_creature_filters(
+    q: str = None,
+    category: str = None,
+    min_danger: int = None,
+    max_danger: int = None,
+) -> list:
+    """Собирает условия WHERE для поиска и массовых операций.
+
+    Args:
+        q (str, optional): Начало имени.
+        category (str, optional): Категория.
+        min_danger (int, optional): Минимальный уровень опасности.
+        max_danger (int, optional): Максимальный уровень опасности.
+
+    Returns:
+        list: Список условий SQLAlchemy (пустой, если фильтры не заданы).
+    """
+    conditions = []
+    # Фильтр по началу имени без учёта регистра - так же, как в режиме памяти
+    # (casefold регистрируется на соединении в database.py)
+    if q:
+        prefix = q.casefold()
+        conditions.append(
+            func.substr(func.casefold(CreatureDB.name), 1, len(prefix)) == prefix
+        )
+    # Фильтр по категории
+    if category:
+        conditions.append(CreatureDB.category == category)
+    # Фильтр по уровню опасности
+    if min_danger is not None:
+        conditions.append(CreatureDB.danger_level >= min_danger)
+    if max_danger is not None:
+        conditions.append(CreatureDB.danger_level <= max_danger)
+    return conditions
+
+
+def danger_bucket(danger_level: int) -> str:
+    """Возвращает диапазон уровня опасности шириной 10 (например, '81-90')."""
+    start = (danger_level - 1) // 10 * 10 + 1
+    return f"{start}-{start + 9}"
+
+
+def compute_facets(creatures: list) -> dict:
+    """Считает фасеты найденных существ за один проход.
+
+    Args:
+        creatures (list): Найденные существа (CreatureDB).
+
+    Returns:
+        dict: Счётчики по категориям, статусам и диапазонам уровня опасности.
+    """
+    categories, statuses, buckets = Counter(), Counter(), Counter()
+    for creature in creatures:
+        categories[creature.category] += 1
+        statuses[creature.status] += 1
+        buckets[danger_bucket(creature.danger_level)] += 1
+
+    def as_list(counter, key=None):
+        items = sorted(counter.items(), key=key or (lambda item: (-item[1], item[0])))
+        return [{"Имя": name, "Количество": count} for name, count in items]
+
+    return {
+        "Категории": as_list(categories),
+        "Статусы": as_list(statuses),
+        "Уровни_опасности": as_list(
+            buckets, key=lambda item: int(item[0].split("-")[0])
+        ),
+    }
+
+
+@on_change
+def _publish_to_feed(key: str, action: str, creature: CreatureDB):
+    """Отправляет закоммиченное изменение в ленту /feed."""
+    get_feed(key).publish(action, transform_creature(creature))
+
+
 @router.get(
     "/export",
     response_model=ListBestiaryResponse,
     summary="Экспортировать бестиарии",
-    description="Экспортируем всех существ из бестиария в формат JSON или CSV.",
-    responses={200: {"description": "Файл успешно экспортирован"}},
+    description="Экспортируем всех существ из бестиария в формат JSON, CSV или колоночный BSTC.",
+    responses={
+        200: {
+            "description": "Файл успешно экспортирован",
+            "content": {MEDIA_TYPE: {}, NDJSON_MEDIA_TYPE: {}},
+        }
+    },
 )
 async def export_bestiary(
     format: str = Query(
-        "json", description="Формат экспорта: 'json' или 'csv'", pattern="^(json|csv)$"
+        "json",
+        description="Формат экспорта: 'json', 'csv' или 'columnar' (бинарный BSTC)",
+        pattern="^(json|csv|columnar)$",
+    ),
+    accept: str = Header(
+        None, description="application/x-ndjson - по одному существу на строку"
     ),
     db: AsyncSession = Depends(get_db),
 ):
-    """Экспортируем всех существ из бестиария в формат JSON или CSV.
+    """Экспортируем всех существ из бестиария в формат JSON, CSV или BSTC.
 
     Args:
-        format (str): Формат экспорта: 'json' или 'csv'. По умолчанию 'json'.
+        format (str): Формат экспорта: 'json', 'csv' или 'columnar'. По умолчанию 'json'.
         db (AsyncSession): Асинхронная сессия базы данных.
 
+    Файлы JSON и CSV отдаются потоком: строки кодируются порциями в пуле
+    BEASTIARY_OFFLOAD, а не в цикле событий.
+
     Returns:
-        JSONResponse: Файл с данными всех существ для скачивания (с отступами).
+        StreamingResponse: Файл с данными всех существ для скачивания.
 
     Examples:
         - `/beastiary/export` - возвращает JSON-файл со всеми существами.
+        - `/beastiary/export?format=columnar` - колоночный снимок для аналитики
+          (описание формата - в services/columnar_snapshot.py).
     """
-    # Получаем всех существ
-    result = await db.execute(select(CreatureDB))
-    creatures = result.scalars().all()
-
-    # Преобразуем в список словарей
-    export_data_json = [transform_creature(c, for_csv=False) for c in creatures]
-    export_data_csv = [transform_creature(c, for_csv=True) for c in creatures]
+    if format == "columnar":
+        return StreamingResponse(
+            stream_columnar_snapshot(db.bind),
+            headers={
+                "Content-Disposition": "attachment; filename=bestiary_export.bstc"
+            },
+            media_type=MEDIA_TYPE,
+        )
 
-    logger.info(f"Export data length: {len(export_data_json)}")
-    if export_data_json:
-        logger.info(f"First item type: {type(export_data_json[0])}")
+    if format == "json" and wants_ndjson(accept):
+        lines = await stream_query(db.bind, select(CreatureDB), transform_creature)
+        return ndjson_response(
+            lines or iter(()),
+            headers={
+                "Content-Disposition": "attachment; filename=bestiary_export.ndjson"
+            },
+        )
 
     if format == "json":
-        return JSONResponse(
-            content={
-                "Существа": export_data_json,
-                "Всего": len(export_data_json),
-                "Лимит": len(export_data_json),
-                "Смещение": 0,
-            },
+        return StreamingResponse(
+            _export_chunks(db.bind, format),
             headers={
                 "Content-Disposition": "attachment; filename=bestiary_export.json"
             },
             media_type="application/json",
         )
-    elif format == "csv":
-        # Создаём CSV в памяти
-        output = StringIO()
-        fieldnames = [
-            "Id",
-            "Имя",
-            "Описание",
-            "Уровень_опасности",
-            "Среда_обитания",
-            "Цитата",
-            "Категория",
-            "Способности",
-            "Связанные_произведения",
-            "Url_изображения",
-            "Статус",
-            "Минимальное_безумие",
-            "Связи",
-            "Url_аудио",
-            "Url_видео",
-        ]
-        writer = csv.DictWriter(output, fieldnames=fieldnames, lineterminator="\n")
-        writer.writeheader()
-
-        # Записываем данные, если они есть
-        if export_data_csv:
-            writer.writerows(export_data_csv)
-        csv_content = output.getvalue()
-        output.close()
-
-        return Response(
-            content=csv_content.encode("utf-8"),
-            headers={"Content-Disposition": "attachment; filename=bestiary_export.csv"},
-            media_type="text/csv; charset=utf-8",
+    return StreamingResponse(
+        _export_chunks(db.bind, format),
+        headers={"Content-Disposition": "attachment; filename=bestiary_export.csv"},
+        media_type="text/csv; charset=utf-8",
+    )
+
+
+async def _export_chunks(bind, format: str):
+    """Порции файла экспорта в формате 'json' или 'csv'.
+
+    Строки читаются из курсора по EXPORT_BATCH_SIZE, а кодируются в пуле
+    services.offload: между порциями цикл событий обслуживает другие запросы.
+    Сессия своя - сессия из get_db закрывается раньше, чем ответ дочитывается.
+    """
+    for_csv = format == "csv"
+    written = 0
+    async with tenants.tenant_engines.session(bind) as session:
+        result = await session.stream(
+            select(CreatureDB).execution_options(yield_per=EXPORT_BATCH_SIZE)
         )
+        if for_csv:
+            yield await offload.run(csv_chunk, EXPORT_FIELDNAMES, [], True)
+        else:
+            yield '{"Существа":['
+        async for batch in result.scalars().partitions(EXPORT_BATCH_SIZE):
+            rows = [transform_creature(c, for_csv=for_csv) for c in batch]
+            if for_csv:
+                yield await offload.run(csv_chunk, EXPORT_FIELDNAMES, rows)
+            else:
+                chunk = await offload.run(json_chunk, rows)
+                yield "," + chunk if written else chunk
+            written += len(rows)
+    logger.info(f"Export data length: {written}")
+    if not for_csv:
+        yield f'],"Всего":{written},"Лимит":{written},"Смещение":0}}'
+
+
+@router.post(
+    "/export/jobs",
+    response_model=ExportJobResponse,
+    status_code=202,
+    summary="Запустить фоновый экспорт",
+    description="Создаёт задачу экспорта бестиария в файл JSON или CSV (опционально gzip).",
+    response_description="Состояние задачи экспорта",
+    responses={
+        200: {"description": "Задача для этой версии данных уже существует"},
+        202: {"description": "Задача экспорта создана"},
+    },
+)
+async def create_export_job(
+    format: str = Query(
+        "json", description="Формат экспорта: 'json' или 'csv'", pattern="^(json|csv)$"
+    ),
+    compress: bool = Query(False, description="Сжать файл gzip"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Создаёт фоновую задачу экспорта и сразу возвращает её состояние.
+
+    Файл пишется на диск порциями из курсора базы данных. Повторный запрос
+    с тем же форматом до изменения данных вернёт уже существующую задачу.
+
+    Args:
+        format (str): Формат экспорта: 'json' или 'csv'.
+        compress (bool): Сжимать ли файл gzip.
+        db (AsyncSession): Асинхронная сессия базы данных.
+
+    Returns:
+        JSONResponse: Состояние задачи (202 - создана, 200 - переиспользована).
+
+    Examples:
+        - `POST /beastiary/export/jobs?format=csv&compress=true`
+    """
+    job, created = await export_jobs.submit(
+        db, format, compress, transform_creature, EXPORT_FIELDNAMES
+    )
+    return JSONResponse(
+        content=job.as_dict(),
+        status_code=202 if created else 200,
+        headers={"Location": f"/beastiary/export/jobs/{job.id}"},
+    )
+
+
+@router.get(
+    "/export/jobs/{job_id}",
+    response_model=ExportJobResponse,
+    summary="Состояние фонового экспорта",
+    description="Возвращает статус и прогресс задачи экспорта.",
+    response_description="Состояние задачи экспорта",
+    responses={
+        200: {"description": "Состояние задачи возвращено"},
+        404: {"description": "Задача не найдена"},
+    },
+)
+async def get_export_job(job_id: str):
+    """Возвращает состояние задачи экспорта.
+
+    Args:
+        job_id (str): Идентификатор задачи.
+
+    Returns:
+        dict: Статус ('pending', 'running', 'done', 'failed') и прогресс.
+
+    Raises:
+        HTTPException: Если задача не найдена (404).
+    """
+    job = export_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задача экспорта не найдена")
+    return job.as_dict()
+
+
+@router.get(
+    "/export/jobs/{job_id}/download",
+    summary="Скачать результат экспорта",
+    description="Отдаёт файл готового экспорта. Поддерживаются запросы Range для докачки.",
+    response_class=FileResponse,
+    responses={
+        200: {"description": "Файл экспорта"},
+        206: {"description": "Часть файла по заголовку Range"},
+        404: {"description": "Задача не найдена"},
+        409: {"description": "Экспорт ещё не готов"},
+    },
+)
+async def download_export_job(job_id: str):
+    """Отдаёт файл экспорта; оборванную загрузку можно продолжить с Range.
+
+    Args:
+        job_id (str): Идентификатор задачи.
+
+    Returns:
+        FileResponse: Файл с заголовками Accept-Ranges, ETag и Last-Modified.
+
+    Raises:
+        HTTPException: Если задача не найдена (404) или ещё не завершена (409).
+    """
+    job = export_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задача экспорта не найдена")
+    if job.status != "done":
+        raise HTTPException(
+            status_code=409, detail=f"Экспорт ещё не готов (статус: {job.status})"
+        )
+    return FileResponse(job.path, media_type=job.media_type, filename=job.filename)
+
+
+@router.post(
+    "/backup",
+    response_model=BackupResponse,
+    status_code=201,
+    summary="Снимок базы данных в каталог",
+    description="Создаёт согласованную копию базы данных в каталоге снимков, не останавливая API.",
+    response_description="Описание созданного снимка",
+    responses={201: {"description": "Снимок создан"}},
+)
+async def create_database_backup(db: AsyncSession = Depends(get_db)):
+    """Создаёт снимок базы в BEASTIARY_BACKUP_DIR и удаляет лишние старые.
+
+    База копируется онлайн-API резервного копирования SQLite шагами по
+    BEASTIARY_BACKUP_PAGES страниц, поэтому запись продолжает работать.
+    В каталоге остаются BEASTIARY_BACKUP_KEEP последних снимков.
+
+    Args:
+        db (AsyncSession): Асинхронная сессия базы данных (нужен её движок).
+
+    Returns:
+        dict: Имя файла, размер, число страниц и шагов, длительность и
+            имена удалённых старых снимков.
+    """
+    return await backups.create(db.bind)
+
+
+@router.get(
+    "/backup",
+    summary="Скачать снимок базы данных",
+    description="Отдаёт согласованную копию файла базы данных SQLite, не останавливая API.",
+    response_class=FileResponse,
+    responses={
+        200: {"description": "Файл базы данных", "content": {BACKUP_MEDIA_TYPE: {}}}
+    },
+)
+async def download_database_backup(db: AsyncSession = Depends(get_db)):
+    """Делает снимок базы во временный файл и отдаёт его.
+
+    Файл удаляется после отправки ответа.
+
+    Returns:
+        FileResponse: Файл bestiary_backup.db.
+    """
+    path = await backups.to_temp(db.bind)
+    return FileResponse(
+        path,
+        media_type=BACKUP_MEDIA_TYPE,
+        filename="bestiary_backup.db",
+        background=BackgroundTask(os.remove, path),
+    )
+
+
+@router.post(
+    "/batch",
+    response_model=BatchResponse,
+    summary="Пакетный запрос",
+    description="Выполняет несколько GET-запросов чтения одновременно и возвращает их ответы одним ответом.",
+    response_description="Код и тело ответа каждого подзапроса.",
+    responses={
+        200: {"description": "Подзапросы выполнены (у каждого свой код)"},
+        400: {"description": "Слишком много подзапросов"},
+    },
+)
+async def batch_requests(batch: BatchRequest, request: Request):
+    """Выполняет подзапросы к маршрутам чтения одновременно.
+
+    Каждый подзапрос проходит через приложение так же, как отдельный запрос
+    (допуск, объединение одинаковых запросов, режим чтения из памяти), но
+    без сетевых накладных расходов; соединения берутся из общего пула.
+    Ошибка одного подзапроса не влияет на остальные.
+
+    Args:
+        batch (BatchRequest): Подзапросы: путь с параметрами и необязательная метка.
+        request (Request): Исходный запрос (заголовки и адрес клиента
+            передаются подзапросам).
+
+    Returns:
+        dict: Словарь с ключом 'Результаты': метка, путь, код и тело ответа
+            каждого подзапроса в порядке запроса.
+
+    Raises:
+        HTTPException: Если подзапросов больше BEASTIARY_BATCH_MAX_ITEMS (400).
+
+    Examples:
+        - `POST /beastiary/batch` с телом
+          `{"requests": [{"id": "stats", "path": "/beastiary/stats"},
+          {"path": "/beastiary/dangerous?min=90"}]}`.
+    """
+    if len(batch.requests) > config.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Не больше {config.BATCH_MAX_ITEMS} подзапросов в пакете",
+        )
+    results = await run_batch(
+        request.app, request.scope, [item.path for item in batch.requests]
+    )
+    return respond(
+        {
+            "Результаты": [
+                {"Id": item.id, "Путь": item.path, "Статус": status, "Тело": body}
+                for item, (status, body) in zip(batch.requests, results)
+            ]
+        }
+    )
 
 
 @router.get(
@@ -177,7 +583,10 @@ async def export_bestiary(
     description="Возвращает список существ из бестиария с пагинацией.",
     response_description="Список существ с информацией о пагинацией.",
     responses={
-        200: {"description": "Список существ успешно возвращен"},
+        200: {
+            "description": "Список существ успешно возвращен",
+            "content": {NDJSON_MEDIA_TYPE: {}},
+        },
         404: {"description": "Существа не найдены"},
     },
 )
@@ -186,6 +595,9 @@ async def list_bestiary(
         10, ge=1, le=100, description="Количество записей на странице (максимум 100)"
     ),
     offset: int = Query(0, ge=0, description="Смещение (с какой записи начинать)"),
+    accept: str = Header(
+        None, description="application/x-ndjson - по одному существу на строку"
+    ),
     db: AsyncSession = Depends(get_db),
 ):
     """Возвращает список существ из бестиария с пагинацией.
@@ -193,6 +605,8 @@ async def list_bestiary(
     Args:
         limit (int, optional): Количество записей на странице. Должны быть от 1 до 100 по умолчанию 10.
         offset (int, optional): Смещение (с какой записи начинать). Должно быть >= 0. По умолчанию 0.
+        accept (str, optional): При 'application/x-ndjson' существа отдаются
+            потоком по одному на строку, а общее число - в заголовке X-Total-Count.
         db (AsyncSession, optional): Сессия базы данных, предоставляемая через зависимость.
 
     Returns:
@@ -205,36 +619,41 @@ async def list_bestiary(
     Raises:
         HTTPException: Если существа не найдены (404).
     """
-    count_query = await db.execute(select(CreatureDB).with_only_columns(func.count()))
-    total_count = count_query.scalar()
-    print(f"Отладка: Всего записей в базе: {total_count}")
+    total_count = await db.scalar(select(func.count(CreatureDB.id)))
+    logger.debug(f"Всего записей в базе: {total_count}")
+
+    if wants_ndjson(accept):
+        lines = await stream_query(
+            db.bind, select(CreatureDB).limit(limit).offset(offset), serialize_creature
+        )
+        if lines is None:
+            raise HTTPException(status_code=404, detail="Существа не найдены")
+        return ndjson_response(lines, headers={"X-Total-Count": str(total_count)})
 
     # Получаем записи с пагинацей
     result = await db.execute(select(CreatureDB).limit(limit).offset(offset))
     creatures = result.scalars().all()
 
-    print(f"Отладка: Найденные существа: {[creature.name for creature in creatures]}")
-    logger.info(
-        f"Возвращено {len(creatures)} существ на бестиария с limit={limit}, offset={offset}"
-    )
-
     if not creatures:
         raise HTTPException(status_code=404, detail="Существа не найдены")
 
     logger.info(
         f"Возвращено {len(creatures)} существ на бестиария с limit={limit}, offset={offset}"
     )
-    return {
-        "Существа": [transform_creature(c) for c in creatures],
-        "Всего": total_count,
-        "Лимит": limit,
-        "Смещение": offset,
-    }
+    return respond(
+        {
+            "Существа": [serialize_creature(c) for c in creatures],
+            "Всего": total_count,
+            "Лимит": limit,
+            "Смещение": offset,
+        }
+    )
 
 
 @router.get(
     "/info/{creature_name}",
-    response_model=CreatureResponse,
+    response_model=CreatureInfoResponse,
+    response_model_exclude_unset=True,
     summary="Получить информацию о существе",
     description="Возвращает подробную информацию о существе по его имени.",
     response_description="Данные о существе",
@@ -243,11 +662,24 @@ async def list_bestiary(
         404: {"description": "Существо не найдено в бестиарии"},
     },
 )
-async def get_creature_info(creature_name: str, db: AsyncSession = Depends(get_db)):
+async def get_creature_info(
+    creature_name: str,
+    request: Request,
+    media: bool = Query(
+        False, description="Добавить результаты проверки изображения, аудио и видео"
+    ),
+    db: AsyncSession = Depends(get_db),
+):
     """Получить информацию о существе по его имени.
 
     Args:
         creature_name (str): Имя существ (например, 'Йог-Сотот').
+        request (Request): Запрос (просмотр засчитывается и одинаковым
+            запросам, получившим этот же ответ).
+        media (bool, optional): Если True, в ответ добавляется ключ 'Медиа' с
+            последней проверкой адресов медиа (доступность, тип, размер,
+            размеры и миниатюра изображения). Ответ не ждёт сети: ещё не
+            проверенные адреса возвращаются с 'Проверено': null.
         db (AsyncSession): Асинхронная сессия базы данных.
 
     Returns:
@@ -262,17 +694,65 @@ async def get_creature_info(creature_name: str, db: AsyncSession = Depends(get_d
     creature = result.scalars().first()
     if not creature:
         raise HTTPException(status_code=404, detail="Существо не найдено в бестиарии!")
-    return transform_creature(creature)
+    view_counters.record_view(request.scope, db.bind, creature.name)
+    response = serialize_creature(creature)
+    if media:
+        response["Медиа"] = media_prefetcher.describe(response)
+    return respond(response)
+
+
+@router.get(
+    "/media/thumbnails/{key}.png",
+    response_class=FileResponse,
+    summary="Миниатюра изображения существа",
+    description="Уменьшенная копия изображения, построенная при проверке медиа.",
+    responses={404: {"description": "Миниатюра не найдена"}},
+)
+async def get_media_thumbnail(key: str):
+    """Отдаёт миниатюру по ключу из поля 'Миниатюра' ответа /info?media=true.
+
+    Raises:
+        HTTPException: Если миниатюры нет (404).
+    """
+    path = media_prefetcher.thumbnail_path(key)
+    if not key.isalnum() or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Миниатюра не найдена")
+    return FileResponse(path, media_type="image/png")
+
+
+async def _fuzzy_search(
+    db: AsyncSession, q: str, category: str, min_danger: int, max_danger: int
+) -> list:
+    """Существа, похожие на q и прошедшие фильтры, от самых похожих.
+
+    Кандидаты из индекса проверяются запросом к базе порциями, а круг
+    кандидатов расширяется, пока не наберётся FUZZY_LIMIT существ
+    (NameIndex.search_filtered).
+    """
+    index = await ensure_name_index(db)
+    filters = build_creature_filters(None, category, min_danger, max_danger)
+
+    async def matching(names: list) -> dict:
+        result = await db.execute(
+            select(CreatureDB).filter(CreatureDB.name.in_(names), *filters)
+        )
+        return {creature.name: creature for creature in result.scalars()}
+
+    return await index.search_filtered(q, matching, FUZZY_LIMIT, bool(filters))
 
 
 @router.get(
     "/search",
     response_model=SearchCreaturesResponse,
+    response_model_exclude_unset=True,
     summary="Поиск существ",
     description="Ищет существ по имени, категории и/или по уровню опасности.",
     response_description="Список найденных существ.",
     responses={
-        200: {"description": "Существа найдены"},
+        200: {
+            "description": "Существа найдены",
+            "content": {NDJSON_MEDIA_TYPE: {}},
+        },
         404: {"description": "Существа с заданными фильтрами не найдены"},
     },
 )
@@ -285,6 +765,15 @@ async def search_creatures(
     max_danger: int = Query(
         None, ge=0, le=100, description="Максимальный уровень опасности"
     ),
+    fuzzy: bool = Query(
+        False, description="Нечёткий поиск по имени с учётом опечаток (нужен q)"
+    ),
+    facets: bool = Query(
+        False, description="Добавить счётчики по категориям, статусам и уровням опасности"
+    ),
+    accept: str = Header(
+        None, description="application/x-ndjson - по одному существу на строку"
+    ),
     db: AsyncSession = Depends(get_db),
 ):
     """Ищем существ по имени, категории и/или уровню опасности.
@@ -294,39 +783,97 @@ async def search_creatures(
         category (str, optional): Фильтр по категории.
         min_danger (int, optional): Минимальный уровень опасности.
         max_danger (int, optional): Максимальный уровень опасности.
+        fuzzy (bool, optional): Если True, имя ищется по триграммному сходству
+            с q, а результаты сортируются от самых похожих.
+        facets (bool, optional): Если True, в ответ добавляется ключ 'Фасеты'
+            со счётчиками найденных существ по категориям, статусам и
+            диапазонам уровня опасности.
+        accept (str, optional): При 'application/x-ndjson' существа отдаются
+            потоком по одному на строку (фасеты при этом не считаются).
         db (AsyncSession: Асинхронная сессия базы данных.
 
     Returns:
-        dict: Словарь с ключом 'существа' и список найденных существ.
+        dict: Словарь с ключом 'существа' и список найденных существ
+            (и ключом 'Фасеты', если они запрошены).
 
     Raises:
         HTTPException: Если ничего не найдено (ошибка 404).
-    """
-    query = select(CreatureDB)
 
-    # Фильтр по имени
-    if q:
-        query = query.filter(func.lower(CreatureDB.name).ilike(f"{q}%"))
-
-    # Фильтр по категории
-    if category:
-        query = query.filter(CreatureDB.category == category)
-
-    # Фильтро по уровню опасности
-    if min_danger is not None:
-        query = query.filter(CreatureDB.danger_level >= min_danger)
-    if max_danger is not None:
-        query = query.filter(CreatureDB.danger_level <= max_danger)
-
-    result = await db.execute(query)
-    creatures = result.scalars().all()
+    Examples:
+        - `/beastiary/search?q=Шуб Ниггурат&fuzzy=true` - найдёт 'Шуб-Ниггурат'.
+    """
+    if fuzzy and q:
+        # Кандидаты берутся из индекса в памяти, а не сканированием таблицы
+        creatures = await _fuzzy_search(db, q, category, min_danger, max_danger)
+    else:
+        query = select(CreatureDB).filter(
+            *build_creature_filters(q, category, min_danger, max_danger)
+        )
+        if wants_ndjson(accept):
+            lines = await stream_query(db.bind, query, serialize_creature)
+            if lines is None:
+                raise HTTPException(
+                    status_code=404, detail="Существа с заданным фильтрам не найдены"
+                )
+            return ndjson_response(lines)
+        creatures = (await db.execute(query)).scalars().all()
 
     if not creatures:
         raise HTTPException(
             status_code=404, detail="Существа с заданным фильтрам не найдены"
         )
 
-    return {"Существа": [transform_creature(c) for c in creatures]}
+    if wants_ndjson(accept):
+        # Нечёткий поиск: не больше FUZZY_LIMIT существ, уже отсортированных
+        return ndjson_response(
+            iterate_payloads([serialize_creature(c) for c in creatures])
+        )
+
+    response = {"Существа": [serialize_creature(c) for c in creatures]}
+    if facets:
+        response["Фасеты"] = compute_facets(creatures)
+    return respond(response)
+
+
+@router.get(
+    "/suggest",
+    response_model=SuggestResponse,
+    summary="Подсказки имён",
+    description="Автодополнение: имена существ, начинающиеся с введённого текста.",
+    response_description="Список подсказок.",
+    responses={200: {"description": "Подсказки успешно возвращены"}},
+)
+async def suggest_creatures(
+    q: str = Query(..., min_length=1, description="Начало имени"),
+    limit: int = Query(10, ge=1, le=50, description="Количество подсказок"),
+    by: str = Query(
+        "name",
+        description="Порядок: 'name' - по алфавиту, 'danger' - сначала самые опасные",
+        pattern="^(name|danger)$",
+    ),
+    db: AsyncSession = Depends(get_db),
+):
+    """Возвращает подсказки имён из префиксного индекса в памяти.
+
+    Регистр не учитывается (в том числе для кириллицы), 'ё' равна 'е'.
+    Префикс из одних пробелов и знаков препинания подсказок не даёт.
+
+    Args:
+        q (str): Начало имени.
+        limit (int): Количество подсказок (от 1 до 50, по умолчанию 10).
+        by (str): Порядок подсказок: 'name' или 'danger'.
+        db (AsyncSession): Асинхронная сессия базы данных (нужна только для
+            первой загрузки индекса).
+
+    Returns:
+        dict: Словарь с ключом 'Подсказки' и списком имён.
+
+    Examples:
+        - `/beastiary/suggest?q=шу` - ['Шуб-Ниггурат'].
+        - `/beastiary/suggest?q=й&by=danger&limit=5` - пять самых опасных на 'Й'.
+    """
+    index = await ensure_name_index(db)
+    return {"Подсказки": index.suggest(q, limit=limit, by=by)}
 
 
 @router.get(
@@ -336,17 +883,26 @@ async def search_creatures(
     description="Возвращает список существ, принадлежащих к указанной категории.",
     response_description="Список существ в категории.",
     responses={
-        200: {"description": "Существа в категории найдены"},
+        200: {
+            "description": "Существа в категории найдены",
+            "content": {NDJSON_MEDIA_TYPE: {}},
+        },
         404: {"description": "Нет существ в указанной категории"},
     },
 )
 async def get_creatures_by_category(
-    category_name: str, db: AsyncSession = Depends(get_db)
+    category_name: str,
+    accept: str = Header(
+        None, description="application/x-ndjson - по одному существу на строку"
+    ),
+    db: AsyncSession = Depends(get_db),
 ):
     """Получить список существ по категории.
 
     Args:
         category_name (str): Название категории (например 'Внешний Бог')
+        accept (str, optional): При 'application/x-ndjson' существа отдаются
+            потоком по одному на строку.
         db (AsyncSession): Асинхронная сессия базы данных.
 
     Returns:
@@ -355,16 +911,23 @@ async def get_creatures_by_category(
     Raises:
         HTTPException: Если в категорий нет существ (404)
     """
-    result = await db.execute(
-        select(CreatureDB).filter(CreatureDB.category == category_name)
-    )
+    query = select(CreatureDB).filter(CreatureDB.category == category_name)
+    if wants_ndjson(accept):
+        lines = await stream_query(db.bind, query, serialize_creature)
+        if lines is None:
+            raise HTTPException(
+                status_code=404, detail=f"Нет существ в категории '{category_name}'"
+            )
+        return ndjson_response(lines)
+
+    result = await db.execute(query)
     creatures = result.scalars().all()
 
     if not creatures:
         raise HTTPException(
             status_code=404, detail=f"Нет существ в категории '{category_name}'"
         )
-    return {"Существа": [transform_creature(c) for c in creatures]}
+    return respond({"Существа": [serialize_creature(c) for c in creatures]})
 
 
 @router.get(
@@ -405,7 +968,12 @@ async def get_categories(db: AsyncSession = Depends(get_db)):
     summary="Получить опасных существ",
     description="Возвращает список существ с уровнем опасности в заданном диапазоне.",
     response_description="Список опасных существ.",
-    responses={200: {"description": "Список опасных существ успешно возвращён"}},
+    responses={
+        200: {
+            "description": "Список опасных существ успешно возвращён",
+            "content": {NDJSON_MEDIA_TYPE: {}},
+        }
+    },
 )
 async def get_dangerous_creatures(
     min: int = Query(
@@ -414,6 +982,9 @@ async def get_dangerous_creatures(
     max: int = Query(
         100, ge=0, le=100, description="Максимальный уровень опасности (включительно)"
     ),
+    accept: str = Header(
+        None, description="application/x-ndjson - по одному существу на строку"
+    ),
     db: AsyncSession = Depends(get_db),
 ):
     """Получает список существ с уровнем опасности в заданном диапазоне.
@@ -421,6 +992,8 @@ async def get_dangerous_creatures(
     Args:
         min (int): Минимальный уровень опасности (по умолчанию 0).
         max (int): Максимальный уровень опасности (по умолчанию 100).
+        accept (str, optional): При 'application/x-ndjson' существа отдаются
+            потоком по одному на строку (пустой диапазон - пустое тело).
         db (AsyncSession): Асинхронная сессия базы данных (внедряется через Depends).
 
     Returns:
@@ -430,13 +1003,16 @@ async def get_dangerous_creatures(
         - `/beastiary/dangerous?min=80&max=100` - существа с уровнем опасности от 80 до 100.
         - `/beastiary/dangerous?min=50` - существа с уровнем опасности от 50 до 100.
     """
-    result = await db.execute(
-        select(CreatureDB).filter(
-            CreatureDB.danger_level >= min, CreatureDB.danger_level <= max
-        )
+    query = select(CreatureDB).filter(
+        CreatureDB.danger_level >= min, CreatureDB.danger_level <= max
     )
+    if wants_ndjson(accept):
+        lines = await stream_query(db.bind, query, serialize_creature)
+        return ndjson_response(lines or iter(()))
+
+    result = await db.execute(query)
     creatures = result.scalars().all()
-    return {"Опасные_существа": [transform_creature(c) for c in creatures]}
+    return respond({"Опасные_существа": [serialize_creature(c) for c in creatures]})
 
 
 @router.get(
@@ -472,25 +1048,26 @@ async def get_random_creature(
         - `/beastiary/random` - случайное существо из всех.
         - `/beastiary/random?category=Внешний Бог` - случайный Внешний Бог.
     """
-    # Формируем запрос в зависимости от наличия категории
-    if category:
-        result = await db.execute(
-            select(CreatureDB).filter(CreatureDB.category == category)
-        )
-    else:
-        result = await db.execute(select(CreatureDB))
-
-    creatures = result.scalars().all()
+    # Считаем подходящие строки и читаем одну со случайным смещением,
+    # а не загружаем всю таблицу ради одного существа
+    filters = [CreatureDB.category == category] if category else []
+    count = await db.scalar(select(func.count(CreatureDB.id)).filter(*filters))
 
-    if not creatures:
+    if not count:
         if category:
             raise HTTPException(
                 status_code=404, detail=f"В категории '{category}' нет существ!"
             )
         raise HTTPException(status_code=404, detail="Бестиарий пуст")
 
-    random_creature = choice(creatures)
-    return {"Существо": transform_creature(random_creature)}
+    query = select(CreatureDB).filter(*filters).order_by(CreatureDB.id).limit(1)
+    random_creature = await db.scalar(query.offset(randrange(count)))
+    if random_creature is None:
+        # Строки удалили между подсчётом и чтением: берём первую оставшуюся
+        random_creature = await db.scalar(query)
+    if random_creature is None:
+        raise HTTPException(status_code=404, detail="Бестиарий пуст")
+    return respond({"Существо": serialize_creature(random_creature)})
 
 
 @router.get(
@@ -566,8 +1143,204 @@ async def get_beastiary_stats(db: AsyncSession = Depends(get_db)):
     return stats
 
 
+@router.get(
+    "/stats/distribution",
+    response_model=DistributionResponse,
+    summary="Получить распределения опасности и безумия",
+    description="Гистограммы, процентили и разбивка по категориям для уровня опасности и минимального безумия.",
+    response_description="Распределения числовых характеристик бестиария",
+    responses={200: {"description": "Распределения успешно возвращены"}},
+)
+async def get_beastiary_distribution(
+    bucket: int = Query(10, ge=1, le=101, description="Ширина интервала гистограммы"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Возвращает распределения уровня опасности и минимального безумия.
+
+    Считается по колоночной копии этих полей в памяти, которая загружается
+    один раз и обновляется при каждой записи, поэтому запрос не выполняет
+    GROUP BY по таблице.
+
+    Args:
+        bucket (int): Ширина интервала гистограммы (по умолчанию 10).
+        db (AsyncSession): Асинхронная сессия базы данных (нужна только для
+            первой загрузки колонок).
+
+    Returns:
+        dict: Общие распределения и распределения по каждой категории.
+
+    Examples:
+        - `/beastiary/stats/distribution` - гистограммы с шагом 10.
+        - `/beastiary/stats/distribution?bucket=25` - гистограммы по четвертям.
+    """
+    columns = await ensure_columns(db)
+    return columns.distribution(bucket_width=bucket)
+
+
+@router.get(
+    "/stats/admission",
+    response_model=AdmissionStatsResponse,
+    summary="Статистика допуска запросов",
+    description="Лимиты, очереди и отклонённые запросы по классам маршрутов.",
+    response_description="Счётчики по классам маршрутов",
+    responses={200: {"description": "Статистика успешно возвращена"}},
+)
+async def get_admission_stats():
+    """Возвращает счётчики допуска запросов этого процесса.
+
+    Маршруты делятся на классы: 'cheap' (поиск по ключу) и 'heavy' (экспорт,
+    массовые операции и просмотр всей таблицы). Для каждого класса видно,
+    сколько запросов выполняется и ждёт в очереди, сколько принято и
+    сколько отклонено с 429 (лимит частоты клиента) или 503 (перегрузка).
+
+    Returns:
+        dict: Словарь с ключом 'Классы' и счётчиками каждого класса.
+    """
+    return {"Классы": admission.stats()}
+
+
+@router.get(
+    "/stats/coalescing",
+    response_model=CoalescingStatsResponse,
+    summary="Статистика объединения запросов",
+    description="Сколько одинаковых одновременных GET-запросов получили общий ответ.",
+    response_description="Счётчики объединения запросов",
+    responses={200: {"description": "Статистика успешно возвращена"}},
+)
+async def get_coalescing_stats():
+    """Возвращает счётчики объединения одинаковых запросов этого процесса.
+
+    Одинаковые (маршрут, параметры, версия данных) GET-запросы, пришедшие
+    пока такой же запрос выполняется, получают его ответ вместо повторного
+    выполнения.
+
+    Returns:
+        dict: 'Выполнено' - выполнений, 'Объединено' - запросов, получивших
+            чужой ответ, 'Выполнено_повторно' - ждавших запросов, которым
+            ответ не подошёл (ошибка, 429/503, слишком большой ответ),
+            'В_процессе' - выполняющихся сейчас.
+    """
+    return single_flight.stats()
+
+
+@router.get(
+    "/stats/writes",
+    response_model=GroupCommitStatsResponse,
+    summary="Статистика группового коммита",
+    description="Сколько добавлений и обновлений записано общими транзакциями.",
+    response_description="Размеры групп и время коммита",
+    responses={200: {"description": "Статистика успешно возвращена"}},
+)
+async def get_group_commit_stats():
+    """Возвращает счётчики группового коммита этого процесса.
+
+    При BEASTIARY_GROUP_COMMIT=1 добавления и обновления, пришедшие почти
+    одновременно, записываются одной транзакцией с одним COMMIT.
+
+    Returns:
+        dict: 'Включён', число групп и записей, средний и наибольший размер
+            группы, время COMMIT (медиана и максимум) и сколько групп
+            пришлось выполнить заново по одной записи.
+    """
+    return {"Включён": config.GROUP_COMMIT, **group_commit.stats()}
+
+
+@router.get(
+    "/top",
+    response_model=TopResponse,
+    summary="Самые просматриваемые существа",
+    description="Рейтинг существ по числу просмотров /info за выбранное окно времени.",
+    response_description="Существа по убыванию просмотров",
+    responses={200: {"description": "Рейтинг успешно возвращён"}},
+)
+async def get_top_creatures(
+    window: str = Query(
+        "24h",
+        description="Окно: число часов или дней ('24h', '7d') или 'all'",
+        pattern=WINDOW.pattern,
+    ),
+    limit: int = Query(10, ge=1, le=100, description="Количество существ"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Возвращает самых просматриваемых существ за окно времени.
+
+    Просмотры считаются в памяти и записываются в базу пачками по
+    интервалам (BEASTIARY_POPULARITY_BUCKET секунд), поэтому окно
+    округляется вниз до начала интервала.
+
+    Args:
+        window (str): Окно: '1h', '24h', '7d', '30d' или 'all'.
+        limit (int): Количество существ (от 1 до 100).
+        db (AsyncSession): Асинхронная сессия базы данных.
+
+    Returns:
+        dict: Окно и список существ с числом просмотров.
+
+    Examples:
+        - `/beastiary/top?window=7d&limit=5` - пятёрка за неделю.
+    """
+    rows = await view_counters.top(db, window, limit)
+    return respond(
+        {
+            "Окно": window,
+            "Существа": [{"Имя": name, "Просмотры": views} for name, views in rows],
+        }
+    )
+
+
+async def _insert_creature(session: AsyncSession, row: dict):
+    """Добавляет строку существа; None, если такое имя уже есть."""
+    # Одна команда INSERT ... ON CONFLICT DO NOTHING вместо SELECT + INSERT:
+    # при гонке двух запросов второй получит 400, а не IntegrityError (500).
+    result = await session.execute(
+        insert(CreatureDB)
+        .values(**row)
+        .on_conflict_do_nothing(index_elements=[CreatureDB.name])
+        .returning(CreatureDB)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalar_one_or_none()
+
+
+async def _update_creature(session: AsyncSession, name: str, values: dict):
+    """Обновляет поля существа; None, если существа нет."""
+    if values:
+        # UPDATE ... RETURNING: обновление и чтение результата за один запрос
+        result = await session.execute(
+            update(CreatureDB)
+            .where(CreatureDB.name == name)
+            .values(**values)
+            .returning(CreatureDB)
+            .execution_options(populate_existing=True)
+        )
+    else:
+        result = await session.execute(
+            select(CreatureDB).where(CreatureDB.name == name)
+        )
+    return result.scalar_one_or_none()
+
+
+async def _write(db: AsyncSession, op, *args):
+    """Выполняет запись op(session, *args) и фиксирует её.
+
+    При BEASTIARY_GROUP_COMMIT=1 запись уходит в групповой коммит своей
+    базы и выполняется вместе с пришедшими одновременно; иначе - в сессии
+    запроса. Если op вернула None (конфликт), транзакция запроса
+    откатывается.
+    """
+    if config.GROUP_COMMIT:
+        return await group_commit.submit(db.bind, op, *args)
+    result = await op(db, *args)
+    if result is None:
+        await db.rollback()
+    else:
+        await db.commit()
+    return result
+
+
 @router.post(
     "/add",
+    dependencies=[Depends(require_writable)],
     response_model=AddCreatureResponse,
     summary="Добавить новое существо",
     description="Добавляет новое существо в бестиарии.",
@@ -590,39 +1363,53 @@ async def add_creature(creature: Creature, db: AsyncSession = Depends(get_db)):
     Raises:
         HTTPException: Если существа с таким именем уже есть (400).
     """
-    result = await db.execute(
-        select(CreatureDB).filter(CreatureDB.name == creature.name)
-    )
-    db_creature = result.scalars().first()
-    if db_creature:
+    created = await _write(db, _insert_creature, creature_to_row(creature))
+    if created is None:
         raise HTTPException(
             status_code=400, detail="Это существо уже есть в бестиарии!"
         )
+    publish(db, "add", [created])
+    return {"Существо": creature.name, "Сообщение": "Существо добавлено в бестиарий!"}
+
+
+@router.put(
+    "/upsert",
+    dependencies=[Depends(require_writable)],
+    response_model=AddCreatureResponse,
+    summary="Добавить или заменить существо",
+    description="Добавляет существо или полностью заменяет данные существующего с тем же именем.",
+    response_description="Сообщение об успешном сохранении",
+    responses={200: {"description": "Существо успешно сохранено"}},
+)
+async def upsert_creature(creature: Creature, db: AsyncSession = Depends(get_db)):
+    """Добавляет существо или заменяет существующее одним запросом
+    INSERT ... ON CONFLICT DO UPDATE.
 
-    new_creature = CreatureDB(
-        name=creature.name,
-        description=creature.description,
-        danger_level=creature.danger_level,
-        habitat=creature.habitat,
-        quote=creature.quote,
-        category=creature.category,
-        abilities=",".join(creature.abilities),
-        related_works=",".join(creature.related_works),
-        image_url=creature.image_url,
-        status=creature.status,
-        min_insanity=creature.min_insanity,
-        relations=",".join(creature.relations),
-        audio_url=creature.audio_url,
-        video_url=creature.video_url,
+    Args:
+        creature (Creature): Полные данные существа (Pydantic-модель).
+        db (AsyncSession): Асинхронная сессия базы данных.
+
+    Returns:
+        dict: Имя существа и сообщение об успешном сохранении.
+    """
+    row = creature_to_row(creature)
+    statement = insert(CreatureDB).values(**row)
+    statement = statement.on_conflict_do_update(
+        index_elements=[CreatureDB.name],
+        set_={key: statement.excluded[key] for key in row if key != "name"},
+    ).returning(CreatureDB)
+    result = await db.execute(
+        statement, execution_options={"populate_existing": True}
     )
-    db.add(new_creature)
+    saved = result.scalar_one()
     await db.commit()
-    await db.refresh(new_creature)
-    return {"Существо": creature.name, "Сообщение": "Существо добавлено в бестиарий!"}
+    publish(db, "upsert", [saved])
+    return {"Существо": creature.name, "Сообщение": "Существо сохранено в бестиарии!"}
 
 
 @router.put(
     "/update/{creature_name}",
+    dependencies=[Depends(require_writable)],
     response_model=UpdateCreatureResponse,
     summary="Обновить данные существа.",
     description="Обновляет данные существа в бестиарии по его имени",
@@ -650,22 +1437,12 @@ async def update_creature(
     Raises:
         HTTPException: Если существо с указанным именем не найдено (404).
     """
-    # Ищем существо по имени
-    query = select(CreatureDB).where(CreatureDB.name == creature_name)
-    result = await db.execute(query)
-    creature = result.scalar_one_or_none()
-
+    values = update_to_values(creature_update)
+    creature = await _write(db, _update_creature, creature_name, values)
     if not creature:
         raise HTTPException(status_code=404, detail="Существо не найдено в бестиарии!")
 
-    for key, value in creature_update.model_dump(exclude_unset=True).items():
-        if key in ["abilities", "related_works", "relations"] and value is not None:
-            value = ",".join(value)
-        if value is not None:
-            setattr(creature, key, value)
-
-    await db.commit()
-    await db.refresh(creature)
+    publish(db, "update", [creature])
 
     # Преобразуем объект creature в словарь с русифицированными ключами !ДЛЯ ТЕСТИРОВАНИЯ!.
     creature_dict = {
@@ -694,6 +1471,7 @@ async def update_creature(
 
 @router.delete(
     "/remove/{creature_name}",
+    dependencies=[Depends(require_writable)],
     response_model=RemoveCreatureResponse,
     summary="Удалить существо",
     description="Удаляет существо из бестиария по его имени.",
@@ -716,12 +1494,304 @@ async def remove_creature(creature_name: str, db: AsyncSession = Depends(get_db)
     Raises:
         HTTPException: Если существо не найдено (404).
     """
+    # DELETE ... RETURNING: удаление и проверка существования за один запрос
     result = await db.execute(
-        select(CreatureDB).filter(CreatureDB.name == creature_name)
+        delete(CreatureDB)
+        .where(CreatureDB.name == creature_name)
+        .returning(CreatureDB)
     )
-    creature = result.scalars().first()
-    if not creature:
+    removed = result.scalar_one_or_none()
+    if removed is None:
+        await db.rollback()
         raise HTTPException(status_code=404, detail="Существо не найдено в бестиарии!")
-    await db.delete(creature)
+    await prune_tombstones_periodically(db)
     await db.commit()
+    publish(db, "remove", [removed])
     return {"Сообщение": f"{creature_name} удалён из бестиария!"}
+
+
+async def _resolve_bulk_filters(
+    q: str = Query(None, min_length=1, description="Фильтр по началу имени"),
+    category: str = Query(None, description="Фильтр по категории"),
+    min_danger: int = Query(
+        None, ge=0, le=100, description="Минимальный уровень опасности"
+    ),
+    max_danger: int = Query(
+        None, ge=0, le=100, description="Максимальный уровень опасности"
+    ),
+) -> list:
+    """Зависимость с фильтрами массовых операций (те же, что у /search)."""
+    conditions = build_creature_filters(q, category, min_danger, max_danger)
+    if not conditions:
+        raise HTTPException(
+            status_code=400,
+            detail="Для массовой операции нужен хотя бы один фильтр",
+        )
+    return conditions
+
+
+@router.patch(
+    "/bulk",
+    dependencies=[Depends(require_writable)],
+    response_model=BulkOperationResponse,
+    summary="Массово обновить существ",
+    description="Обновляет всех существ, подходящих под фильтры поиска, одним запросом.",
+    response_description="Количество обновлённых существ.",
+    responses={
+        200: {"description": "Существа успешно обновлены"},
+        400: {"description": "Не заданы фильтры или поля для обновления"},
+    },
+)
+async def bulk_update_creatures(
+    creature_update: CreatureUpdate,
+    conditions: list = Depends(_resolve_bulk_filters),
+    dry_run: bool = Query(
+        False, description="Только посчитать подходящих существ, ничего не меняя"
+    ),
+    db: AsyncSession = Depends(get_db),
+):
+    """Массово обновляет существ, подходящих под фильтры, одним UPDATE.
+
+    Args:
+        creature_update (CreatureUpdate): Поля для обновления.
+        conditions (list): Условия отбора (q, category, min_danger, max_danger).
+        dry_run (bool): Если True, возвращает только количество подходящих существ.
+        db (AsyncSession): Асинхронная сессия базы данных.
+
+    Returns:
+        dict: Сообщение, количество затронутых существ и признак пробного запуска.
+
+    Raises:
+        HTTPException: Если не заданы фильтры или поля для обновления (400).
+
+    Examples:
+        - `PATCH /beastiary/bulk?category=Раса` с телом `{"status": "Вымерли"}`.
+    """
+    values = update_to_values(creature_update)
+    if not values:
+        raise HTTPException(status_code=400, detail="Не заданы поля для обновления")
+
+    if dry_run:
+        affected = await db.scalar(select(func.count(CreatureDB.id)).filter(*conditions))
+        return {
+            "Сообщение": "Пробный запуск: изменения не применены",
+            "Затронуто": affected,
+            "Пробный_запуск": True,
+        }
+
+    result = await db.execute(
+        update(CreatureDB)
+        .where(*conditions)
+        .values(**values)
+        .returning(CreatureDB)
+        .execution_options(synchronize_session=False, populate_existing=True)
+    )
+    updated = result.scalars().all()
+    await db.commit()
+    publish(db, "update", updated)
+    logger.info(f"Массовое обновление: затронуто {len(updated)} существ")
+    return {
+        "Сообщение": "Существа обновлены",
+        "Затронуто": len(updated),
+        "Пробный_запуск": False,
+    }
+
+
+@router.delete(
+    "/bulk",
+    dependencies=[Depends(require_writable)],
+    response_model=BulkOperationResponse,
+    summary="Массово удалить существ",
+    description="Удаляет всех существ, подходящих под фильтры поиска, одним запросом.",
+    response_description="Количество удалённых существ.",
+    responses={
+        200: {"description": "Существа успешно удалены"},
+        400: {"description": "Не заданы фильтры"},
+    },
+)
+async def bulk_remove_creatures(
+    conditions: list = Depends(_resolve_bulk_filters),
+    dry_run: bool = Query(
+        False, description="Только посчитать подходящих существ, ничего не удаляя"
+    ),
+    db: AsyncSession = Depends(get_db),
+):
+    """Массово удаляет существ, подходящих под фильтры, одним DELETE.
+
+    Args:
+        conditions (list): Условия отбора (q, category, min_danger, max_danger).
+        dry_run (bool): Если True, возвращает только количество подходящих существ.
+        db (AsyncSession): Асинхронная сессия базы данных.
+
+    Returns:
+        dict: Сообщение, количество затронутых существ и признак пробного запуска.
+
+    Raises:
+        HTTPException: Если не заданы фильтры (400).
+
+    Examples:
+        - `DELETE /beastiary/bulk?max_danger=4` - изгнать всех существ с опасностью ниже 5.
+    """
+    if dry_run:
+        affected = await db.scalar(select(func.count(CreatureDB.id)).filter(*conditions))
+        return {
+            "Сообщение": "Пробный запуск: изменения не применены",
+            "Затронуто": affected,
+            "Пробный_запуск": True,
+        }
+
+    result = await db.execute(
+        delete(CreatureDB)
+        .where(*conditions)
+        .returning(CreatureDB)
+        .execution_options(synchronize_session=False)
+    )
+    removed = result.scalars().all()
+    await prune_tombstones_periodically(db)
+    await db.commit()
+    publish(db, "remove", removed)
+    logger.info(f"Массовое удаление: затронуто {len(removed)} существ")
+    return {
+        "Сообщение": "Существа удалены из бестиария",
+        "Затронуто": len(removed),
+        "Пробный_запуск": False,
+    }
+
+
+@router.get(
+    "/feed",
+    summary="Лента изменений",
+    description="Поток Server-Sent Events с изменениями бестиария (add, upsert, update, remove).",
+    response_description="Поток событий text/event-stream.",
+    response_class=StreamingResponse,
+    responses={
+        200: {
+            "description": "Поток событий открыт",
+            "content": {"text/event-stream": {}},
+        },
+        501: {"description": "Лента недоступна при нескольких воркерах"},
+        503: {"description": "Достигнут предел числа подписчиков"},
+    },
+)
+async def stream_changes(
+    since: int = Query(
+        None, ge=0, description="Номер последнего полученного события (для возобновления)"
+    ),
+    last_event_id: int = Header(
+        None, description="Стандартный заголовок SSE для возобновления потока"
+    ),
+    db: AsyncSession = Depends(get_db),
+):
+    """Открывает поток изменений бестиария в формате Server-Sent Events.
+
+    Каждое событие содержит номер (`id`), тип (`event`: add, upsert, update
+    или remove) и данные существа (`data`). Чтобы продолжить после обрыва,
+    передайте номер последнего события в `since` или `Last-Event-ID`.
+    Событие `reset` означает, что пропущенные изменения уже не хранятся и
+    бестиарий нужно перечитать целиком; `evicted` - что клиент читал
+    слишком медленно и был отключён (можно переподключиться с указанным
+    номером).
+
+    Лента живёт в памяти процесса и нумерует события своего воркера: при
+    нескольких воркерах (BEASTIARY_WORKERS > 1) клиент видел бы только
+    часть записей, а номера событий разных воркеров не сравнимы. Поэтому
+    тогда лента отвечает 501, а изменения всех процессов читаются через
+    /changes (номера изменений из самой базы).
+
+    Args:
+        since (int, optional): Номер последнего полученного события.
+        last_event_id (int, optional): То же из заголовка Last-Event-ID.
+        db (AsyncSession): Асинхронная сессия базы данных (определяет ленту).
+
+    Returns:
+        StreamingResponse: Бесконечный поток text/event-stream.
+
+    Raises:
+        HTTPException: Если воркеров несколько (501) или достигнут предел
+            числа подписчиков (503).
+    """
+    if config.WORKERS > 1:
+        raise HTTPException(
+            status_code=501,
+            detail=(
+                "Лента недоступна при нескольких воркерах: "
+                "используйте /beastiary/changes"
+            ),
+        )
+    feed = get_feed(database_key(db))
+    if since is None:
+        since = last_event_id
+    try:
+        feed.check_capacity()
+    except FeedFull:
+        raise HTTPException(
+            status_code=503,
+            detail="Слишком много подписчиков ленты",
+            headers={"Retry-After": "5"},
+        )
+    return StreamingResponse(
+        # Без since - с текущего события, даже если поток начнут читать позже
+        stream_events(feed, feed.seq if since is None else since),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get(
+    "/changes",
+    summary="Изменения для синхронизации",
+    description="Существа, изменённые и удалённые после номера since, в формате NDJSON.",
+    response_description="Поток строк application/x-ndjson.",
+    response_class=StreamingResponse,
+    responses={
+        200: {
+            "description": "Изменения после since (пустое тело - изменений нет)",
+            "content": {NDJSON_MEDIA_TYPE: {}},
+        },
+        410: {
+            "description": "since больше последнего номера или старше хранимых "
+            "надгробий: нужна полная синхронизация"
+        },
+    },
+)
+async def get_changes_since(
+    since: int = Query(0, ge=0, description="Последний номер изменения у клиента"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Отдаёт изменения бестиария после номера since для зеркал.
+
+    Каждая запись в бестиарий получает следующий номер изменения, а
+    удалённые существа оставляют надгробие с номером. Ответ - строки
+    {"Номер", "Действие": "upsert", "Существо"} или {"Номер", "Действие":
+    "remove", "Имя"} по возрастанию номера; заголовок X-Change-Seq -
+    номер, который нужно передать в since при следующей синхронизации.
+    since=0 - все существа (первая синхронизация). Надгробия хранятся
+    CHANGES_TOMBSTONE_RETENTION_DAYS дней: зеркалу, не синхронизировавшемуся
+    дольше, удаления уже не отдать.
+
+    Args:
+        since (int): Последний номер изменения, который есть у клиента.
+        db (AsyncSession): Асинхронная сессия базы данных (определяет базу).
+
+    Returns:
+        StreamingResponse: Поток строк NDJSON.
+
+    Raises:
+        HTTPException: Если since больше последнего номера базы (410):
+            база восстановлена из более старой копии, или надгробия после
+            since уже удалены по сроку (410) - зеркало нужно перестроить с
+            since=0.
+    """
+    try:
+        latest, lines = await open_changes(db.bind, since, serialize_creature)
+    except AheadOfServer as e:
+        raise HTTPException(
+            status_code=410,
+            detail=f"Последний номер изменения {e.latest}: выполните полную синхронизацию (since=0)",
+        )
+    except HistoryPruned as e:
+        raise HTTPException(
+            status_code=410,
+            detail=f"Удаления до номера {e.pruned_through} уже не хранятся: выполните полную синхронизацию (since=0)",
+        )
+    return ndjson_response(lines, headers={"X-Change-Seq": str(latest)})
@@ -0,0 +1,226 @@
+from random import choice
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+import config
+from models.models_for_docs import (
+    ListBestiaryResponse,
+    SearchCreaturesResponse,
+    SuggestResponse,
+    CreaturesByCategoryResponse,
+    CategoriesResponse,
+    DangerousCreaturesResponse,
+    RandomCreatureResponse,
+    StatsResponse,
+    CreatureInfoResponse,
+)
+from routers.beastiary import FUZZY_LIMIT, compute_facets
+from services.media import media_prefetcher
+from services.memory_store import MemoryStore, memory_serving
+from services.ndjson import iterate_payloads, ndjson_response, wants_ndjson
+from services.popularity import view_counters
+from services.serialization import respond
+
+# Маршруты режима BEASTIARY_SERVING_MODE=memory. Подключаются раньше
+# routers.beastiary и перекрывают его GET-маршруты с теми же путями, а в
+# документации остаются описания исходных маршрутов (include_in_schema=False).
+# Ответы и ошибки совпадают с версиями, которые читают базу данных; ответы
+# хранилища построены serialize_creature и отдаются без повторной проверки.
+# Хранилище строится только из основной базы: запросы к другим бестиариям
+# (X-Bestiary-Tenant) в этом режиме отклоняются.
+def _main_bestiary_only(x_bestiary_tenant: str = Header(None)):
+    if x_bestiary_tenant:
+        raise HTTPException(
+            status_code=400,
+            detail="В режиме чтения из памяти доступен только основной бестиарий",
+        )
+
+
+router = APIRouter(
+    include_in_schema=False, dependencies=[Depends(_main_bestiary_only)]
+)
+
+
+def _store() -> MemoryStore:
+    store = memory_serving.store
+    if store is None:
+        raise HTTPException(status_code=503, detail="Хранилище ещё не загружено")
+    return store
+
+
+@router.get("/list", response_model=ListBestiaryResponse)
+async def list_bestiary(
+    limit: int = Query(10, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    accept: str = Header(None),
+):
+    store = _store()
+    creatures = store.payloads[offset : offset + limit]
+    if not creatures:
+        raise HTTPException(status_code=404, detail="Существа не найдены")
+    if wants_ndjson(accept):
+        return ndjson_response(
+            iterate_payloads(creatures), headers={"X-Total-Count": str(len(store))}
+        )
+    return respond(
+        {
+            "Существа": creatures,
+            "Всего": len(store),
+            "Лимит": limit,
+            "Смещение": offset,
+        }
+    )
+
+
+@router.get(
+    "/info/{creature_name}",
+    response_model=CreatureInfoResponse,
+    response_model_exclude_unset=True,
+)
+async def get_creature_info(
+    creature_name: str, request: Request, media: bool = Query(False)
+):
+    store = _store()
+    row = store.by_name.get(creature_name)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Существо не найдено в бестиарии!")
+    if memory_serving.bind is not None:
+        view_counters.record_view(request.scope, memory_serving.bind, creature_name)
+    if media:
+        # Готовый ответ общий для всех запросов - дополняем копию
+        response = dict(store.payloads[row])
+        response["Медиа"] = media_prefetcher.describe(response)
+        return respond(response)
+    return respond(store.payloads[row])
+
+
+@router.get(
+    "/search",
+    response_model=SearchCreaturesResponse,
+    response_model_exclude_unset=True,
+)
+async def search_creatures(
+    q: str = Query(None, min_length=1),
+    category: str = Query(None),
+    min_danger: int = Query(None, ge=0, le=100),
+    max_danger: int = Query(None, ge=0, le=100),
+    fuzzy: bool = Query(False),
+    facets: bool = Query(False),
+    accept: str = Header(None),
+):
+    store = _store()
+    rows = store.danger_range(min_danger, max_danger)
+    if category:
+        code = store.categories.index(category) if category in store.categories else -1
+        rows = [row for row in rows if store.category_codes[row] == code]
+    if q and fuzzy:
+        allowed = set(rows)
+
+        async def matching(names: list) -> dict:
+            return {
+                name: store.by_name[name]
+                for name in names
+                if store.by_name[name] in allowed
+            }
+
+        # Тот же расширяющийся круг кандидатов, что и в режиме базы данных
+        filtered = category is not None or min_danger is not None or max_danger is not None
+        rows = await store.name_index.search_filtered(q, matching, FUZZY_LIMIT, filtered)
+    elif q:
+        prefix = q.casefold()
+        rows = [row for row in rows if store.folded_names[row].startswith(prefix)]
+
+    if not rows:
+        raise HTTPException(
+            status_code=404, detail="Существа с заданным фильтрам не найдены"
+        )
+    if wants_ndjson(accept):
+        return ndjson_response(iterate_payloads([store.payloads[row] for row in rows]))
+    response = {"Существа": [store.payloads[row] for row in rows]}
+    if facets:
+        response["Фасеты"] = compute_facets([store.facet_row(row) for row in rows])
+    return respond(response)
+
+
+@router.get("/suggest", response_model=SuggestResponse)
+async def suggest_creatures(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=50),
+    by: str = Query("name", pattern="^(name|danger)$"),
+):
+    return {"Подсказки": _store().name_index.suggest(q, limit=limit, by=by)}
+
+
+@router.get("/category/{category_name}", response_model=CreaturesByCategoryResponse)
+async def get_creatures_by_category(category_name: str, accept: str = Header(None)):
+    store = _store()
+    rows = store.by_category.get(category_name)
+    if not rows:
+        raise HTTPException(
+            status_code=404, detail=f"Нет существ в категории '{category_name}'"
+        )
+    if wants_ndjson(accept):
+        return ndjson_response(iterate_payloads([store.payloads[row] for row in rows]))
+    return respond({"Существа": [store.payloads[row] for row in rows]})
+
+
+@router.get("/categories", response_model=CategoriesResponse)
+async def get_categories():
+    store = _store()
+    return {
+        "categories": [
+            {"Имя": category, "Количество": len(rows)}
+            for category, rows in sorted(store.by_category.items())
+        ]
+    }
+
+
+@router.get("/dangerous", response_model=DangerousCreaturesResponse)
+async def get_dangerous_creatures(
+    min: int = Query(0, ge=0, le=100),
+    max: int = Query(100, ge=0, le=100),
+    accept: str = Header(None),
+):
+    store = _store()
+    rows = store.danger_range(min, max)
+    if wants_ndjson(accept):
+        return ndjson_response(iterate_payloads([store.payloads[row] for row in rows]))
+    return respond({"Опасные_существа": [store.payloads[row] for row in rows]})
+
+
+@router.get("/random", response_model=RandomCreatureResponse)
+async def get_random_creature(category: str = Query(None)):
+    store = _store()
+    if category:
+        rows = store.by_category.get(category)
+        if not rows:
+            raise HTTPException(
+                status_code=404, detail=f"В категории '{category}' нет существ!"
+            )
+        return respond({"Существо": store.payloads[choice(rows)]})
+    if not len(store):
+        raise HTTPException(status_code=404, detail="Бестиарий пуст")
+    return respond({"Существо": choice(store.payloads)})
+
+
+@router.get("/stats", response_model=StatsResponse)
+async def get_beastiary_stats():
+    store = _store()
+    if not len(store):
+        return {
+            "Общее_количество": 0,
+            "Средний_уровень": 0.0,
+            "Самое_безопасное": None,
+            "Самое_опасное": None,
+        }
+    least, most = store.danger_order[0], store.danger_order[-1]
+    return {
+        "Общее_количество": len(store),
+        "Средний_уровень": round(sum(store.danger) / len(store), 1),
+        "Самое_безопасное": {
+            "Имя": store.names[least],
+            "Уровень_опасности": store.danger[least],
+        },
+        "Самое_опасное": {
+            "Имя": store.names[most],
+            "Уровень_опасности": store.danger[most],
+        },
+    }
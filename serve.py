@@ -0,0 +1,56 @@
+"""Запуск API в нескольких процессах-воркерах.
+
+    python serve.py --workers 4 --port 8000
+
+Перед стартом воркеров база переводится в режим WAL (читатели не
+блокируют писателя и друг друга) и приводится к текущей версии схемы - чтобы воркеры
+не создавали таблицы наперегонки. Каждый воркер следит за PRAGMA
+data_version и сбрасывает свои кэши в памяти после записи в других
+процессах.
+"""
+
+import argparse
+import asyncio
+import os
+import sqlite3
+import uvicorn
+from database import engine
+from services.schema import ensure_schema
+
+
+def prepare_database():
+    """Включает WAL и обновляет схему до запуска воркеров."""
+
+    async def migrate():
+        await ensure_schema(engine)
+        await engine.dispose()
+
+    asyncio.run(migrate())
+    # Режим WAL сохраняется в файле базы и действует для всех соединений
+    connection = sqlite3.connect(engine.url.database)
+    try:
+        connection.execute("PRAGMA journal_mode=WAL")
+    finally:
+        connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бестиарий Лавкрафта: несколько воркеров")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Число процессов (по умолчанию - число ядер)",
+    )
+    args = parser.parse_args()
+
+    prepare_database()
+    # Воркеры наследуют окружение и по нему включают отслеживание записи
+    os.environ["BEASTIARY_WORKERS"] = str(args.workers)
+    uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
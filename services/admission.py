@@ -0,0 +1,309 @@
+import asyncio
+import json
+import logging
+import math
+import re
+import time
+from collections import deque
+from urllib.parse import parse_qs
+from config import ADMISSION_LIMITS
+
+logger = logging.getLogger(__name__)
+
+# Сколько корзин клиентов держать до чистки простаивающих
+MAX_BUCKETS = 10000
+
+# Классы маршрутов: (метод, путь, класс). Первое совпадение выигрывает;
+# маршруты без класса (лента, скачивание готовых файлов) не ограничиваются.
+ROUTE_CLASSES = [
+    ("GET", re.compile(r"^/beastiary/feed$"), None),
+    ("GET", re.compile(r"^/beastiary/export/jobs/[^/]+/download$"), None),
+    # Сам пакет не ограничивается: каждый его подзапрос проходит допуск как
+    # обычный запрос своего класса (токен и слот)
+    ("POST", re.compile(r"^/beastiary/batch$"), None),
+    ("GET", re.compile(r"^/beastiary/export$"), "heavy"),
+    ("POST", re.compile(r"^/beastiary/export/jobs$"), "heavy"),
+    ("GET", re.compile(r"^/beastiary/dangerous$"), "heavy"),
+    (None, re.compile(r"^/beastiary/bulk$"), "heavy"),
+    (None, re.compile(r"^/beastiary/backup$"), "heavy"),
+    # Холодный кэш колонок - чтение всей таблицы
+    ("GET", re.compile(r"^/beastiary/stats/distribution$"), "heavy"),
+    (None, re.compile(r"^/beastiary/"), "cheap"),
+]
+
+
+class Rejected(Exception):
+    """Запрос не допущен: status_code 429 или 503, retry_after в секундах."""
+
+    def __init__(self, status_code: int, retry_after: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.detail = detail
+
+
+def classify(method: str, path: str, query_string: bytes = b"") -> str:
+    """Класс маршрута для ограничений ('cheap', 'heavy') или None.
+
+    Поиск без фильтра по имени или категории и первая синхронизация
+    (/changes без since) просматривают всю таблицу, поэтому считаются
+    тяжёлыми.
+    """
+    if path == "/beastiary/search":
+        params = parse_qs(query_string.decode("latin-1"))
+        return "cheap" if params.get("q") or params.get("category") else "heavy"
+    if path == "/beastiary/changes":
+        since = parse_qs(query_string.decode("latin-1")).get("since", ["0"])[0]
+        return "heavy" if since.strip("0") == "" else "cheap"
+    for rule_method, pattern, endpoint_class in ROUTE_CLASSES:
+        if (rule_method is None or rule_method == method) and pattern.match(path):
+            return endpoint_class
+    return None
+
+
+class TokenBucket:
+    """Корзина токенов: rate токенов в секунду, не больше burst."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """Забирает токен. Возвращает 0 или сколько секунд ждать следующего."""
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def is_full(self, now: float) -> bool:
+        return self.tokens + (now - self.updated) * self.rate >= self.burst
+
+
+class ConcurrencyLimiter:
+    """Ограничение числа одновременных запросов с ограниченной очередью.
+
+    Освободившийся слот передаётся первому ждущему напрямую, поэтому
+    очередь обслуживается по порядку и новые запросы её не обгоняют.
+    """
+
+    def __init__(self, concurrency: int, queue_size: int, timeout: float):
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self.waiters = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self.waiters)
+
+    async def acquire(self) -> bool:
+        """Занимает слот.
+
+        Returns:
+            bool: True, если запросу пришлось ждать в очереди.
+
+        Raises:
+            Rejected: Очередь заполнена или ожидание дольше timeout (503).
+        """
+        if self.active < self.concurrency and not self.waiters:
+            self.active += 1
+            return False
+        if len(self.waiters) >= self.queue_size:
+            raise Rejected(503, 1, "Сервер перегружен, повторите позже")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.timeout)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # Слот передан в момент истечения ожидания - он уже наш
+                return True
+            self.waiters.remove(waiter)
+            waiter.cancel()
+            raise Rejected(
+                503, math.ceil(self.timeout), "Сервер перегружен, повторите позже"
+            )
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                self.waiters.remove(waiter)
+                waiter.cancel()
+            raise
+        return True
+
+    def release(self):
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                # Слот переходит ждущему, active не меняется
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+class EndpointClass:
+    """Лимиты и счётчики одного класса маршрутов."""
+
+    def __init__(
+        self,
+        name: str,
+        concurrency: int,
+        queue: int,
+        rate: float,
+        burst: float,
+        timeout: float,
+    ):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.limiter = ConcurrencyLimiter(concurrency, queue, timeout)
+        self.buckets = {}
+        self.admitted = 0
+        self.queued_total = 0
+        self.rejected_rate = 0
+        self.rejected_overload = 0
+
+    def _bucket(self, client: str, now: float) -> TokenBucket:
+        bucket = self.buckets.get(client)
+        if bucket is None:
+            if len(self.buckets) >= MAX_BUCKETS:
+                # Полные корзины ничем не отличаются от новых - их можно забыть
+                self.buckets = {
+                    key: value
+                    for key, value in self.buckets.items()
+                    if not value.is_full(now)
+                }
+            bucket = self.buckets[client] = TokenBucket(self.rate, self.burst, now)
+        return bucket
+
+    def charge(self, client: str):
+        """Забирает токен из корзины клиента.
+
+        Raises:
+            Rejected: 429 при превышении частоты.
+        """
+        if self.rate > 0:
+            now = time.monotonic()
+            wait = self._bucket(client, now).take(now)
+            if wait:
+                self.rejected_rate += 1
+                raise Rejected(
+                    429, math.ceil(wait), "Слишком много запросов, повторите позже"
+                )
+
+    async def admit(self, client: str):
+        """Проверяет лимит частоты клиента и занимает слот.
+
+        Raises:
+            Rejected: 429 при превышении частоты, 503 при перегрузке.
+        """
+        self.charge(client)
+        try:
+            queued = await self.limiter.acquire()
+        except Rejected:
+            self.rejected_overload += 1
+            raise
+        self.admitted += 1
+        self.queued_total += queued
+
+    def stats(self) -> dict:
+        return {
+            "Класс": self.name,
+            "Лимит_параллельности": self.limiter.concurrency,
+            "Выполняется": self.limiter.active,
+            "В_очереди": self.limiter.queued,
+            "Принято": self.admitted,
+            "Ожидали_в_очереди": self.queued_total,
+            "Отклонено_лимитом_частоты": self.rejected_rate,
+            "Отклонено_перегрузкой": self.rejected_overload,
+        }
+
+
+class AdmissionController:
+    """Классы маршрутов с их лимитами (по умолчанию из config.ADMISSION_LIMITS)."""
+
+    def __init__(self, limits: dict = ADMISSION_LIMITS):
+        self.limits = limits
+        self.reset()
+
+    def reset(self):
+        """Сбрасывает очереди, корзины и счётчики."""
+        self.classes = {
+            name: EndpointClass(name, **limits) for name, limits in self.limits.items()
+        }
+
+    def stats(self) -> list:
+        return [endpoint_class.stats() for endpoint_class in self.classes.values()]
+
+
+class AdmissionMiddleware:
+    """ASGI-middleware допуска запросов.
+
+    Слот занимается до конца отправки ответа, в том числе потокового,
+    поэтому долгий экспорт держит его всё время передачи.
+    """
+
+    def __init__(self, app, controller: AdmissionController = None):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        controller = self.controller or admission
+        endpoint_class = None
+        if scope["type"] == "http":
+            name = classify(scope["method"], scope["path"], scope["query_string"])
+            endpoint_class = controller.classes.get(name)
+        if endpoint_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        client = _client(scope)
+        try:
+            await endpoint_class.admit(client)
+        except Rejected as e:
+            logger.warning(
+                f"Запрос {scope['method']} {scope['path']} от {client} отклонён: "
+                f"{e.status_code} ({endpoint_class.name})"
+            )
+            await _reject(send, e)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            endpoint_class.limiter.release()
+
+
+def _client(scope) -> str:
+    return scope["client"][0] if scope.get("client") else "unknown"
+
+
+async def _reject(send, error: Rejected):
+    body = json.dumps({"detail": error.detail}, ensure_ascii=False).encode("utf-8")
+    await send(
+        {
+            "type": "http.response.start",
+            "status": error.status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(error.retry_after).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+# Общий контроллер допуска процесса
+admission = AdmissionController()
@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+from config import (
+    BACKUP_DIR,
+    BACKUP_KEEP,
+    BACKUP_MAX_RESTARTS,
+    BACKUP_PAGES,
+    BACKUP_STEP_SLEEP,
+)
+
+logger = logging.getLogger(__name__)
+
+# Имена снимков: bestiary-20250101-120000-000000.db (сортируются по времени)
+BACKUP_PREFIX = "bestiary-"
+BACKUP_SUFFIX = ".db"
+MEDIA_TYPE = "application/vnd.sqlite3"
+
+
+class _TooManyRestarts(Exception):
+    """Прерывает пошаговое копирование, которое запись перезапускает снова и снова."""
+
+
+def backup_file(
+    source: str,
+    target: str,
+    pages: int = BACKUP_PAGES,
+    sleep: float = BACKUP_STEP_SLEEP,
+    max_restarts: int = BACKUP_MAX_RESTARTS,
+) -> dict:
+    """Копирует базу SQLite в target через онлайн-API резервного копирования.
+
+    Копирование идёт шагами по pages страниц с паузой sleep между ними:
+    блокировка чтения держится только на время шага, и писатели успевают
+    закоммитить между шагами. Если базу изменили через другое соединение,
+    SQLite начинает копирование заново, так что снимок всегда согласован.
+    При постоянной записи оно могло бы не закончиться никогда: после
+    max_restarts перезапусков база копируется за один шаг.
+
+    Args:
+        source (str): Путь к файлу базы данных.
+        target (str): Путь к файлу снимка (перезаписывается).
+        pages (int): Страниц за шаг (<= 0 - всё за один шаг).
+        sleep (float): Пауза между шагами в секундах.
+        max_restarts (int): Сколько перезапусков допустимо до копирования
+            за один шаг.
+
+    Returns:
+        dict: Размер снимка, число страниц, шагов, перезапусков и длительность.
+    """
+    started = time.perf_counter()
+    steps = 0
+    restarts = 0
+    last_remaining = None
+
+    def progress(status, remaining, total):
+        nonlocal steps, restarts, last_remaining
+        steps += 1
+        # Успешный шаг уменьшает остаток; не уменьшил - копирование началось заново
+        if (
+            status == sqlite3.SQLITE_OK
+            and last_remaining is not None
+            and remaining >= last_remaining
+        ):
+            restarts += 1
+            if restarts > max_restarts:
+                raise _TooManyRestarts
+        last_remaining = remaining
+        if remaining and status == sqlite3.SQLITE_OK and sleep > 0:
+            # sqlite3 ждёт sleep только после SQLITE_BUSY, а между успешными
+            # шагами держит GIL: пауза здесь даёт писателям закоммитить
+            time.sleep(sleep)
+
+    source_connection = sqlite3.connect(source)
+    target_connection = sqlite3.connect(target)
+    try:
+        try:
+            source_connection.backup(
+                target_connection, pages=pages, progress=progress, sleep=sleep
+            )
+        except _TooManyRestarts:
+            logger.warning(
+                f"Копирование {source} перезапущено {restarts} раз из-за "
+                f"записи в базу: снимок копируется за один шаг"
+            )
+            last_remaining = None
+            # Один шаг держит блокировку чтения до конца и не перезапускается
+            source_connection.backup(target_connection, pages=-1, progress=progress)
+        page_count = target_connection.execute("PRAGMA page_count").fetchone()[0]
+    finally:
+        target_connection.close()
+        source_connection.close()
+    return {
+        "Размер": os.path.getsize(target),
+        "Страниц": page_count,
+        "Шагов": steps,
+        "Перезапусков": restarts,
+        "Длительность": round(time.perf_counter() - started, 3),
+    }
+
+
+def list_backups(directory: str = BACKUP_DIR) -> list:
+    """Имена снимков в каталоге, от старых к новым."""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        name
+        for name in os.listdir(directory)
+        if name.startswith(BACKUP_PREFIX) and name.endswith(BACKUP_SUFFIX)
+    )
+
+
+def prune_backups(directory: str = BACKUP_DIR, keep: int = BACKUP_KEEP) -> list:
+    """Удаляет старые снимки, оставляя keep последних.
+
+    Returns:
+        list: Имена удалённых снимков.
+    """
+    names = list_backups(directory)
+    removed = names[: max(len(names) - keep, 0)]
+    for name in removed:
+        os.remove(os.path.join(directory, name))
+    return removed
+
+
+def write_backup(
+    source: str,
+    directory: str = BACKUP_DIR,
+    keep: int = BACKUP_KEEP,
+    pages: int = BACKUP_PAGES,
+) -> dict:
+    """Создаёт снимок в каталоге и удаляет лишние старые.
+
+    Снимок пишется во временный файл и переименовывается после успешного
+    копирования: в каталоге не бывает недописанных снимков.
+
+    Returns:
+        dict: Описание снимка (см. backup_file) с ключами 'Файл' и 'Удалено'.
+    """
+    os.makedirs(directory, exist_ok=True)
+    name = f"{BACKUP_PREFIX}{datetime.now():%Y%m%d-%H%M%S-%f}{BACKUP_SUFFIX}"
+    path = os.path.join(directory, name)
+    tmp_path = path + ".tmp"
+    try:
+        info = backup_file(source, tmp_path, pages=pages)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    removed = prune_backups(directory, keep)
+    logger.info(f"Снимок базы {path}: {info['Размер']} байт за {info['Длительность']} с")
+    return {"Файл": name, **info, "Удалено": removed}
+
+
+class Backups:
+    """Снимки базы данных: в каталог с ограничением числа или во временный файл."""
+
+    def __init__(
+        self,
+        directory: str = BACKUP_DIR,
+        keep: int = BACKUP_KEEP,
+        pages: int = BACKUP_PAGES,
+    ):
+        self.directory = directory
+        self.keep = keep
+        self.pages = pages
+
+    async def create(self, bind) -> dict:
+        """Снимок базы движка bind в каталог (копирование - в отдельном потоке)."""
+        return await asyncio.to_thread(
+            write_backup, bind.url.database, self.directory, self.keep, self.pages
+        )
+
+    async def to_temp(self, bind) -> str:
+        """Снимок базы движка bind во временный файл для скачивания.
+
+        Returns:
+            str: Путь к файлу; удалить его должен вызывающий.
+        """
+        handle, path = tempfile.mkstemp(prefix=BACKUP_PREFIX, suffix=BACKUP_SUFFIX)
+        os.close(handle)
+        try:
+            await asyncio.to_thread(
+                backup_file, bind.url.database, path, self.pages
+            )
+        except BaseException:
+            os.remove(path)
+            raise
+        return path
+
+
+# Общие настройки снимков
+backups = Backups()
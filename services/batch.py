@@ -0,0 +1,104 @@
+import asyncio
+import json
+import logging
+import re
+from urllib.parse import quote, unquote, urlsplit
+from services.tenants import TENANT_PATH
+
+logger = logging.getLogger(__name__)
+
+# Маршруты чтения, доступные в /beastiary/batch. Не входят потоковые ответы
+# (лента, экспорт, снимок базы, файлы) и сам /batch. Перед маршрутом может
+# стоять /tenants/{имя}: подзапрос уйдёт в этот бестиарий
+BATCH_PATHS = re.compile(
+    r"^/beastiary/("
+    r"list|info/[^/]+|search|suggest|category/[^/]+|categories|dangerous|random"
+    r"|stats|stats/distribution|top"
+    r")$"
+)
+# Заголовки, которые подзапрос не наследует от запроса /batch
+_SKIPPED_HEADERS = (b"content-length", b"content-type", b"accept", b"accept-encoding")
+
+
+def _sub_scope(scope, path: str, query_string: bytes) -> dict:
+    """Scope GET-подзапроса с заголовками и адресом клиента исходного запроса."""
+    headers = [
+        (name, value)
+        for name, value in scope["headers"]
+        if name not in _SKIPPED_HEADERS
+    ]
+    headers.append((b"accept", b"application/json"))
+    sub_scope = {
+        "type": "http",
+        "asgi": scope.get("asgi", {"version": "3.0"}),
+        "http_version": scope.get("http_version", "1.1"),
+        "method": "GET",
+        "scheme": scope.get("scheme", "http"),
+        "path": path,
+        "raw_path": quote(path).encode("ascii"),
+        "query_string": query_string,
+        "root_path": scope.get("root_path", ""),
+        "headers": headers,
+        "client": scope.get("client"),
+        "server": scope.get("server"),
+    }
+    if "state" in scope:
+        sub_scope["state"] = dict(scope["state"])
+    return sub_scope
+
+
+async def dispatch(app, scope, url: str) -> tuple:
+    """Выполняет GET-подзапрос url внутри процесса через ASGI-приложение app.
+
+    Подзапрос проходит те же middleware, что и обычный запрос (допуск,
+    объединение одинаковых запросов), и получает своё соединение из пула.
+
+    Returns:
+        tuple: (код ответа, тело ответа - разобранный JSON или текст).
+    """
+    parts = urlsplit(url)
+    path = unquote(parts.path)
+    tenant = TENANT_PATH.match(path)
+    # Префикс бестиария снимет TenantPathMiddleware, как у обычного запроса
+    if not BATCH_PATHS.match(tenant.group(2) if tenant else path):
+        return 400, {"detail": "Маршрут недоступен в пакетном запросе"}
+
+    status, chunks = 500, []
+    received = False
+    finished = asyncio.Event()
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    try:
+        # Параметры могут прийти без кодирования (например, кириллица)
+        query_string = quote(parts.query, safe="=&+%/:,;").encode("ascii")
+        await app(_sub_scope(scope, path, query_string), receive, send)
+    except Exception as e:
+        logger.error(f"Ошибка подзапроса {url}: {e}")
+        return 500, {"detail": "Внутренняя ошибка сервера"}
+    finally:
+        finished.set()
+
+    body = b"".join(chunks)
+    try:
+        return status, json.loads(body) if body else None
+    except ValueError:
+        return status, body.decode("utf-8", "replace")
+
+
+async def run_batch(app, scope, urls) -> list:
+    """Выполняет подзапросы одновременно; результаты - в порядке urls."""
+    return await asyncio.gather(*(dispatch(app, scope, url) for url in urls))
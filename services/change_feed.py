@@ -0,0 +1,185 @@
+import asyncio
+import json
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Размер очереди одного подписчика: переполнение означает медленного клиента
+SUBSCRIBER_QUEUE_SIZE = 256
+# Сколько последних событий хранится для возобновления по номеру
+HISTORY_SIZE = 4096
+# Максимальное число одновременных подписчиков одной базы данных
+MAX_SUBSCRIBERS = 10000
+# Интервал комментариев-пингов, чтобы прокси не закрывали соединение
+HEARTBEAT_SECONDS = 15.0
+
+
+class FeedFull(Exception):
+    """Достигнут предел числа подписчиков."""
+
+
+class FeedEvent:
+    """Событие ленты изменений, уже закодированное в формат SSE."""
+
+    __slots__ = ("seq", "action", "message")
+
+    def __init__(self, seq: int, action: str, data: dict):
+        self.seq = seq
+        self.action = action
+        payload = json.dumps(data, ensure_ascii=False)
+        # Кодируем один раз: одна и та же строка уходит всем подписчикам
+        self.message = f"id: {seq}\nevent: {action}\ndata: {payload}\n\n"
+
+
+class Subscriber:
+    """Подписчик с ограниченной очередью событий."""
+
+    def __init__(self, queue_size: int):
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.evicted = False
+        self.last_seq = 0
+
+
+class ChangeFeed:
+    """Лента изменений одной базы данных с историей для возобновления.
+
+    Каждый подписчик получает свою очередь ограниченного размера. Если
+    клиент не успевает читать и очередь переполняется, он отключается
+    (событие 'evicted') и может переподключиться с Last-Event-ID, не
+    замедляя остальных подписчиков и запись.
+    """
+
+    def __init__(
+        self,
+        queue_size: int = SUBSCRIBER_QUEUE_SIZE,
+        history_size: int = HISTORY_SIZE,
+        max_subscribers: int = MAX_SUBSCRIBERS,
+    ):
+        self.seq = 0
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.history = deque(maxlen=history_size)
+        self.subscribers = set()
+        self.evicted_total = 0
+
+    def publish(self, action: str, data: dict) -> FeedEvent:
+        """Публикует событие всем подписчикам без ожидания."""
+        self.seq += 1
+        event = FeedEvent(self.seq, action, data)
+        self.history.append(event)
+        for subscriber in list(self.subscribers):
+            try:
+                subscriber.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self._evict(subscriber)
+        return event
+
+    def _evict(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+        subscriber.evicted = True
+        self.evicted_total += 1
+        # Освобождаем очередь и будим читателя, чтобы он завершил поток
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(None)
+        logger.warning(
+            f"Медленный подписчик ленты отключён после события {subscriber.last_seq}"
+        )
+
+    def check_capacity(self):
+        """Проверяет, что новый подписчик поместится.
+
+        Raises:
+            FeedFull: Если достигнут предел числа подписчиков.
+        """
+        if len(self.subscribers) >= self.max_subscribers:
+            raise FeedFull()
+
+    def subscribe(self, since: int = None):
+        """Регистрирует подписчика.
+
+        Args:
+            since (int, optional): Номер последнего полученного события.
+
+        Returns:
+            tuple: (подписчик, события для догоняния или None, если история
+                уже не содержит событий после since).
+
+        Raises:
+            FeedFull: Если достигнут предел числа подписчиков.
+        """
+        self.check_capacity()
+        subscriber = Subscriber(self.queue_size)
+        subscriber.last_seq = self.seq
+        # Регистрация и снимок истории без await между ними: ни одно событие
+        # не попадёт одновременно в историю для догоняния и в очередь
+        self.subscribers.add(subscriber)
+        if since is None or since == self.seq:
+            return subscriber, []
+        oldest = self.history[0].seq if self.history else self.seq + 1
+        # since из будущего означает, что номера начались заново (перезапуск)
+        if since > self.seq or since + 1 < oldest:
+            return subscriber, None
+        subscriber.last_seq = since
+        return subscriber, [event for event in self.history if event.seq > since]
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+
+
+async def stream_events(feed: ChangeFeed, since: int = None):
+    """Асинхронный генератор сообщений SSE для одного подписчика.
+
+    Подписка выполняется при первом чтении генератора и снимается в
+    finally: если клиент ушёл раньше, чем ответ начал отправляться, очередь
+    не регистрируется и не копит события. События между запросом и первым
+    чтением не теряются - передайте в since номер feed.seq на момент запроса.
+
+    Args:
+        feed (ChangeFeed): Лента изменений.
+        since (int, optional): Номер последнего полученного клиентом события.
+
+    Yields:
+        str: Готовые сообщения в формате text/event-stream.
+    """
+    try:
+        subscriber, backlog = feed.subscribe(since)
+    except FeedFull:
+        # Места заняли между проверкой в запросе и началом потока
+        yield "event: full\ndata: \n\n"
+        return
+    try:
+        if backlog is None:
+            # История уже не покрывает разрыв: клиенту нужна полная выгрузка
+            yield f"id: {subscriber.last_seq}\nevent: reset\ndata: {subscriber.last_seq}\n\n"
+        else:
+            for event in backlog:
+                subscriber.last_seq = event.seq
+                yield event.message
+        while True:
+            try:
+                event = await asyncio.wait_for(
+                    subscriber.queue.get(), timeout=HEARTBEAT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if event is None:
+                yield f"event: evicted\ndata: {subscriber.last_seq}\n\n"
+                return
+            subscriber.last_seq = event.seq
+            yield event.message
+    finally:
+        feed.unsubscribe(subscriber)
+
+
+# Ленты по базам данных (ключ - URL движка)
+_feeds = {}
+
+
+def get_feed(key: str) -> ChangeFeed:
+    """Возвращает ленту изменений базы данных по её ключу."""
+    if key not in _feeds:
+        _feeds[key] = ChangeFeed()
+    return _feeds[key]
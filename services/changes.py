@@ -0,0 +1,86 @@
+import logging
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+# Подписчики на изменения: listener(key, action, creature)
+_listeners = []
+# Сброс кэшей базы данных: invalidator(key), key=None - сбросить всё
+_invalidators = []
+# Версии данных по базам: растут при каждой записи и каждом сбросе кэшей
+_versions = {}
+# Сколько раз менялась версия любой базы
+_generation = 0
+
+
+def database_key(db: AsyncSession) -> str:
+    """Ключ базы данных, к которой привязана сессия (URL движка)."""
+    return str(db.bind.url)
+
+
+def dataset_version(key: str) -> int:
+    """Текущая версия данных базы в этом процессе (для ключей кэшей и дедупликации)."""
+    return _versions.get(key, 0)
+
+
+def generation() -> int:
+    """Общий счётчик изменений всех баз процесса (растёт вместе с любой версией)."""
+    return _generation
+
+
+def _bump(key: str = None):
+    global _generation
+    _generation += 1
+    if key is None:
+        for known in list(_versions):
+            _versions[known] += 1
+    else:
+        _versions[key] = _versions.get(key, 0) + 1
+
+
+def on_change(listener):
+    """Регистрирует обработчик закоммиченных изменений (можно как декоратор).
+
+    Обработчик вызывается синхронно как listener(key, action, creature), где
+    action - 'add', 'upsert', 'update' или 'remove', а creature - строка CreatureDB.
+    """
+    _listeners.append(listener)
+    return listener
+
+
+def on_invalidate(invalidator):
+    """Регистрирует сброс кэша базы данных (можно как декоратор).
+
+    Вызывается как invalidator(key), когда данные изменились в обход
+    маршрутов этого процесса; key=None означает все базы данных.
+    """
+    _invalidators.append(invalidator)
+    return invalidator
+
+
+def publish(db: AsyncSession, action: str, creatures):
+    """Сообщает подписчикам о закоммиченных изменениях.
+
+    Args:
+        db (AsyncSession): Сессия, через которую выполнена запись.
+        action (str): 'add', 'upsert', 'update' или 'remove'.
+        creatures (list): Изменённые строки CreatureDB (после commit).
+    """
+    key = database_key(db)
+    _bump(key)
+    for creature in creatures:
+        for listener in _listeners:
+            try:
+                listener(key, action, creature)
+            except Exception as e:
+                # Ошибка кэша не должна ломать уже выполненную запись:
+                # сбрасываем кэши, и они перестроятся из базы данных
+                logger.error(f"Ошибка обработчика изменений {listener.__name__}: {e}")
+                invalidate(key)
+
+
+def invalidate(key: str = None):
+    """Сбрасывает кэши в памяти для базы данных (или для всех, если key=None)."""
+    _bump(key)
+    for invalidator in _invalidators:
+        invalidator(key)
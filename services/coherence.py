@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import sqlite3
+from config import COHERENCE_INTERVAL
+from services.changes import invalidate
+
+logger = logging.getLogger(__name__)
+
+
+class _Watched:
+    """Отдельное соединение с файлом базы и последние прочитанные номера."""
+
+    __slots__ = ("path", "connection", "data_version", "change", "version")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.connection = None
+        self.data_version = None
+        # Последний прочитанный номер изменения существ
+        self.change = None
+        # Номер, который видела последняя проверка
+        self.version = None
+
+    def read_version(self) -> int:
+        """Номер последнего изменения существ (change_sequence).
+
+        Таблица читается, только если data_version показал чужой коммит:
+        обычный опрос - одно обращение к заголовку файла.
+        """
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        data_version = self.connection.execute("PRAGMA data_version").fetchone()[0]
+        if data_version != self.data_version or self.change is None:
+            row = self.connection.execute(
+                "SELECT value FROM change_sequence WHERE id = 1"
+            ).fetchone()
+            self.data_version = data_version
+            self.change = row[0] if row else 0
+        return self.change
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+class DataVersionWatcher:
+    """Следит за записью в файлы SQLite из других процессов.
+
+    PRAGMA data_version на отдельном соединении меняется, когда коммит
+    сделало любое другое соединение с тем же файлом. Опрос стоит одного
+    обращения к уже открытому файлу, поэтому его можно делать часто.
+    Соединения пула этого процесса тоже считаются "другими": после своей
+    записи кэши сбрасываются не чаще одного раза за интервал опроса, а
+    перестраиваются лениво, при следующем чтении. Сбрасываются они, только
+    если вырос и номер изменения существ (change_sequence, его ведут
+    триггеры): запись просмотров (/top) кэши не трогает.
+
+    Кроме основной базы опрашиваются все открытые сейчас бестиарии
+    (tenants): закрытый бестиарий перестаёт опрашиваться, а только что
+    открытый в первый раз сбрасывает свои кэши - запись другого процесса
+    между открытием и первым опросом не останется незамеченной.
+    """
+
+    def __init__(self, bind, interval: float = COHERENCE_INTERVAL, tenants=None):
+        self.key = str(bind.url)
+        self.path = bind.url.database
+        self.interval = interval
+        self.tenants = tenants
+        self.invalidations = 0
+        # Ключ базы -> _Watched
+        self._watched = {self.key: _Watched(self.path)}
+        self._task = None
+
+    def _sync_tenants(self):
+        """Начинает опрос открытых бестиариев и прекращает опрос закрытых."""
+        if self.tenants is None:
+            return
+        engines = {
+            str(tenant.engine.url): tenant.engine
+            for tenant in list(self.tenants.engines.values())
+        }
+        for key in list(self._watched):
+            if key != self.key and key not in engines:
+                self._watched.pop(key).close()
+        for key, engine in engines.items():
+            if key not in self._watched:
+                self._watched[key] = _Watched(engine.url.database)
+
+    def _read_versions(self) -> dict:
+        return {key: watched.read_version() for key, watched in self._watched.items()}
+
+    async def check(self) -> bool:
+        """Сравнивает номера изменения с прошлыми; при изменении сбрасывает кэши.
+
+        Returns:
+            bool: True, если данные хоть одной базы изменились и её кэши сброшены.
+        """
+        self._sync_tenants()
+        versions = await asyncio.to_thread(self._read_versions)
+        changed = False
+        for key, version in versions.items():
+            watched = self._watched.get(key)
+            if watched is None:
+                # Бестиарий закрыли, пока читались версии
+                continue
+            first = watched.version is None
+            if (first and key != self.key) or (not first and version != watched.version):
+                self.invalidations += 1
+                invalidate(key)
+                changed = True
+            watched.version = version
+        return changed
+
+    async def start(self):
+        await self.check()
+        self._task = asyncio.create_task(self._watch())
+        logger.info(
+            f"Отслеживание записи других процессов: {self.path}, "
+            f"интервал {self.interval} с"
+        )
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check()
+            except Exception as e:
+                logger.error(f"Ошибка проверки версии данных: {e}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for watched in self._watched.values():
+            watched.close()
@@ -0,0 +1,251 @@
+"""Колоночный бинарный снимок бестиария (формат BSTC).
+
+Формат рассчитан на потоковую запись из курсора базы данных и чтение через
+mmap без разбора всего файла. Все числа little-endian, каждый буфер
+выровнен на 8 байт от начала файла.
+
+    +--------------------------------------------------+
+    | "BSTC" | версия: uint16 | зарезервировано: uint16 |  заголовок, 8 байт
+    +--------------------------------------------------+
+    | группа строк 0: буферы колонок                   |
+    | группа строк 1: ...                              |
+    +--------------------------------------------------+
+    | футер: JSON в UTF-8                              |
+    | длина футера: uint32 | "BSTC"                    |  последние 8 байт
+    +--------------------------------------------------+
+
+Футер описывает схему, словари и для каждой группы строк число строк и
+положение буферов каждой колонки ({"offset": ..., "length": ...}):
+
+- int32 / uint8: один буфер значений (array 'i' / 'B');
+- dict (category, status): буфер кодов uint16, значения - в
+  footer["dictionaries"][колонка][код];
+- utf8: три буфера - validity (uint8, 0 - NULL), offsets (uint32, n + 1
+  смещений) и data (байты UTF-8 всех значений подряд).
+
+Строковые колонки хранятся как в базе данных (abilities, related_works и
+relations - строки через запятую).
+"""
+
+import json
+import mmap
+import struct
+import sys
+from array import array
+from sqlalchemy import select
+from models.creature import CreatureDB
+from services import tenants
+
+MAGIC = b"BSTC"
+FORMAT_VERSION = 1
+MEDIA_TYPE = "application/vnd.bestiary.columnar"
+
+# Схема: (колонка CreatureDB, тип)
+SCHEMA = [
+    ("id", "int32"),
+    ("name", "utf8"),
+    ("description", "utf8"),
+    ("danger_level", "uint8"),
+    ("habitat", "utf8"),
+    ("quote", "utf8"),
+    ("category", "dict"),
+    ("abilities", "utf8"),
+    ("related_works", "utf8"),
+    ("image_url", "utf8"),
+    ("status", "dict"),
+    ("min_insanity", "uint8"),
+    ("relations", "utf8"),
+    ("audio_url", "utf8"),
+    ("video_url", "utf8"),
+]
+
+_TYPECODES = {"int32": "i", "uint8": "B", "dict": "H"}
+
+
+def _little_endian(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+class SnapshotWriter:
+    """Потоковый писатель снимка: заголовок, группы строк, футер.
+
+    Каждый метод возвращает готовые байты, поэтому писатель подходит и для
+    файла, и для StreamingResponse. В памяти держится только текущая группа.
+    """
+
+    def __init__(self):
+        self.offset = 0
+        self.row_groups = []
+        self.dictionaries = {name: {} for name, kind in SCHEMA if kind == "dict"}
+
+    def _emit(self, parts: list, data: bytes) -> dict:
+        """Добавляет буфер с выравниванием и возвращает его положение."""
+        buffer = {"offset": self.offset, "length": len(data)}
+        padding = -len(data) % 8
+        parts.append(data + b"\0" * padding)
+        self.offset += len(data) + padding
+        return buffer
+
+    def header(self) -> bytes:
+        data = MAGIC + struct.pack("<HH", FORMAT_VERSION, 0)
+        self.offset = len(data)
+        return data
+
+    def row_group(self, creatures: list) -> bytes:
+        """Кодирует группу строк CreatureDB в колонки."""
+        parts, columns = [], {}
+        for name, kind in SCHEMA:
+            values = [getattr(creature, name) for creature in creatures]
+            if kind == "utf8":
+                validity = array("B", (value is not None for value in values))
+                offsets, data, position = array("I", [0]), [], 0
+                for value in values:
+                    encoded = value.encode("utf-8") if value is not None else b""
+                    data.append(encoded)
+                    position += len(encoded)
+                    offsets.append(position)
+                columns[name] = [
+                    self._emit(parts, validity.tobytes()),
+                    self._emit(parts, _little_endian(offsets)),
+                    self._emit(parts, b"".join(data)),
+                ]
+            else:
+                if kind == "dict":
+                    codes = self.dictionaries[name]
+                    values = [codes.setdefault(value, len(codes)) for value in values]
+                values = array(_TYPECODES[kind], (value or 0 for value in values))
+                columns[name] = [self._emit(parts, _little_endian(values))]
+        self.row_groups.append({"rows": len(creatures), "columns": columns})
+        return b"".join(parts)
+
+    def footer(self) -> bytes:
+        footer = json.dumps(
+            {
+                "version": FORMAT_VERSION,
+                "schema": [{"name": name, "type": kind} for name, kind in SCHEMA],
+                "rows": sum(group["rows"] for group in self.row_groups),
+                "row_groups": self.row_groups,
+                "dictionaries": {
+                    name: list(codes) for name, codes in self.dictionaries.items()
+                },
+            },
+            ensure_ascii=False,
+        ).encode("utf-8")
+        return footer + struct.pack("<I", len(footer)) + MAGIC
+
+
+async def stream_columnar_snapshot(bind, batch_size: int = 1000):
+    """Потоково кодирует таблицу в снимок BSTC группами по batch_size строк.
+
+    Использует собственную сессию на bind (в лимите сессий бестиариев):
+    сессия из get_db закрывается раньше, чем ответ дочитывается клиентом.
+    """
+    writer = SnapshotWriter()
+    yield writer.header()
+    async with tenants.tenant_engines.session(bind) as session:
+        result = await session.stream(
+            select(CreatureDB)
+            .order_by(CreatureDB.id)
+            .execution_options(yield_per=batch_size)
+        )
+        async for batch in result.scalars().partitions(batch_size):
+            yield writer.row_group(batch)
+    yield writer.footer()
+
+
+class StringColumn:
+    """Строковая колонка группы строк; значения декодируются по запросу."""
+
+    def __init__(self, validity: memoryview, offsets: memoryview, data: memoryview):
+        self.validity = validity
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.validity)
+
+    def __getitem__(self, index: int):
+        if not self.validity[index]:
+            return None
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return bytes(self.data[start:end]).decode("utf-8")
+
+
+class SnapshotReader:
+    """Читатель снимка через mmap: разбирается только футер.
+
+    Числовые колонки и коды словарей возвращаются как memoryview поверх
+    отображённого файла, без копирования.
+
+    Examples:
+        >>> with SnapshotReader("bestiary_export.bstc") as snapshot:
+        ...     danger = snapshot.column("danger_level", 0)
+        ...     max(danger)
+    """
+
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        if bytes(self._view[:4]) != MAGIC or bytes(self._view[-4:]) != MAGIC:
+            self.close()
+            raise ValueError("Файл не является снимком BSTC")
+        (footer_length,) = struct.unpack("<I", self._view[-8:-4])
+        footer = self._view[-8 - footer_length : -8]
+        self.footer = json.loads(bytes(footer).decode("utf-8"))
+        if self.footer["version"] != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"Неподдерживаемая версия BSTC: {self.footer['version']}")
+        self.types = {column["name"]: column["type"] for column in self.footer["schema"]}
+        self.dictionaries = self.footer["dictionaries"]
+
+    @property
+    def num_rows(self) -> int:
+        return self.footer["rows"]
+
+    @property
+    def num_row_groups(self) -> int:
+        return len(self.footer["row_groups"])
+
+    def _buffer(self, buffer: dict) -> memoryview:
+        return self._view[buffer["offset"] : buffer["offset"] + buffer["length"]]
+
+    def column(self, name: str, group: int):
+        """Колонка одной группы строк: memoryview для чисел, StringColumn для строк."""
+        kind = self.types[name]
+        buffers = self.footer["row_groups"][group]["columns"][name]
+        if kind == "utf8":
+            validity, offsets, data = (self._buffer(buffer) for buffer in buffers)
+            return StringColumn(validity, offsets.cast("I"), data)
+        return self._buffer(buffers[0]).cast(_TYPECODES[kind])
+
+    def values(self, name: str):
+        """Итерирует значения колонки по всем группам (словари раскодируются)."""
+        dictionary = self.dictionaries.get(name)
+        for group in range(self.num_row_groups):
+            column = self.column(name, group)
+            if dictionary is not None:
+                yield from (dictionary[code] for code in column)
+            else:
+                yield from (column[i] for i in range(len(column)))
+
+    def close(self):
+        if getattr(self, "_view", None) is not None:
+            self._view.release()
+            self._view = None
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Снаружи ещё живы колонки-memoryview: отображение освободится
+            # вместе с последней из них
+            pass
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
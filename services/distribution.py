@@ -0,0 +1,246 @@
+import asyncio
+from array import array
+from collections import Counter
+from itertools import compress
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.creature import CreatureDB
+from services.changes import database_key, on_change, on_invalidate
+
+# Процентили, которые возвращает /stats/distribution
+PERCENTILES = (25, 50, 75, 90, 99)
+
+
+class CreatureColumns:
+    """Колоночная копия числовых полей бестиария в памяти.
+
+    Хранит danger_level и min_insanity в компактных массивах array('B')
+    (значения 0-100) и коды категорий в array('H') со словарём категорий.
+    Статистика считается проходами по массивам на уровне C (Counter,
+    compress), без запросов GROUP BY. При записи строка меняется на месте,
+    удаление - перестановкой последней строки на место удалённой.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self._lock = asyncio.Lock()
+        self.danger = array("B")
+        self.insanity = array("B")
+        self.category_codes = array("H")
+        self.categories = []  # код -> название категории
+        self._category_code = {}  # название категории -> код
+        self._names = []  # позиция -> имя
+        self._positions = {}  # имя -> позиция
+        # Изменения, пришедшие, пока load() ждёт ответа базы; None - загрузки нет
+        self._pending = None
+
+    def __len__(self):
+        return len(self._names)
+
+    async def load(self, db: AsyncSession):
+        """Загружает колонки из базы данных (однократно).
+
+        Записи, опубликованные во время чтения, могли не попасть в его
+        результат: они копятся и применяются поверх загруженного.
+        """
+        async with self._lock:
+            if self.loaded:
+                return
+            self._pending = []
+            try:
+                result = await db.execute(
+                    select(
+                        CreatureDB.name,
+                        CreatureDB.category,
+                        CreatureDB.danger_level,
+                        CreatureDB.min_insanity,
+                    )
+                )
+                rows = result.all()
+            finally:
+                pending, self._pending = self._pending, None
+            for name, category, danger_level, min_insanity in rows:
+                self._append(name, category, danger_level, min_insanity)
+            self.loaded = True
+            for name, *values in pending:
+                if values:
+                    self.upsert(name, *values)
+                else:
+                    self.remove(name)
+
+    def _encode(self, category: str) -> int:
+        code = self._category_code.get(category)
+        if code is None:
+            code = len(self.categories)
+            self.categories.append(category)
+            self._category_code[category] = code
+        return code
+
+    def _append(self, name, category, danger_level, min_insanity):
+        self._positions[name] = len(self._names)
+        self._names.append(name)
+        self.danger.append(danger_level)
+        self.insanity.append(min_insanity or 0)
+        self.category_codes.append(self._encode(category))
+
+    def upsert(self, name, category, danger_level, min_insanity):
+        """Добавляет строку или обновляет её на месте (если колонки загружены)."""
+        if self._pending is not None:
+            self._pending.append((name, category, danger_level, min_insanity))
+            return
+        if not self.loaded:
+            return
+        position = self._positions.get(name)
+        if position is None:
+            self._append(name, category, danger_level, min_insanity)
+            return
+        self.danger[position] = danger_level
+        self.insanity[position] = min_insanity or 0
+        self.category_codes[position] = self._encode(category)
+
+    def remove(self, name: str):
+        """Удаляет строку, перенося на её место последнюю."""
+        if self._pending is not None:
+            self._pending.append((name,))
+            return
+        position = self._positions.pop(name, None)
+        if position is None:
+            return
+        last_name = self._names.pop()
+        last = len(self._names)
+        if position != last:
+            self._names[position] = last_name
+            self._positions[last_name] = position
+            self.danger[position] = self.danger[last]
+            self.insanity[position] = self.insanity[last]
+            self.category_codes[position] = self.category_codes[last]
+        del self.danger[last]
+        del self.insanity[last]
+        del self.category_codes[last]
+
+    def distribution(self, bucket_width: int = 10) -> dict:
+        """Считает распределения по всему бестиарию и по категориям.
+
+        Args:
+            bucket_width (int): Ширина интервала гистограммы.
+
+        Returns:
+            dict: Распределения уровня опасности и минимального безумия.
+        """
+        by_category = []
+        for code, category in enumerate(self.categories):
+            mask = bytes(map(code.__eq__, self.category_codes))
+            danger = list(compress(self.danger, mask))
+            if not danger:
+                continue
+            by_category.append(
+                {
+                    "Имя": category,
+                    "Количество": len(danger),
+                    "Уровень_опасности": describe(danger, bucket_width),
+                    "Минимальное_безумие": describe(
+                        list(compress(self.insanity, mask)), bucket_width
+                    ),
+                }
+            )
+        by_category.sort(key=lambda item: (-item["Количество"], item["Имя"]))
+        return {
+            "Всего": len(self),
+            "Уровень_опасности": describe(self.danger, bucket_width),
+            "Минимальное_безумие": describe(self.insanity, bucket_width),
+            "По_категориям": by_category,
+        }
+
+
+def describe(values, bucket_width: int = 10) -> dict:
+    """Минимум, максимум, среднее, процентили и гистограмма целых 0-100.
+
+    Значения сводятся в счётчик (Counter по массиву работает на уровне C),
+    после чего процентили находятся по накопленным частотам за <= 101 шаг.
+    """
+    counts = Counter(values)
+    total = sum(counts.values())
+    if not total:
+        return {
+            "Минимум": None,
+            "Максимум": None,
+            "Среднее": 0.0,
+            "Процентили": {},
+            "Гистограмма": [],
+        }
+
+    levels = sorted(counts)
+    mean = sum(level * count for level, count in counts.items()) / total
+
+    # Процентили методом ближайшего ранга
+    percentiles = {}
+    targets = [(p, max(1, -(-p * total // 100))) for p in PERCENTILES]
+    seen = 0
+    for level in levels:
+        seen += counts[level]
+        while targets and seen >= targets[0][1]:
+            percentiles[f"p{targets.pop(0)[0]}"] = level
+
+    buckets = Counter()
+    for level, count in counts.items():
+        buckets[level // bucket_width * bucket_width] += count
+    histogram = [
+        {
+            "Диапазон": f"{start}-{min(start + bucket_width - 1, 100)}",
+            "Количество": buckets[start],
+        }
+        for start in sorted(buckets)
+    ]
+
+    return {
+        "Минимум": levels[0],
+        "Максимум": levels[-1],
+        "Среднее": round(mean, 1),
+        "Процентили": percentiles,
+        "Гистограмма": histogram,
+    }
+
+
+# Колонки по базам данных (ключ - URL движка)
+_columns = {}
+
+
+def columns_loaded(key: str) -> bool:
+    """Загружены ли колонки базы данных с ключом key (для /ready)."""
+    columns = _columns.get(key)
+    return columns is not None and columns.loaded
+
+
+async def ensure_columns(db: AsyncSession) -> CreatureColumns:
+    """Возвращает колонки базы данных, при необходимости загрузив их."""
+    key = database_key(db)
+    if key not in _columns:
+        _columns[key] = CreatureColumns()
+    columns = _columns[key]
+    if not columns.loaded:
+        await columns.load(db)
+    return columns
+
+
+@on_change
+def _apply_change(key: str, action: str, creature: CreatureDB):
+    columns = _columns.get(key)
+    if columns is None:
+        return
+    if action == "remove":
+        columns.remove(creature.name)
+    else:
+        columns.upsert(
+            creature.name,
+            creature.category,
+            creature.danger_level,
+            creature.min_insanity,
+        )
+
+
+@on_invalidate
+def _drop_columns(key: str = None):
+    if key is None:
+        _columns.clear()
+    else:
+        _columns.pop(key, None)
@@ -0,0 +1,374 @@
+import asyncio
+import gzip
+import json
+import logging
+import os
+import re
+import socket
+import threading
+import time
+import uuid
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from config import EXPORT_DIR, EXPORT_JOB_HEARTBEAT, EXPORT_JOBS_KEEP
+from models.creature import CreatureDB
+from services.changes import database_key
+from services import tenants
+from services.offload import csv_chunk, json_chunk, offload
+from services.sync import change_bounds
+
+logger = logging.getLogger(__name__)
+
+# Сколько строк читается из курсора и записывается на диск за один шаг
+BATCH_SIZE = 500
+# Идентификатор задачи (он же имя её файлов в каталоге экспорта)
+JOB_ID = re.compile(r"^[0-9a-f]{32}$")
+# Суффикс файла состояния задачи
+STATE_SUFFIX = ".job.json"
+# Хост процесса: номер процесса владельца проверяется только на своём хосте
+HOST = socket.gethostname()
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Процесс есть, но принадлежит другому пользователю
+        return True
+    return True
+
+
+class ExportJob:
+    """Фоновая задача экспорта бестиария в файл."""
+
+    # Поля, которые сохраняются в файл состояния
+    FIELDS = (
+        "id",
+        "key",
+        "version",
+        "format",
+        "compress",
+        "status",
+        "written",
+        "total",
+        "size",
+        "error",
+        "created_at",
+        "path",
+        "host",
+        "pid",
+        "updated_at",
+    )
+
+    def __init__(self, key: str, version: int, format: str, compress: bool):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.version = version
+        self.format = format
+        self.compress = compress
+        self.status = "pending"
+        self.written = 0
+        self.total = None
+        self.size = None
+        self.error = None
+        self.created_at = time.time()
+        self.path = None
+        # Владелец задачи и время его последней отметки в файле состояния
+        self.host = HOST
+        self.pid = os.getpid()
+        self.updated_at = self.created_at
+        self.task = None
+
+    @property
+    def filename(self) -> str:
+        """Имя файла для скачивания."""
+        return f"bestiary_export.{self.format}" + (".gz" if self.compress else "")
+
+    @property
+    def media_type(self) -> str:
+        if self.compress:
+            return "application/gzip"
+        if self.format == "csv":
+            return "text/csv; charset=utf-8"
+        return "application/json"
+
+    def state(self) -> dict:
+        """Состояние задачи для файла в каталоге экспорта."""
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "ExportJob":
+        """Задача, прочитанная из файла состояния (без фоновой задачи asyncio)."""
+        job = cls.__new__(cls)
+        for name in cls.FIELDS:
+            setattr(job, name, state.get(name))
+        job.task = None
+        return job
+
+    def abandoned(self, stale_after: float = 3 * EXPORT_JOB_HEARTBEAT) -> bool:
+        """Брошена ли незавершённая задача владельцем.
+
+        Задача брошена, если процесс владельца на этом хосте завершился
+        (воркер перезапущен или упал) или владелец давно не отмечался в
+        файле состояния (завис или работает на другом хосте).
+        """
+        if self.status not in ("pending", "running"):
+            return False
+        if self.host == HOST and self.pid is not None and not _process_alive(self.pid):
+            return True
+        updated_at = self.updated_at or self.created_at
+        return time.time() - updated_at > stale_after
+
+    def as_dict(self) -> dict:
+        """Состояние задачи для ответа API."""
+        return {
+            "Id": self.id,
+            "Статус": self.status,
+            "Формат": self.format,
+            "Сжатие": self.compress,
+            "Версия_данных": self.version,
+            "Записано": self.written,
+            "Всего": self.total,
+            "Размер": self.size,
+            "Ошибка": self.error,
+        }
+
+
+class ExportJobs:
+    """Реестр задач экспорта с дедупликацией по версии данных и формату.
+
+    Состояние каждой задачи хранится рядом с её файлом в каталоге экспорта
+    (<id>.job.json) и обновляется после каждой порции, поэтому статус и
+    скачивание работают в любом воркере serve.py, а не только в том, что
+    выполняет задачу. В памяти (jobs) - только выполняющиеся задачи процесса.
+    """
+
+    def __init__(self, directory: str = EXPORT_DIR, keep: int = EXPORT_JOBS_KEEP):
+        self.directory = directory
+        self.keep = keep
+        self.jobs = {}
+        # Отметка владельца и запись после порции не перезаписывают друг друга
+        self._save_lock = threading.Lock()
+
+    def _state_path(self, job_id: str) -> str:
+        return os.path.join(self.directory, job_id + STATE_SUFFIX)
+
+    def _save(self, job: ExportJob):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._state_path(job.id)
+        with self._save_lock:
+            job.updated_at = time.time()
+            with open(path + ".tmp", "w", encoding="utf-8") as handle:
+                json.dump(job.state(), handle, ensure_ascii=False)
+            # Читатели в других процессах видят либо старое, либо новое состояние
+            os.replace(path + ".tmp", path)
+
+    def _load(self, job_id: str) -> ExportJob:
+        try:
+            with open(self._state_path(job_id), encoding="utf-8") as handle:
+                return ExportJob.from_state(json.load(handle))
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+
+    def _stored(self) -> list:
+        """Задачи всех процессов по файлам состояния в каталоге экспорта."""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        jobs = (
+            self._load(name[: -len(STATE_SUFFIX)])
+            for name in names
+            if name.endswith(STATE_SUFFIX)
+        )
+        return [job for job in jobs if job is not None]
+
+    def _fail_abandoned(self, job: ExportJob) -> bool:
+        """Помечает ошибкой задачу, брошенную владельцем (см. ExportJob.abandoned)."""
+        if job.id in self.jobs or not job.abandoned():
+            return False
+        job.status = "failed"
+        job.error = "Задача прервана: воркер-владелец не отвечает"
+        self._save(job)
+        logger.warning(f"Экспорт {job.id} брошен владельцем (процесс {job.pid})")
+        return True
+
+    def get(self, job_id: str) -> ExportJob:
+        """Задача по идентификатору (своя или любого другого воркера) или None.
+
+        Брошенная владельцем задача из файла состояния сразу помечается
+        ошибкой: иначе её статус навсегда остался бы "running".
+        """
+        job = self.jobs.get(job_id)
+        if job is None and JOB_ID.match(job_id):
+            job = self._load(job_id)
+            if job is not None:
+                self._fail_abandoned(job)
+        return job
+
+    def recover(self) -> int:
+        """Помечает ошибкой все брошенные задачи в каталоге экспорта (при запуске).
+
+        Returns:
+            int: Сколько задач помечено.
+        """
+        recovered = sum(self._fail_abandoned(job) for job in self._stored())
+        if recovered:
+            self._prune()
+        return recovered
+
+    async def submit(
+        self, db: AsyncSession, format: str, compress: bool, transform, fieldnames
+    ):
+        """Создаёт задачу экспорта или возвращает уже существующую.
+
+        Задача для той же базы, версии данных, формата и сжатия переиспользуется,
+        если она не завершилась ошибкой и не брошена владельцем
+        (ExportJob.abandoned): задача упавшего воркера навсегда осталась бы
+        "running", поэтому вместо неё запускается новая. Версия данных - последний номер
+        изменения из самой базы (change_sequence): его увеличивает любая
+        запись в существ, в том числе из другого процесса или скрипта, а
+        просмотры и служебные таблицы - нет.
+
+        Args:
+            db (AsyncSession): Сессия запроса (определяет базу данных).
+            format (str): 'json' или 'csv'.
+            compress (bool): Сжимать ли файл gzip.
+            transform (callable): Преобразование CreatureDB в словарь (transform_creature).
+            fieldnames (list): Колонки CSV.
+
+        Returns:
+            tuple: (задача, True если задача создана только что).
+        """
+        key = database_key(db)
+        version, _ = await change_bounds(db)
+        stored = await asyncio.to_thread(self._stored)
+        # Свои задачи проверяются после всех await: одновременные запросы
+        # этого процесса не создадут две одинаковые
+        for job in [*self.jobs.values(), *stored]:
+            if (
+                job.key == key
+                and job.version == version
+                and job.format == format
+                and job.compress == compress
+                and job.status != "failed"
+                and (job.id in self.jobs or not job.abandoned())
+            ):
+                return job, False
+
+        job = ExportJob(key, version, format, compress)
+        self.jobs[job.id] = job
+        await asyncio.to_thread(self._save, job)
+        job.task = asyncio.create_task(
+            self._run(job, db.bind, transform, fieldnames)
+        )
+        return job, True
+
+    async def _run(self, job: ExportJob, bind, transform, fieldnames):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{job.id}.{job.format}")
+        if job.compress:
+            path += ".gz"
+        tmp_path = path + ".tmp"
+        job.status = "running"
+        await asyncio.to_thread(self._save, job)
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        handle = None
+        try:
+            if job.compress:
+                handle = await asyncio.to_thread(
+                    gzip.open, tmp_path, "wt", encoding="utf-8", newline=""
+                )
+            else:
+                handle = await asyncio.to_thread(
+                    open, tmp_path, "w", encoding="utf-8", newline=""
+                )
+
+            async with tenants.tenant_engines.session(bind) as session:
+                job.total = await session.scalar(select(func.count(CreatureDB.id)))
+                result = await session.stream(
+                    select(CreatureDB)
+                    .order_by(CreatureDB.id)
+                    .execution_options(yield_per=BATCH_SIZE)
+                )
+                if job.format == "json":
+                    await asyncio.to_thread(handle.write, '{"Существа": [')
+                else:
+                    header = await offload.run(csv_chunk, fieldnames, [], True)
+                    await asyncio.to_thread(handle.write, header)
+
+                async for batch in result.scalars().partitions(BATCH_SIZE):
+                    rows = [transform(c, for_csv=job.format == "csv") for c in batch]
+                    if job.format == "json":
+                        chunk = await offload.run(json_chunk, rows, False)
+                        if job.written:
+                            chunk = ", " + chunk
+                    else:
+                        chunk = await offload.run(csv_chunk, fieldnames, rows)
+                    await asyncio.to_thread(handle.write, chunk)
+                    job.written += len(rows)
+                    await asyncio.to_thread(self._save, job)
+
+            if job.format == "json":
+                tail = (
+                    f'], "Всего": {job.written}, "Лимит": {job.written}, "Смещение": 0}}'
+                )
+                await asyncio.to_thread(handle.write, tail)
+            await asyncio.to_thread(handle.close)
+            handle = None
+            await asyncio.to_thread(os.replace, tmp_path, path)
+            job.path = path
+            job.size = os.path.getsize(path)
+            job.total = job.written
+            job.status = "done"
+            logger.info(f"Экспорт {job.id} готов: {job.written} существ, {job.size} байт")
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            logger.error(f"Ошибка экспорта {job.id}: {e}")
+            if handle is not None:
+                await asyncio.to_thread(handle.close)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        finally:
+            heartbeat.cancel()
+            try:
+                await asyncio.to_thread(self._save, job)
+                await asyncio.to_thread(self._prune)
+            finally:
+                # Дальше состояние читается из файла
+                self.jobs.pop(job.id, None)
+
+    async def _heartbeat(self, job: ExportJob):
+        """Отмечает владельца в файле состояния, пока задача выполняется.
+
+        Запись после каждой порции тоже служит отметкой, но подсчёт строк
+        и первый шаг курсора на большой базе могут идти дольше.
+        """
+        while True:
+            await asyncio.sleep(EXPORT_JOB_HEARTBEAT)
+            try:
+                await asyncio.to_thread(self._save, job)
+            except OSError as e:
+                logger.error(f"Ошибка отметки задачи экспорта {job.id}: {e}")
+
+    def _prune(self):
+        """Удаляет самые старые завершённые задачи сверх лимита вместе с файлами."""
+        finished = sorted(
+            (job for job in self._stored() if job.status in ("done", "failed")),
+            key=lambda job: job.created_at,
+        )
+        for job in finished[: max(0, len(finished) - self.keep)]:
+            for path in (job.path, self._state_path(job.id)):
+                try:
+                    if path:
+                        os.remove(path)
+                except FileNotFoundError:
+                    # Файл уже удалил другой воркер
+                    pass
+
+
+# Общий реестр задач экспорта
+export_jobs = ExportJobs()
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from config import GROUP_COMMIT_MAX_BATCH, GROUP_COMMIT_WINDOW
+from services import tenants
+
+logger = logging.getLogger(__name__)
+
+
+class _Write:
+    """Одна запись в очереди: операция, её аргументы и ожидающий результат."""
+
+    __slots__ = ("op", "args", "future")
+
+    def __init__(self, op, args, future):
+        self.op = op
+        self.args = args
+        self.future = future
+
+
+class GroupCommitter:
+    """Групповой коммит: записи, пришедшие за window секунд, - одна транзакция.
+
+    Запись - это корутина op(session, *args), которая выполняет свои
+    запросы и возвращает результат, но не коммитит. Операции группы
+    выполняются по очереди в одной сессии, затем один COMMIT (один fsync
+    SQLite вместо одного на запрос), и только после него каждый запрос
+    получает свой результат. Конфликты операции должны возвращать
+    результатом (например, None из INSERT ... ON CONFLICT DO NOTHING
+    RETURNING), а не исключением: тогда они не мешают остальным.
+    Если всё же одна операция упала или не прошёл COMMIT, группа
+    откатывается и операции выполняются заново по одной, каждая в своей
+    транзакции, - ошибку получит только виновная.
+
+    После каждой операции объекты отсоединяются от сессии, чтобы более
+    поздняя операция группы над той же строкой не изменила уже
+    возвращённый результат.
+    """
+
+    def __init__(
+        self,
+        window: float = GROUP_COMMIT_WINDOW,
+        max_batch: int = GROUP_COMMIT_MAX_BATCH,
+    ):
+        self.window = window
+        self.max_batch = max_batch
+        # Ключ базы -> очередь записей, движок и событие "очередь полна"
+        self.queues = {}
+        self.binds = {}
+        self._full = {}
+        self._flushers = {}
+        self.batches = 0
+        self.writes = 0
+        self.largest = 0
+        self.retried = 0
+        self.commit_times = deque(maxlen=1000)
+
+    async def submit(self, bind, op, *args):
+        """Ставит операцию в очередь базы bind и ждёт результата после COMMIT."""
+        key = str(bind.url)
+        write = _Write(op, args, asyncio.get_running_loop().create_future())
+        queue = self.queues.setdefault(key, [])
+        queue.append(write)
+        self.binds[key] = bind
+        if key not in self._flushers:
+            self._full[key] = asyncio.Event()
+            self._flushers[key] = asyncio.create_task(self._flush(key))
+        elif len(queue) >= self.max_batch:
+            self._full[key].set()
+        return await write.future
+
+    async def _flush(self, key: str):
+        queue = self.queues[key]
+        try:
+            while queue:
+                if len(queue) < self.max_batch:
+                    try:
+                        await asyncio.wait_for(self._full[key].wait(), self.window)
+                    except asyncio.TimeoutError:
+                        pass
+                self._full[key].clear()
+                batch = queue[: self.max_batch]
+                del queue[: self.max_batch]
+                await self._commit(self.binds[key], batch)
+        finally:
+            del self._flushers[key]
+            if not queue:
+                # Движок бестиария могут закрыть: не держим на него ссылку
+                del self.queues[key], self.binds[key], self._full[key]
+
+    async def _commit(self, bind, batch: list):
+        started = time.perf_counter()
+        try:
+            results = await self._run(bind, batch)
+        except Exception as e:
+            logger.warning(f"Групповой коммит не прошёл ({e}), записи выполняются по одной")
+            self.retried += 1
+            for write in batch:
+                try:
+                    (result,) = await self._run(bind, [write])
+                except Exception as error:
+                    _resolve(write, error=error)
+                else:
+                    _resolve(write, result)
+            return
+        self.commit_times.append(time.perf_counter() - started)
+        self.batches += 1
+        self.writes += len(batch)
+        self.largest = max(self.largest, len(batch))
+        for write, result in zip(batch, results):
+            _resolve(write, result)
+
+    async def _run(self, bind, batch: list) -> list:
+        # Места в лимите сессий бестиариев уже заняли ждущие запросы группы
+        async with tenants.tenant_engines.session(
+            bind, slot=False, expire_on_commit=False
+        ) as session:
+            results = []
+            for write in batch:
+                results.append(await write.op(session, *write.args))
+                session.expunge_all()
+            await session.commit()
+        return results
+
+    def stats(self) -> dict:
+        """Размеры групп и время COMMIT (по последним группам)."""
+        times = sorted(self.commit_times)
+        average = round(self.writes / self.batches, 2) if self.batches else None
+        return {
+            "Групп": self.batches,
+            "Записей": self.writes,
+            "Средний_размер": average,
+            "Наибольший_размер": self.largest,
+            "Коммит_p50_мс": round(times[len(times) // 2] * 1000, 2) if times else None,
+            "Коммит_max_мс": round(times[-1] * 1000, 2) if times else None,
+            "Повторено_по_одной": self.retried,
+        }
+
+    async def stop(self):
+        """Дожидается записи всего, что уже в очередях."""
+        while self._flushers:
+            await asyncio.gather(*self._flushers.values(), return_exceptions=True)
+
+
+def _resolve(write: _Write, result=None, error: Exception = None):
+    # Запрос мог быть отменён (клиент ушёл), а запись уже выполнена
+    if write.future.done():
+        return
+    if error is not None:
+        write.future.set_exception(error)
+    else:
+        write.future.set_result(result)
+
+
+# Групповой коммит процесса (используется при BEASTIARY_GROUP_COMMIT=1)
+group_commit = GroupCommitter()
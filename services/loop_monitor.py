@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from config import LOOP_LAG_INTERVAL, LOOP_LAG_THRESHOLD, LOOP_LAG_WINDOW
+
+logger = logging.getLogger(__name__)
+
+
+class LoopLagMonitor:
+    """Замеряет задержку цикла событий и ловит код, который его блокирует.
+
+    Задача в цикле засыпает на interval и считает, насколько позже она
+    проснулась: это и есть задержка цикла. Последние window замеров дают
+    процентили. Пока цикл заблокирован, сама задача ничего не видит, поэтому
+    отдельный поток следит за её отметками: если отметки нет дольше
+    threshold, в лог пишется стек потока цикла - ровно то место, которое его
+    держит (одна запись на одну блокировку).
+    """
+
+    def __init__(
+        self,
+        interval: float = LOOP_LAG_INTERVAL,
+        threshold: float = LOOP_LAG_THRESHOLD,
+        window: int = LOOP_LAG_WINDOW,
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self.samples = deque(maxlen=window)
+        self.stalls = 0
+        self._heartbeat = None
+        self._reported = None
+        self._loop_thread = None
+        self._task = None
+        self._watchdog = None
+        self._stopping = threading.Event()
+
+    def start(self):
+        """Запускает замеры в текущем цикле событий и поток-сторож."""
+        if self._task is not None:
+            return
+        self._loop_thread = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._sample())
+        self._watchdog = threading.Thread(
+            target=self._watch, name="beastiary-loop-watchdog", daemon=True
+        )
+        self._watchdog.start()
+
+    async def _sample(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(loop.time() - started - self.interval, 0.0))
+            self._heartbeat = time.monotonic()
+
+    def _watch(self):
+        while not self._stopping.wait(self.interval):
+            heartbeat = self._heartbeat
+            stalled = time.monotonic() - heartbeat
+            if stalled < self.threshold or heartbeat == self._reported:
+                continue
+            self._reported = heartbeat
+            self.stalls += 1
+            frame = sys._current_frames().get(self._loop_thread)
+            stack = "".join(traceback.format_stack(frame)) if frame else ""
+            logger.warning(
+                f"Цикл событий заблокирован уже {stalled * 1000:.0f} мс:\n{stack}"
+            )
+
+    def stats(self) -> dict:
+        """Задержка цикла в миллисекундах по последним замерам."""
+        samples = sorted(self.samples)
+
+        def percentile(share):
+            if not samples:
+                return None
+            index = min(int(len(samples) * share), len(samples) - 1)
+            return round(samples[index] * 1000, 2)
+
+        return {
+            "Текущая_мс": round(self.samples[-1] * 1000, 2) if self.samples else None,
+            "p50_мс": percentile(0.5),
+            "p99_мс": percentile(0.99),
+            "Максимальная_мс": round(samples[-1] * 1000, 2) if samples else None,
+            "Замеров": len(samples),
+            "Блокировок": self.stalls,
+            "Порог_мс": round(self.threshold * 1000, 2),
+        }
+
+    async def stop(self):
+        self._stopping.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join()
+            self._watchdog = None
+
+
+# Монитор цикла событий процесса
+loop_monitor = LoopLagMonitor()
@@ -0,0 +1,423 @@
+import asyncio
+import hashlib
+import ipaddress
+import json
+import logging
+import os
+import socket
+import struct
+import time
+from io import BytesIO
+from urllib.parse import urlsplit
+import httpcore
+import httpx
+from sqlalchemy import select
+from config import (
+    MEDIA_ALLOW_PRIVATE,
+    MEDIA_CACHE_DIR,
+    MEDIA_CONCURRENCY,
+    MEDIA_ERROR_TTL,
+    MEDIA_MAX_IMAGE_BYTES,
+    MEDIA_THUMBNAIL_SIZE,
+    MEDIA_TIMEOUT,
+    MEDIA_TTL,
+)
+from models.creature import CreatureDB
+from services import tenants
+from services.changes import on_change
+
+try:
+    # Миниатюры строятся, только если установлен Pillow
+    from PIL import Image
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Поля CreatureDB с адресами медиа: (поле, ключ transform_creature, название в ответе)
+MEDIA_FIELDS = [
+    ("image_url", "Url_изображения", "Изображение"),
+    ("audio_url", "Url_аудио", "Аудио"),
+    ("video_url", "Url_видео", "Видео"),
+]
+# Сколько байт изображения читать, если миниатюра не нужна (хватает для заголовка)
+HEADER_BYTES = 64 * 1024
+# Схемы адресов, которые проверяются, и предел перенаправлений
+SCHEMES = ("http", "https")
+MAX_REDIRECTS = 5
+
+
+class BlockedAddress(httpcore.ConnectError):
+    """Адрес ведёт в частную сеть, на loopback или link-local."""
+
+
+def is_public_address(address: str) -> bool:
+    """Глобально маршрутизируемый ли IP-адрес (не частный, не loopback и т.п.)."""
+    ip = ipaddress.ip_address(address.split("%")[0])
+    if ip.version == 6 and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+class GuardedBackend(httpcore.AsyncNetworkBackend):
+    """Сетевой уровень httpcore, который соединяется только с публичными адресами.
+
+    Имя хоста разрешается здесь, и соединение открывается с проверенным
+    IP - поэтому проверка действует для каждого соединения, в том числе
+    после перенаправления, и её не обойти, подменив DNS-ответ между
+    проверкой и соединением. Если хоть один адрес имени непубличный, имя
+    отклоняется целиком. TLS по-прежнему проверяется по имени хоста
+    (httpcore передаёт его в SNI отдельно).
+    """
+
+    def __init__(self, allow_private: bool = False):
+        self.allow_private = allow_private
+        self._backend = httpcore.AnyIOBackend()
+
+    async def connect_tcp(
+        self, host, port, timeout=None, local_address=None, socket_options=None
+    ):
+        infos = await asyncio.get_running_loop().getaddrinfo(
+            host, port, type=socket.SOCK_STREAM
+        )
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        if not self.allow_private:
+            blocked = [a for a in addresses if not is_public_address(a)]
+            if blocked:
+                raise BlockedAddress(f"Адрес {host} ({blocked[0]}) не публичный")
+        error = None
+        for address in addresses:
+            try:
+                return await self._backend.connect_tcp(
+                    address, port, timeout, local_address, socket_options
+                )
+            except httpcore.ConnectError as e:
+                error = e
+        raise error or httpcore.ConnectError(f"Адрес {host} не разрешается")
+
+    async def connect_unix_socket(self, *args, **kwargs):
+        raise BlockedAddress("Unix-сокеты не проверяются")
+
+    async def sleep(self, seconds: float):
+        await self._backend.sleep(seconds)
+
+
+def media_key(url: str) -> str:
+    """Ключ записи кэша (и имя файла миниатюры) для URL."""
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+
+def image_size(data: bytes):
+    """Размеры изображения (ширина, высота) по заголовку PNG, GIF, JPEG или WebP.
+
+    Returns:
+        tuple: (ширина, высота) или None, если формат не распознан.
+    """
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+    if data[:6] in (b"GIF87a", b"GIF89a") and len(data) >= 10:
+        return struct.unpack("<HH", data[6:10])
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP" and len(data) >= 30:
+        chunk = data[12:16]
+        if chunk == b"VP8 ":
+            width, height = struct.unpack("<HH", data[26:30])
+            return width & 0x3FFF, height & 0x3FFF
+        if chunk == b"VP8L":
+            bits = int.from_bytes(data[21:25], "little")
+            return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        if chunk == b"VP8X":
+            return (
+                int.from_bytes(data[24:27], "little") + 1,
+                int.from_bytes(data[27:30], "little") + 1,
+            )
+    if data[:2] == b"\xff\xd8":
+        # Идём по маркерам JPEG до SOFn, где записаны размеры
+        position = 2
+        while position + 9 < len(data):
+            if data[position] != 0xFF:
+                position += 1
+                continue
+            marker = data[position + 1]
+            if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7 or marker == 0xFF:
+                position += 1 if marker == 0xFF else 2
+                continue
+            (length,) = struct.unpack(">H", data[position + 2 : position + 4])
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                height, width = struct.unpack(">HH", data[position + 5 : position + 9])
+                return width, height
+            position += 2 + length
+    return None
+
+
+class MediaPrefetcher:
+    """Фоновая проверка адресов медиа с кэшем на диске.
+
+    Адреса ставятся в очередь (без повторов), несколько воркеров проверяют
+    их общим httpx.AsyncClient с ограниченным пулом соединений. Проверяются
+    только http и https, а соединения открываются только с публичными
+    адресами (GuardedBackend), если не задан allow_private. Результат
+    (код ответа, тип, размер, размеры изображения, миниатюра) хранится в
+    памяти и в JSON-файле; удачные проверки живут ttl секунд, ошибки -
+    error_ttl. Чтение из кэша никогда не ждёт сети: устаревшая запись
+    возвращается как есть, а адрес ставится на повторную проверку.
+    """
+
+    def __init__(
+        self,
+        directory: str = MEDIA_CACHE_DIR,
+        concurrency: int = MEDIA_CONCURRENCY,
+        ttl: float = MEDIA_TTL,
+        error_ttl: float = MEDIA_ERROR_TTL,
+        timeout: float = MEDIA_TIMEOUT,
+        thumbnail_size: int = MEDIA_THUMBNAIL_SIZE,
+        allow_private: bool = MEDIA_ALLOW_PRIVATE,
+    ):
+        self.directory = directory
+        self.allow_private = allow_private
+        self.concurrency = concurrency
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.timeout = timeout
+        self.thumbnail_size = thumbnail_size
+        self.entries = {}
+        # Адреса, для которых на диске нет записи (чтобы не открывать файл снова)
+        self._missing = set()
+        self.client = None
+        self.queue = None
+        self._pending = set()
+        self._workers = []
+
+    # --- кэш ---
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def thumbnail_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.png")
+
+    def _load(self, url: str):
+        try:
+            with open(self._path(media_key(url)), encoding="utf-8") as handle:
+                entry = json.load(handle)
+        except (FileNotFoundError, ValueError):
+            self._missing.add(url)
+            return None
+        self.entries[url] = entry
+        return entry
+
+    def _cached(self, url: str):
+        """Запись из памяти или с диска; файл открывается не больше одного раза."""
+        entry = self.entries.get(url)
+        if entry is None and url not in self._missing:
+            entry = self._load(url)
+        return entry
+
+    def _store(self, url: str, entry: dict):
+        self.entries[url] = entry
+        self._missing.discard(url)
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(media_key(url))
+        with open(path + ".tmp", "w", encoding="utf-8") as handle:
+            json.dump(entry, handle, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
+    def is_fresh(self, entry: dict) -> bool:
+        ttl = self.error_ttl if entry["error"] or not entry["ok"] else self.ttl
+        return time.time() - entry["checked_at"] < ttl
+
+    def get(self, url: str):
+        """Запись кэша для URL (или None); отсутствующие и устаревшие ставит в очередь."""
+        entry = self._cached(url)
+        if entry is None or not self.is_fresh(entry):
+            self.schedule([url])
+        return entry
+
+    def describe(self, creature: dict) -> dict:
+        """Сведения о медиа существа для ответа API (ключи transform_creature)."""
+        result = {}
+        for _, response_key, title in MEDIA_FIELDS:
+            url = creature[response_key]
+            if url:
+                result[title] = as_response(url, self.get(url))
+        return result
+
+    # --- проверка ---
+
+    def schedule(self, urls):
+        """Ставит адреса в очередь проверки (если подсистема запущена)."""
+        if self.queue is None:
+            return
+        for url in urls:
+            if url and url not in self._pending:
+                self._pending.add(url)
+                self.queue.put_nowait(url)
+
+    async def start(self, bind=None):
+        """Создаёт общий HTTP-клиент и воркеры проверки.
+
+        С bind в очередь в фоне ставятся все непроверенные адреса из базы.
+        """
+        transport = httpx.AsyncHTTPTransport()
+        # Пул httpcore с проверкой адресов вместо стандартного
+        transport._pool = httpcore.AsyncConnectionPool(
+            ssl_context=httpx.create_ssl_context(),
+            max_connections=self.concurrency,
+            max_keepalive_connections=self.concurrency,
+            network_backend=GuardedBackend(self.allow_private),
+        )
+        self.client = httpx.AsyncClient(
+            transport=transport,
+            timeout=self.timeout,
+            follow_redirects=True,
+            max_redirects=MAX_REDIRECTS,
+            # Переменные окружения прокси увели бы соединение мимо проверки
+            trust_env=False,
+            headers={"User-Agent": "lovecraft-bestiary-media-prefetcher"},
+        )
+        self.queue = asyncio.Queue()
+        self._workers = [
+            asyncio.create_task(self._worker()) for _ in range(self.concurrency)
+        ]
+        if bind is not None:
+            self._workers.append(asyncio.create_task(self.prefetch_all(bind)))
+
+    async def prefetch_all(self, bind):
+        """Ставит в очередь все адреса медиа, которых нет в кэше или они устарели."""
+        async with tenants.tenant_engines.session(bind) as session:
+            result = await session.execute(
+                select(*(getattr(CreatureDB, field) for field, _, _ in MEDIA_FIELDS))
+            )
+            urls = {url for row in result for url in row if url}
+        stale = [url for url in urls if not self._is_cached(url)]
+        self.schedule(stale)
+        logger.info(f"Проверка медиа: {len(stale)} из {len(urls)} адресов в очереди")
+
+    def _is_cached(self, url: str) -> bool:
+        entry = self._cached(url)
+        return entry is not None and self.is_fresh(entry)
+
+    async def _worker(self):
+        while True:
+            url = await self.queue.get()
+            try:
+                await self.refresh(url)
+            except Exception as e:
+                logger.error(f"Ошибка проверки медиа {url}: {e}")
+            finally:
+                self._pending.discard(url)
+
+    async def refresh(self, url: str) -> dict:
+        """Проверяет адрес сейчас и сохраняет результат в кэш."""
+        entry = {
+            "checked_at": time.time(),
+            "ok": False,
+            "status": None,
+            "content_type": None,
+            "size": None,
+            "width": None,
+            "height": None,
+            "thumbnail": False,
+            "error": None,
+        }
+        if urlsplit(url).scheme.lower() not in SCHEMES:
+            entry["error"] = "Схема адреса не поддерживается"
+            await asyncio.to_thread(self._store, url, entry)
+            return entry
+        try:
+            async with self.client.stream("GET", url) as response:
+                entry["status"] = response.status_code
+                entry["ok"] = response.is_success
+                content_type = response.headers.get("content-type")
+                if content_type:
+                    entry["content_type"] = content_type.split(";")[0].strip()
+                length = response.headers.get("content-length")
+                if length and length.isdigit():
+                    entry["size"] = int(length)
+                if entry["ok"] and (entry["content_type"] or "").startswith("image/"):
+                    await self._inspect_image(url, response, entry)
+        except httpx.HTTPError as e:
+            entry["error"] = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+        await asyncio.to_thread(self._store, url, entry)
+        return entry
+
+    async def _inspect_image(self, url: str, response, entry: dict):
+        # Для миниатюры нужно всё изображение, для размеров - только заголовок
+        want_thumbnail = (
+            Image is not None
+            and self.thumbnail_size
+            and (entry["size"] or 0) <= MEDIA_MAX_IMAGE_BYTES
+        )
+        limit = MEDIA_MAX_IMAGE_BYTES if want_thumbnail else HEADER_BYTES
+        data = bytearray()
+        complete = True
+        async for chunk in response.aiter_bytes():
+            data += chunk
+            if len(data) > limit:
+                complete = False
+                break
+        data = bytes(data)
+        if complete and entry["size"] is None:
+            entry["size"] = len(data)
+        size = image_size(data)
+        if size:
+            entry["width"], entry["height"] = size
+        if want_thumbnail and complete:
+            entry["thumbnail"] = await asyncio.to_thread(
+                self._make_thumbnail, media_key(url), data
+            )
+
+    def _make_thumbnail(self, key: str, data: bytes) -> bool:
+        try:
+            with Image.open(BytesIO(data)) as image:
+                image.thumbnail((self.thumbnail_size, self.thumbnail_size))
+                os.makedirs(self.directory, exist_ok=True)
+                image.save(self.thumbnail_path(key), "PNG")
+            return True
+        except Exception as e:
+            logger.warning(f"Не удалось построить миниатюру {key}: {e}")
+            return False
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self.queue = None
+        self._pending.clear()
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+
+def as_response(url: str, entry: dict) -> dict:
+    """Запись кэша в формате ответа API (None - адрес ещё не проверялся)."""
+    if entry is None:
+        return {"Url": url, "Проверено": None}
+    return {
+        "Url": url,
+        "Доступен": entry["ok"],
+        "Код_ответа": entry["status"],
+        "Тип": entry["content_type"],
+        "Размер": entry["size"],
+        "Ширина": entry["width"],
+        "Высота": entry["height"],
+        "Миниатюра": (
+            f"/beastiary/media/thumbnails/{media_key(url)}.png"
+            if entry["thumbnail"]
+            else None
+        ),
+        "Проверено": entry["checked_at"],
+        "Ошибка": entry["error"],
+    }
+
+
+@on_change
+def _prefetch_changed(key, action, creature):
+    if action != "remove":
+        media_prefetcher.schedule(
+            getattr(creature, field) for field, _, _ in MEDIA_FIELDS
+        )
+
+
+# Общая подсистема проверки медиа (запускается в lifespan)
+media_prefetcher = MediaPrefetcher()
@@ -0,0 +1,240 @@
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from config import RELOAD_INTERVAL, SNAPSHOT_PATH
+from services.columnar_snapshot import SnapshotReader, stream_columnar_snapshot
+from services.name_index import NameIndex
+from services.sync import change_bounds
+
+logger = logging.getLogger(__name__)
+
+# Поля строки снимка, которые нужны transform_creature и compute_facets
+StoredCreature = namedtuple(
+    "StoredCreature",
+    [
+        "id",
+        "name",
+        "description",
+        "danger_level",
+        "habitat",
+        "quote",
+        "category",
+        "abilities",
+        "related_works",
+        "image_url",
+        "status",
+        "min_insanity",
+        "relations",
+        "audio_url",
+        "video_url",
+    ],
+)
+
+
+# Пустые строковые поля для facet_row
+_NO_STRINGS = dict.fromkeys(
+    field
+    for field in StoredCreature._fields
+    if field not in ("id", "danger_level", "min_insanity", "category", "status")
+)
+
+
+class MemoryStore:
+    """Неизменяемое колоночное хранилище бестиария для режима только чтения.
+
+    Числовые колонки и коды категорий/статусов лежат в массивах array,
+    ответы для каждой строки (transform_creature) вычислены заранее, а
+    индексы по имени, категории и уровню опасности построены при загрузке.
+    Строки хранятся в порядке id - так же, как их возвращает база данных.
+    """
+
+    def __init__(self, snapshot: SnapshotReader, transform):
+        self.loaded_at = time.time()
+        self.ids = array("i")
+        self.danger = array("B")
+        self.insanity = array("B")
+        self.category_codes = array("H")
+        self.status_codes = array("H")
+        self.categories = snapshot.dictionaries["category"]
+        self.statuses = snapshot.dictionaries["status"]
+        self.names = []
+        self.payloads = []
+
+        strings = [name for name, kind in snapshot.types.items() if kind == "utf8"]
+        for group in range(snapshot.num_row_groups):
+            self.ids.extend(snapshot.column("id", group))
+            self.danger.extend(snapshot.column("danger_level", group))
+            self.insanity.extend(snapshot.column("min_insanity", group))
+            self.category_codes.extend(snapshot.column("category", group))
+            self.status_codes.extend(snapshot.column("status", group))
+            columns = {name: snapshot.column(name, group) for name in strings}
+            for i in range(len(columns["name"])):
+                values = {name: column[i] for name, column in columns.items()}
+                self.names.append(values["name"])
+                self.payloads.append(transform(self._record(len(self.names) - 1, values)))
+
+        # Индексы
+        self.by_name = {name: row for row, name in enumerate(self.names)}
+        self.folded_names = [name.casefold() for name in self.names]
+        self.by_category = {}
+        for row, code in enumerate(self.category_codes):
+            self.by_category.setdefault(self.categories[code], array("I")).append(row)
+        self.danger_order = array(
+            "I", sorted(range(len(self.danger)), key=self.danger.__getitem__)
+        )
+        self.danger_sorted = array("B", (self.danger[row] for row in self.danger_order))
+        self.name_index = NameIndex()
+        self.name_index.rebuild(zip(self.names, self.danger))
+
+    def __len__(self):
+        return len(self.names)
+
+    def _record(self, row: int, strings: dict) -> StoredCreature:
+        return StoredCreature(
+            id=self.ids[row],
+            danger_level=self.danger[row],
+            min_insanity=self.insanity[row],
+            category=self.categories[self.category_codes[row]],
+            status=self.statuses[self.status_codes[row]],
+            **strings,
+        )
+
+    def facet_row(self, row: int) -> StoredCreature:
+        """Строка с полями для фасетов (строковые поля не заполняются)."""
+        return self._record(row, _NO_STRINGS)
+
+    def danger_range(self, low: int = None, high: int = None) -> list:
+        """Номера строк с уровнем опасности в [low, high] в порядке id."""
+        start = 0 if low is None else bisect_left(self.danger_sorted, low)
+        end = len(self.danger_sorted) if high is None else bisect_right(self.danger_sorted, high)
+        return sorted(self.danger_order[start:end])
+
+
+async def build_store(bind, transform, snapshot_path: str = None) -> MemoryStore:
+    """Строит хранилище из готового снимка BSTC или из базы данных.
+
+    Без snapshot_path таблица потоково выгружается во временный снимок
+    (тем же SnapshotWriter, что и /export?format=columnar), который затем
+    читается через mmap.
+    """
+    if snapshot_path:
+        return await asyncio.to_thread(_load, snapshot_path, transform)
+
+    handle = tempfile.NamedTemporaryFile(suffix=".bstc", delete=False)
+    try:
+        async for chunk in stream_columnar_snapshot(bind):
+            await asyncio.to_thread(handle.write, chunk)
+        handle.close()
+        return await asyncio.to_thread(_load, handle.name, transform)
+    finally:
+        handle.close()
+        os.remove(handle.name)
+
+
+def _load(path: str, transform) -> MemoryStore:
+    with SnapshotReader(path) as snapshot:
+        return MemoryStore(snapshot, transform)
+
+
+class MemoryServing:
+    """Текущее хранилище и фоновая перезагрузка при изменении файла.
+
+    Новое хранилище строится целиком в фоне и подменяется одним
+    присваиванием, поэтому запросы видят либо старую, либо новую версию.
+    Файл базы меняется и от записи просмотров (/top), поэтому после
+    изменения файла базы хранилище перестраивается, только если вырос номер
+    изменения существ (change_sequence).
+    """
+
+    def __init__(self):
+        self.store = None
+        self.bind = None
+        self.transform = None
+        self.snapshot_path = None
+        self._signature = None
+        self._change = None
+        self._task = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.store is not None
+
+    def _watched_files(self) -> list:
+        if self.snapshot_path:
+            return [self.snapshot_path]
+        database = self.bind.url.database
+        return [database, database + "-wal"] if database else []
+
+    def _file_signature(self) -> tuple:
+        signature = []
+        for path in self._watched_files():
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    async def start(self, bind, transform, snapshot_path: str = SNAPSHOT_PATH):
+        """Загружает хранилище и запускает наблюдение за файлом."""
+        self.bind, self.transform, self.snapshot_path = bind, transform, snapshot_path
+        await self.reload()
+        self._task = asyncio.create_task(self._watch())
+
+    async def _change_number(self):
+        """Номер последнего изменения существ в базе (None для снимка)."""
+        if self.snapshot_path:
+            return None
+        async with AsyncSession(self.bind) as session:
+            latest, _ = await change_bounds(session)
+        return latest
+
+    async def _changed(self) -> bool:
+        signature = self._file_signature()
+        if signature == self._signature:
+            return False
+        if self.snapshot_path or await self._change_number() != self._change:
+            return True
+        # Файл изменила только запись просмотров
+        self._signature = signature
+        return False
+
+    async def reload(self):
+        signature = self._file_signature()
+        change = await self._change_number()
+        started = time.perf_counter()
+        store = await build_store(self.bind, self.transform, self.snapshot_path)
+        self.store, self._signature, self._change = store, signature, change
+        logger.info(
+            f"Хранилище в памяти загружено: {len(store)} существ "
+            f"за {time.perf_counter() - started:.3f} с"
+        )
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(RELOAD_INTERVAL)
+            try:
+                if await self._changed():
+                    await self.reload()
+            except Exception as e:
+                # Остаёмся на прежней версии до следующей попытки
+                logger.error(f"Ошибка перезагрузки хранилища в памяти: {e}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Режим обслуживания из памяти (включается в lifespan при BEASTIARY_SERVING_MODE=memory)
+memory_serving = MemoryServing()
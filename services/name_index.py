@@ -0,0 +1,291 @@
+import asyncio
+import heapq
+import math
+from bisect import bisect_left, insort
+from itertools import islice
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.creature import CreatureDB
+from services.changes import database_key, on_change, on_invalidate
+
+# Во сколько раз обход по опасности в suggest может превысить свою среднюю
+# длину, прежде чем уступить куче по диапазону префикса
+WALK_FACTOR = 4
+
+
+def normalize_name(name: str) -> str:
+    """Приводит имя к виду для сравнения: casefold, 'ё' -> 'е', дефисы -> пробелы."""
+    text = name.casefold().replace("ё", "е")
+    text = "".join(ch if ch.isalnum() else " " for ch in text)
+    return " ".join(text.split())
+
+
+def trigrams(name: str) -> set:
+    """Возвращает множество триграмм имени (с пробелами по краям, как в pg_trgm)."""
+    padded = f"  {normalize_name(name)} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """Индекс имён существ в памяти: триграммы и отсортированный массив префиксов.
+
+    Строится один раз при старте (или при первом обращении) и обновляется
+    маршрутами записи, поэтому нечёткий поиск и автодополнение не сканируют
+    таблицу.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self._lock = asyncio.Lock()
+        self._grams = {}  # имя -> множество его триграмм
+        self._postings = {}  # триграмма -> множество имён
+        self._danger = {}  # имя -> уровень опасности (вес подсказок)
+        self._sorted = []  # отсортированные пары (нормализованное имя, имя)
+        # (-опасность, нормализованное имя, имя) по убыванию опасности
+        self._by_danger = []
+        # Изменения, пришедшие, пока load() ждёт ответа базы; None - загрузки нет
+        self._pending = None
+
+    def __len__(self):
+        return len(self._grams)
+
+    async def load(self, db: AsyncSession):
+        """Загружает все имена из базы данных (однократно).
+
+        Записи, опубликованные во время чтения, могли не попасть в его
+        результат: они копятся и применяются поверх загруженного.
+        """
+        async with self._lock:
+            if self.loaded:
+                return
+            self._pending = []
+            try:
+                result = await db.execute(
+                    select(CreatureDB.name, CreatureDB.danger_level)
+                )
+                rows = result.all()
+            finally:
+                pending, self._pending = self._pending, None
+            self.rebuild(rows)
+            for name, danger_level in pending:
+                if danger_level is None:
+                    self.remove(name)
+                else:
+                    self.add(name, danger_level)
+
+    def rebuild(self, rows):
+        """Полностью перестраивает индекс по парам (имя, уровень опасности)."""
+        self._grams = {}
+        self._postings = {}
+        self._danger = {}
+        for name, danger_level in rows:
+            self._insert(name, danger_level)
+        self._sorted = sorted((normalize_name(name), name) for name in self._grams)
+        self._by_danger = sorted(
+            (-danger, normalize_name(name), name) for name, danger in self._danger.items()
+        )
+        self.loaded = True
+
+    def _insert(self, name: str, danger_level: int):
+        grams = trigrams(name)
+        self._grams[name] = grams
+        self._danger[name] = danger_level
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(name)
+
+    def add(self, name: str, danger_level: int):
+        """Добавляет или обновляет имя в индексе (если индекс уже загружен)."""
+        if self._pending is not None:
+            self._pending.append((name, danger_level))
+            return
+        if not self.loaded:
+            return
+        self.remove(name)
+        self._insert(name, danger_level)
+        normalized = normalize_name(name)
+        insort(self._sorted, (normalized, name))
+        insort(self._by_danger, (-danger_level, normalized, name))
+
+    def remove(self, name: str):
+        """Удаляет имя из индекса."""
+        if self._pending is not None:
+            self._pending.append((name, None))
+            return
+        grams = self._grams.pop(name, None)
+        if grams is None:
+            return
+        danger_level = self._danger.pop(name)
+        normalized = normalize_name(name)
+        _discard_sorted(self._sorted, (normalized, name))
+        _discard_sorted(self._by_danger, (-danger_level, normalized, name))
+        for gram in grams:
+            names = self._postings.get(gram)
+            if names is not None:
+                names.discard(name)
+                if not names:
+                    del self._postings[gram]
+
+    def search(self, query: str, limit: int = 10, threshold: float = 0.3) -> list:
+        """Ищет имена, похожие на запрос, по коэффициенту Жаккара триграмм.
+
+        Args:
+            query (str): Строка запроса (возможно, с опечатками).
+            limit (int): Максимальное количество результатов.
+            threshold (float): Минимальное сходство от 0 до 1.
+
+        Returns:
+            list: Пары (имя, сходство), отсортированные по убыванию сходства.
+        """
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+        # Фильтрация по префиксу: при сходстве >= threshold имя обязано иметь
+        # не меньше ceil(threshold * |Q|) общих триграмм, значит оно встретится
+        # среди |Q| - min_common + 1 самых редких триграмм запроса. Частые
+        # триграммы (например, начало имени) в перебор кандидатов не попадают.
+        min_common = max(1, math.ceil(threshold * len(query_grams)))
+        rare_first = sorted(query_grams, key=lambda g: len(self._postings.get(g, ())))
+        candidates = set()
+        for gram in rare_first[: len(query_grams) - min_common + 1]:
+            candidates.update(self._postings.get(gram, ()))
+
+        matches = []
+        for name in candidates:
+            grams = self._grams[name]
+            common = len(query_grams & grams)
+            similarity = common / (len(query_grams) + len(grams) - common)
+            if similarity >= threshold:
+                matches.append((name, round(similarity, 3)))
+        matches.sort(key=lambda match: (-match[1], match[0]))
+        return matches[:limit]
+
+    async def search_filtered(
+        self, query: str, matching, limit: int, filtered: bool = True
+    ) -> list:
+        """Похожие на query существа, прошедшие фильтры, от самых похожих.
+
+        Фильтры применяются к кандидатам из search. Если после них осталось
+        меньше limit существ, а индекс мог отдать больше кандидатов, круг
+        кандидатов расширяется вдвое: отфильтрованный поиск не теряет
+        совпадений, которые оказались ниже первых limit.
+
+        Args:
+            query (str): Строка запроса.
+            matching (callable): Корутина matching(names) -> {имя: существо}
+                для имён из names, прошедших фильтры (вызывается порциями
+                не больше limit имён).
+            limit (int): Максимальное количество результатов.
+            filtered (bool): False - фильтров нет, расширять круг не нужно.
+
+        Returns:
+            list: Существа (значения matching) по убыванию сходства.
+        """
+        found, checked, window = {}, 0, limit
+        while True:
+            ranked = [name for name, _ in self.search(query, limit=window)]
+            # Порядок кандидатов при расширении сохраняется: проверяем только новых
+            for start in range(checked, len(ranked), limit):
+                found.update(await matching(ranked[start : start + limit]))
+            checked = len(ranked)
+            if len(found) >= limit or len(ranked) < window or not filtered:
+                break
+            window *= 2
+        rank = {name: position for position, name in enumerate(ranked)}
+        names = sorted(found, key=lambda name: rank.get(name, len(rank)))
+        return [found[name] for name in names[:limit]]
+
+    def suggest(self, prefix: str, limit: int = 10, by: str = "name") -> list:
+        """Возвращает имена, начинающиеся с префикса (без учёта регистра).
+
+        Args:
+            prefix (str): Введённое начало имени.
+            limit (int): Максимальное количество подсказок.
+            by (str): Порядок: 'name' - по алфавиту, 'danger' - сначала опасные.
+
+        Returns:
+            list: Имена существ.
+        """
+        key = normalize_name(prefix)
+        if not key:
+            # Префикс из одних пробелов и знаков не ограничивает имена
+            return []
+        start = bisect_left(self._sorted, (key,))
+        # Все ключи с префиксом key лежат в [key, key + U+10FFFF)
+        end = bisect_left(self._sorted, (key + "\U0010ffff",), lo=start)
+        if by == "danger":
+            matched = end - start
+            # Короткий префикс совпадает со многими именами: быстрее идти по
+            # списку от самых опасных, пока не наберётся limit подходящих.
+            # Это limit * n / matched шагов в среднем, а не в худшем случае:
+            # если подходящие имена собрались внизу списка, обход прерывается
+            # после WALK_FACTOR средних длин и уступает куче по диапазону.
+            if matched * matched > limit * len(self._by_danger):
+                budget = WALK_FACTOR * limit * len(self._by_danger) // matched
+                names = []
+                for _, normalized, name in islice(self._by_danger, budget):
+                    if normalized.startswith(key):
+                        names.append(name)
+                        if len(names) == limit:
+                            return names
+                if budget >= len(self._by_danger):
+                    return names
+            # Порядок равных по опасности - по имени, как и при обходе
+            top = heapq.nlargest(
+                limit,
+                self._sorted[start:end],
+                key=lambda entry: self._danger[entry[1]],
+            )
+            return [name for _, name in top]
+        return [name for _, name in self._sorted[start : min(end, start + limit)]]
+
+
+def _discard_sorted(entries: list, entry: tuple):
+    """Удаляет entry из отсортированного списка, если он там есть."""
+    position = bisect_left(entries, entry)
+    if position < len(entries) and entries[position] == entry:
+        del entries[position]
+
+
+# Индексы по базам данных (ключ - URL движка)
+_indexes = {}
+
+
+def get_name_index(db: AsyncSession) -> NameIndex:
+    """Возвращает индекс имён для базы данных, к которой привязана сессия."""
+    key = database_key(db)
+    if key not in _indexes:
+        _indexes[key] = NameIndex()
+    return _indexes[key]
+
+
+def name_index_loaded(key: str) -> bool:
+    """Загружен ли индекс имён базы данных с ключом key (для /ready)."""
+    index = _indexes.get(key)
+    return index is not None and index.loaded
+
+
+async def ensure_name_index(db: AsyncSession) -> NameIndex:
+    """Возвращает индекс имён, при необходимости загрузив его из базы данных."""
+    index = get_name_index(db)
+    if not index.loaded:
+        await index.load(db)
+    return index
+
+
+@on_change
+def _apply_change(key: str, action: str, creature: CreatureDB):
+    index = _indexes.get(key)
+    if index is None:
+        return
+    if action == "remove":
+        index.remove(creature.name)
+    else:
+        index.add(creature.name, creature.danger_level)
+
+
+@on_invalidate
+def _drop_indexes(key: str = None):
+    if key is None:
+        _indexes.clear()
+    else:
+        _indexes.pop(key, None)
@@ -0,0 +1,78 @@
+import json
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from services import tenants
+
+MEDIA_TYPE = "application/x-ndjson"
+# Сколько строк читается из курсора за один шаг (и уходит одним куском)
+BATCH_SIZE = 200
+
+
+def wants_ndjson(accept: str) -> bool:
+    """Запрошен ли ответ в формате NDJSON (заголовок Accept)."""
+    if not accept:
+        return False
+    return any(
+        part.split(";")[0].strip() == MEDIA_TYPE for part in accept.split(",")
+    )
+
+
+def _line(data: dict) -> str:
+    return json.dumps(data, ensure_ascii=False) + "\n"
+
+
+async def stream_query(bind, query, serialize, batch_size: int = BATCH_SIZE):
+    """Открывает курсор запроса и возвращает генератор строк NDJSON.
+
+    Первая порция читается сразу, чтобы пустой результат можно было
+    превратить в 404 до начала ответа. Дальше в памяти держится только
+    текущая порция. Сессия своя: сессия из get_db закрывается раньше, чем
+    ответ дочитывается клиентом. Для бестиария она до конца ответа
+    занимает место в лимите сессий (services.tenants).
+
+    Args:
+        bind: Движок (db.bind) сессии запроса.
+        query: Запрос select(CreatureDB)...
+        serialize (callable): Преобразование строки в словарь ответа.
+        batch_size (int): Размер порции.
+
+    Returns:
+        AsyncIterator[str] | None: Генератор строк или None, если строк нет.
+    """
+    lease = await tenants.tenant_engines.lease(bind)
+    session = AsyncSession(bind)
+    try:
+        result = await session.stream(query.execution_options(yield_per=batch_size))
+        partitions = result.scalars().partitions(batch_size)
+        first = await anext(partitions, None)
+    except BaseException:
+        await session.close()
+        lease.release()
+        raise
+    if first is None:
+        await result.close()
+        await session.close()
+        lease.release()
+        return None
+
+    async def lines():
+        try:
+            yield "".join(_line(serialize(row)) for row in first)
+            async for batch in partitions:
+                yield "".join(_line(serialize(row)) for row in batch)
+        finally:
+            await result.close()
+            await session.close()
+            lease.release()
+
+    return lines()
+
+
+def iterate_payloads(payloads, batch_size: int = BATCH_SIZE):
+    """Генератор строк NDJSON из готовых словарей (порциями по batch_size)."""
+    for start in range(0, len(payloads), batch_size):
+        yield "".join(_line(data) for data in payloads[start : start + batch_size])
+
+
+def ndjson_response(lines, headers: dict = None) -> StreamingResponse:
+    return StreamingResponse(lines, media_type=MEDIA_TYPE, headers=headers)
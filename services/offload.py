@@ -0,0 +1,82 @@
+import asyncio
+import csv
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from io import StringIO
+from config import OFFLOAD_MODE, OFFLOAD_WORKERS
+
+
+def csv_chunk(fieldnames, rows, header: bool = False) -> str:
+    """Формирует кусок CSV из строк (и заголовка, если header=True)."""
+    output = StringIO()
+    writer = csv.DictWriter(output, fieldnames=fieldnames, lineterminator="\n")
+    if header:
+        writer.writeheader()
+    writer.writerows(rows)
+    return output.getvalue()
+
+
+def json_chunk(rows, compact: bool = True) -> str:
+    """Формирует кусок JSON-массива из строк (без скобок).
+
+    Args:
+        rows (list): Словари существ.
+        compact (bool): Без пробелов, как JSONResponse; иначе с разделителями
+            json.dumps по умолчанию (', ' и ': ').
+    """
+    if compact:
+        return ",".join(
+            json.dumps(row, ensure_ascii=False, separators=(",", ":")) for row in rows
+        )
+    return ", ".join(json.dumps(row, ensure_ascii=False) for row in rows)
+
+
+class Offloader:
+    """Пул для кодирования больших ответов вне цикла событий.
+
+    Режимы (BEASTIARY_OFFLOAD):
+        - 'thread' - пул потоков: json и csv отпускают GIL не всегда, но цикл
+          событий продолжает обслуживать запросы между порциями;
+        - 'process' - пул процессов: кодирование не конкурирует с циклом за
+          GIL, зато строки копируются в процесс и обратно;
+        - 'inline' - прямо в цикле событий (как раньше, для отладки).
+
+    Функции для пула процессов должны быть объявлены на уровне модуля, а
+    аргументы - сериализуемы pickle (словари, списки, строки).
+    """
+
+    def __init__(self, mode: str = OFFLOAD_MODE, workers: int = OFFLOAD_WORKERS):
+        self.mode = mode
+        self.workers = workers
+        self._executor = None
+
+    def executor(self):
+        """Пул создаётся при первой задаче."""
+        if self._executor is None:
+            if self.mode == "process":
+                # spawn: дочерние процессы не наследуют цикл событий и потоки
+                self._executor = ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    self.workers, thread_name_prefix="beastiary-offload"
+                )
+        return self._executor
+
+    async def run(self, func, *args):
+        """Выполняет func(*args) в пуле и возвращает результат."""
+        if self.mode == "inline":
+            return func(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor(), func, *args)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Общий пул процесса
+offload = Offloader()
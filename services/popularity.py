@@ -0,0 +1,218 @@
+import asyncio
+import logging
+import re
+import time
+from collections import Counter
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+import config
+from config import (
+    POPULARITY_BUCKET,
+    POPULARITY_FLUSH_INTERVAL,
+    POPULARITY_RETENTION_DAYS,
+)
+from models.creature import CreatureDB, CreatureViewsDB
+from services import tenants
+from services.single_flight import on_shared
+
+logger = logging.getLogger(__name__)
+
+# Окно /top: число часов или дней ('24h', '7d') или 'all'
+WINDOW = re.compile(r"^(?:(\d{1,4})([hd])|all)$")
+_UNIT_SECONDS = {"h": 3600, "d": 86400}
+
+
+def window_seconds(window: str):
+    """Длительность окна в секундах или None для 'all'.
+
+    Raises:
+        ValueError: Если окно записано неверно.
+    """
+    match = WINDOW.match(window)
+    if match is None:
+        raise ValueError(window)
+    if window == "all":
+        return None
+    return int(match.group(1)) * _UNIT_SECONDS[match.group(2)]
+
+
+class ViewCounters:
+    """Счётчики просмотров существ в памяти со сбросом в базу пачками.
+
+    Просмотр - это увеличение счётчика в словаре (без запросов к базе).
+    Раз в flush_interval секунд накопленное записывается одной транзакцией:
+    одна строка на существо и интервал bucket секунд, с прибавлением к уже
+    записанному (INSERT ... ON CONFLICT DO UPDATE). Поэтому воркеры
+    serve.py считают независимо, каждый как свой шард, а сумма
+    складывается в базе. Строки старше retention_days удаляются. В режиме
+    только для чтения (BEASTIARY_READ_ONLY) просмотры не считаются и не
+    записываются.
+    """
+
+    def __init__(
+        self,
+        bucket: int = POPULARITY_BUCKET,
+        flush_interval: float = POPULARITY_FLUSH_INTERVAL,
+        retention_days: float = POPULARITY_RETENTION_DAYS,
+    ):
+        self.bucket = bucket
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        # Ключ базы -> Counter((имя, начало интервала))
+        self.pending = {}
+        self.binds = {}
+        self.flushed = 0
+        self.batches = 0
+        self._pruned_at = 0.0
+        self._task = None
+        self._lock = asyncio.Lock()
+
+    def record_view(self, scope, bind, name: str):
+        """Засчитывает просмотр из маршрута /info.
+
+        Засчитываются и одинаковые одновременные запросы, получившие тот же
+        ответ без выполнения маршрута (services.single_flight).
+        """
+        if not config.POPULARITY or config.READ_ONLY:
+            return
+        self.record(bind, name)
+        on_shared(scope, lambda: self.record(bind, name))
+
+    def record(self, bind, name: str, now: float = None):
+        """Засчитывает просмотр существа name в базе движка bind."""
+        key = str(bind.url)
+        now = time.time() if now is None else now
+        counter = self.pending.get(key)
+        if counter is None:
+            counter = self.pending[key] = Counter()
+            self.binds[key] = bind
+        counter[(name, int(now) // self.bucket * self.bucket)] += 1
+
+    async def flush(self, key: str = None) -> int:
+        """Записывает накопленные просмотры (одной базы или всех).
+
+        Returns:
+            int: Сколько строк (существо, интервал) записано.
+        """
+        if config.READ_ONLY:
+            return 0
+        keys = [key] if key is not None else list(self.pending)
+        written = 0
+        for db_key in keys:
+            bind = self.binds.get(db_key)
+            if bind is None or not self.pending.get(db_key):
+                continue
+            # Место в лимите сессий бестиариев занимается до блокировки: /top
+            # ждёт блокировку, уже заняв место своим запросом
+            async with tenants.tenant_engines.session(bind) as session:
+                async with self._lock:
+                    counter = self.pending.pop(db_key, None)
+                    if not counter:
+                        continue
+                    try:
+                        await self._write(session, counter)
+                    except Exception as e:
+                        # Не теряем просмотры: вернём их к новым и попробуем позже
+                        logger.error(f"Ошибка записи просмотров: {e}")
+                        self.pending.setdefault(db_key, Counter()).update(counter)
+                        continue
+            written += len(counter)
+            self.batches += 1
+        self.flushed += written
+        return written
+
+    async def forget(self, bind):
+        """Записывает просмотры базы движка bind и забывает движок (перед его закрытием)."""
+        key = str(bind.url)
+        await self.flush(key)
+        if not self.pending.get(key):
+            self.binds.pop(key, None)
+
+    async def _write(self, session: AsyncSession, counter: Counter):
+        rows = [
+            {"name": name, "bucket": bucket, "views": views}
+            for (name, bucket), views in counter.items()
+        ]
+        statement = insert(CreatureViewsDB)
+        statement = statement.on_conflict_do_update(
+            index_elements=["name", "bucket"],
+            set_={"views": CreatureViewsDB.views + statement.excluded.views},
+        )
+        await session.execute(statement, rows)
+        now = time.time()
+        if now - self._pruned_at > 3600:
+            await session.execute(
+                delete(CreatureViewsDB).where(
+                    CreatureViewsDB.bucket < now - self.retention_days * 86400
+                )
+            )
+            self._pruned_at = now
+        await session.commit()
+
+    async def top(self, db: AsyncSession, window: str, limit: int) -> list:
+        """Самые просматриваемые существа за окно.
+
+        Сначала записываются накопленные просмотры этой базы, так что
+        результат учитывает просмотры до самого запроса.
+
+        Args:
+            db (AsyncSession): Сессия базы данных.
+            window (str): Окно: '24h', '7d', 'all' и т.п.
+            limit (int): Количество существ.
+
+        Returns:
+            list: Пары (имя, просмотры) по убыванию просмотров.
+        """
+        seconds = window_seconds(window)
+        await self.flush(str(db.bind.url))
+        views = func.sum(CreatureViewsDB.views).label("views")
+        query = (
+            select(CreatureViewsDB.name, views)
+            # Удалённые существа не попадают в рейтинг
+            .join(CreatureDB, CreatureDB.name == CreatureViewsDB.name)
+            .group_by(CreatureViewsDB.name)
+            .order_by(views.desc(), CreatureViewsDB.name)
+            .limit(limit)
+        )
+        if seconds is not None:
+            since = int(time.time() - seconds) // self.bucket * self.bucket
+            query = query.where(CreatureViewsDB.bucket >= since)
+        return (await db.execute(query)).all()
+
+    def reset(self):
+        """Забывает незаписанные просмотры (для тестов)."""
+        self.pending.clear()
+        self.binds.clear()
+
+    def stats(self) -> dict:
+        return {
+            "В_памяти": sum(len(counter) for counter in self.pending.values()),
+            "Записано": self.flushed,
+            "Пачек": self.batches,
+        }
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_periodically())
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def stop(self):
+        """Останавливает сброс по таймеру и записывает остаток."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+# Счётчики просмотров процесса
+view_counters = ViewCounters()
+tenants.on_engine_close(view_counters.forget)
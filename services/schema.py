@@ -0,0 +1,94 @@
+import logging
+from sqlalchemy import inspect, text
+from database import Base
+from models import creature  # noqa: F401  (регистрирует таблицы в Base.metadata)
+
+logger = logging.getLogger(__name__)
+
+# Версия схемы базы данных; хранится в заголовке файла SQLite (PRAGMA user_version).
+# При изменении схемы увеличьте версию и добавьте шаг в MIGRATIONS.
+SCHEMA_VERSION = 4
+
+
+def _add_creature_views(conn):
+    creature.CreatureViewsDB.__table__.create(conn, checkfirst=True)
+
+
+def _add_change_tracking(conn):
+    columns = {column["name"] for column in inspect(conn).get_columns("creatures")}
+    if "change_seq" not in columns:
+        conn.execute(text("ALTER TABLE creatures ADD COLUMN change_seq INTEGER"))
+        # Существующие строки получают номера в порядке id
+        conn.execute(text("UPDATE creatures SET change_seq = id"))
+    for index in creature.CreatureDB.__table__.indexes:
+        if [column.name for column in index.columns] == ["change_seq"]:
+            index.create(conn, checkfirst=True)
+    creature.CreatureTombstoneDB.__table__.create(conn, checkfirst=True)
+    creature.ChangeSequenceDB.__table__.create(conn, checkfirst=True)
+    creature.install_change_tracking(conn)
+
+
+def _add_tombstone_pruning(conn):
+    columns = {column["name"] for column in inspect(conn).get_columns("change_sequence")}
+    if "pruned_through" not in columns:
+        conn.execute(
+            text(
+                "ALTER TABLE change_sequence "
+                "ADD COLUMN pruned_through INTEGER NOT NULL DEFAULT 0"
+            )
+        )
+
+
+# Шаги миграции: версия -> функция(conn), переводящая схему из версии - 1 в версию
+MIGRATIONS = {
+    2: _add_creature_views,
+    3: _add_change_tracking,
+    4: _add_tombstone_pruning,
+}
+
+
+async def get_schema_version(conn) -> int:
+    return (await conn.exec_driver_sql("PRAGMA user_version")).scalar()
+
+
+async def ensure_schema(engine) -> str:
+    """Проверяет версию схемы и выполняет DDL только при необходимости.
+
+    Чтение user_version - одно обращение к заголовку файла, поэтому при
+    актуальной схеме запуск обходится без create_all и транзакции.
+
+    Args:
+        engine (AsyncEngine): Движок базы данных.
+
+    Returns:
+        str: 'current' - схема актуальна, 'created' - таблицы созданы,
+            'migrated' - выполнены миграции.
+
+    Raises:
+        RuntimeError: Если база создана более новой версией приложения.
+    """
+    async with engine.connect() as conn:
+        version = await get_schema_version(conn)
+    if version == SCHEMA_VERSION:
+        return "current"
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(
+            f"Схема базы данных версии {version} новее поддерживаемой ({SCHEMA_VERSION})"
+        )
+
+    async with engine.begin() as conn:
+        if version == 0:
+            tables = await conn.run_sync(
+                lambda sync_conn: inspect(sync_conn).get_table_names()
+            )
+            if "creatures" not in tables:
+                await conn.run_sync(Base.metadata.create_all)
+                await conn.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
+                return "created"
+            # База создана до учёта версий - это схема версии 1
+            version = 1
+        for step in range(version + 1, SCHEMA_VERSION + 1):
+            logger.info(f"Миграция схемы базы данных до версии {step}")
+            await conn.run_sync(MIGRATIONS[step])
+        await conn.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return "migrated"
@@ -0,0 +1,49 @@
+from functools import lru_cache
+from fastapi.responses import JSONResponse
+from pydantic import HttpUrl, TypeAdapter, ValidationError
+import config
+
+# Ключи ответа с адресами (в CreatureResponse это HttpUrl)
+URL_KEYS = ("Url_изображения", "Url_аудио", "Url_видео")
+
+_http_url = TypeAdapter(HttpUrl)
+
+
+@lru_cache(maxsize=65536)
+def normalize_url(url: str) -> str:
+    """Адрес в том виде, в каком его вернула бы проверка HttpUrl.
+
+    Каждая строка разбирается один раз, дальше берётся из кэша.
+    """
+    try:
+        return str(_http_url.validate_python(url))
+    except ValidationError:
+        # Проверка ответа вернула бы 500; быстрый путь отдаёт адрес как есть
+        return url
+
+
+def trusted_creature(data: dict) -> dict:
+    """Готовит результат transform_creature к выдаче без проверки CreatureResponse."""
+    for key in URL_KEYS:
+        url = data[key]
+        if url is not None:
+            data[key] = normalize_url(url)
+    return data
+
+
+def respond(content: dict):
+    """Отдаёт ответ маршрута, минуя повторную проверку response_model.
+
+    Данные строятся нашим кодом из строк базы данных, поэтому их не нужно
+    снова разбирать моделью ответа: JSONResponse сериализуется сразу, а
+    response_model маршрута остаётся только для документации OpenAPI.
+    Словарь должен содержать ровно те ключи и в том порядке, что выдала
+    бы модель (для маршрутов с response_model_exclude_unset - только
+    заданные ключи).
+
+    При BEASTIARY_VALIDATE_RESPONSES=1 (режим отладки) словарь
+    возвращается как есть, и FastAPI проверяет его моделью ответа.
+    """
+    if config.VALIDATE_RESPONSES:
+        return content
+    return JSONResponse(content=content)
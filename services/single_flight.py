@@ -0,0 +1,154 @@
+import asyncio
+import re
+from urllib.parse import parse_qsl, urlencode
+from config import COALESCE_MAX_BYTES
+from services.changes import generation
+from services.tenants import TENANT_HEADER
+
+# GET-маршруты, одинаковые запросы к которым можно объединять. Не входят
+# /random (каждый ответ должен быть своим), лента и файлы: /export отдаёт
+# весь бестиарий потоком, и ждущие получили бы первый байт только после
+# того, как ведущий дочитает всё (или превысит COALESCE_MAX_BYTES).
+COALESCED_PATHS = re.compile(
+    r"^/beastiary/("
+    r"list|info/[^/]+|search|suggest|category/[^/]+|categories|dangerous"
+    r"|stats|stats/distribution"
+    r")$"
+)
+# Заголовки, от которых зависит ответ (входят в ключ): формат и бестиарий
+VARY_HEADERS = (b"accept", TENANT_HEADER.encode())
+# Ответы, которые не раздаются ждущим: отказ допуска касается только ведущего
+NOT_SHARED_STATUSES = (429, 503)
+# Ключ scope["extensions"], под которым маршрут ведущего запроса видит _Flight
+FLIGHT_EXTENSION = "beastiary.single_flight"
+
+
+class _Flight:
+    """Одно выполнение запроса, результат которого получат все ждущие."""
+
+    __slots__ = ("done", "messages", "followers", "on_share")
+
+    def __init__(self):
+        self.done = asyncio.Event()
+        self.messages = None
+        self.followers = 0
+        self.on_share = []
+
+
+def on_shared(scope, callback):
+    """Вызывает callback() за каждого ждущего, получившего ответ этого запроса.
+
+    Ждущие не выполняют маршрут, поэтому побочный учёт маршрута (например,
+    просмотры /info) за них выполняется здесь. Для запроса, который не
+    объединяется, ничего не делает.
+    """
+    flight = (scope.get("extensions") or {}).get(FLIGHT_EXTENSION)
+    if flight is not None:
+        flight.on_share.append(callback)
+
+
+class SingleFlight:
+    """Выполняющиеся запросы по ключам и счётчики объединения."""
+
+    def __init__(self, max_bytes: int = COALESCE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.flights = {}
+        self.executed = 0
+        self.coalesced = 0
+        self.fallbacks = 0
+
+    def stats(self) -> dict:
+        return {
+            "Выполнено": self.executed,
+            "Объединено": self.coalesced,
+            "Выполнено_повторно": self.fallbacks,
+            "В_процессе": len(self.flights),
+        }
+
+
+def request_key(scope):
+    """Ключ объединения запроса или None, если запрос не объединяется."""
+    if scope["type"] != "http" or scope["method"] != "GET":
+        return None
+    path = scope["path"]
+    if not COALESCED_PATHS.match(path):
+        return None
+    params = parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True)
+    headers = dict(scope["headers"])
+    return (
+        scope.get("root_path", ""),
+        path,
+        urlencode(sorted(params)),
+        tuple(headers.get(name) for name in VARY_HEADERS),
+        generation(),
+    )
+
+
+class SingleFlightMiddleware:
+    """ASGI-middleware объединения одинаковых одновременных GET-запросов.
+
+    Ключ - путь, отсортированные параметры запроса, заголовки VARY_HEADERS и
+    общий счётчик изменений данных (services.changes.generation): запрос,
+    пришедший после записи, не получит ответ, вычисленный до неё.
+
+    Первый запрос выполняется как обычно, а его ответ заодно собирается в
+    памяти (не больше max_bytes) и после завершения отправляется всем
+    ждущим. Если ответ слишком большой, выполнение упало или допуск
+    отказал (429/503), ждущие выполняют запрос сами.
+    """
+
+    def __init__(self, app, state: SingleFlight = None):
+        self.app = app
+        self.state = state
+
+    async def __call__(self, scope, receive, send):
+        state = self.state or single_flight
+        key = request_key(scope)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+
+        flight = state.flights.get(key)
+        if flight is not None:
+            state.coalesced += 1
+            flight.followers += 1
+            await flight.done.wait()
+            if flight.messages is not None:
+                for callback in flight.on_share:
+                    callback()
+                for message in flight.messages:
+                    await send(message)
+                return
+            state.fallbacks += 1
+            await self.app(scope, receive, send)
+            return
+
+        flight = state.flights[key] = _Flight()
+        state.executed += 1
+        messages, size, shared = [], 0, True
+
+        async def tee(message):
+            nonlocal size, shared
+            if message["type"] == "http.response.start":
+                shared = message["status"] not in NOT_SHARED_STATUSES
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+                shared = shared and size <= state.max_bytes
+            if shared:
+                messages.append(message)
+            await send(message)
+
+        scope = dict(
+            scope, extensions={**(scope.get("extensions") or {}), FLIGHT_EXTENSION: flight}
+        )
+        try:
+            await self.app(scope, receive, tee)
+            if shared:
+                flight.messages = messages
+        finally:
+            del state.flights[key]
+            flight.done.set()
+
+
+# Общее состояние объединения запросов процесса
+single_flight = SingleFlight()
@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import time
+from sqlalchemy.ext.asyncio import AsyncSession
+from services.distribution import columns_loaded, ensure_columns
+from services.media import media_prefetcher
+from services.memory_store import memory_serving
+from services.name_index import ensure_name_index, name_index_loaded
+
+logger = logging.getLogger(__name__)
+
+
+class Readiness:
+    """Состояние запуска: этапы с длительностью и время до готовности."""
+
+    def __init__(self):
+        self.task = None
+        self.begin()
+
+    def begin(self):
+        """Начинает отсчёт времени до готовности."""
+        self.started = time.perf_counter()
+        self.ready = False
+        self.time_to_ready = None
+        self.steps = {}
+
+    async def step(self, name: str, awaitable):
+        """Выполняет этап запуска и запоминает его длительность."""
+        started = time.perf_counter()
+        result = await awaitable
+        self.steps[name] = round(time.perf_counter() - started, 4)
+        return result
+
+    def mark_ready(self):
+        self.ready = True
+        self.time_to_ready = round(time.perf_counter() - self.started, 4)
+        logger.info(
+            f"Приложение готово за {self.time_to_ready} с (этапы: {self.steps})"
+        )
+
+    def as_dict(self) -> dict:
+        return {
+            "Готово": self.ready,
+            "Время_до_готовности": self.time_to_ready,
+            "Этапы": self.steps,
+        }
+
+
+async def warm_pool(engine, size: int = None):
+    """Открывает соединения пула заранее и читает таблицу существ.
+
+    Первые запросы не платят за открытие соединений, а страницы индекса
+    попадают в файловый кэш ОС.
+    """
+    if size is None:
+        size = getattr(engine.sync_engine.pool, "size", lambda: 1)()
+
+    async def touch():
+        async with engine.connect() as conn:
+            await conn.exec_driver_sql("SELECT count(*) FROM creatures")
+
+    await asyncio.gather(*(touch() for _ in range(size)))
+    return size
+
+
+async def prewarm(engine, readiness: Readiness):
+    """Строит кэши в памяти (индекс имён, колонки статистики и категорий)."""
+    async with AsyncSession(engine) as db:
+        await readiness.step("name_index", ensure_name_index(db))
+        await readiness.step("columns", ensure_columns(db))
+
+
+def pool_stats(engine) -> dict:
+    """Занятость пула соединений движка (для пулов без очереди - только тип)."""
+    pool = engine.sync_engine.pool
+    stats = {"Тип": type(pool).__name__}
+    if hasattr(pool, "checkedout"):
+        size = pool.size()
+        checked_out = pool.checkedout()
+        stats.update(
+            {
+                "Размер": size,
+                "Занято": checked_out,
+                "Свободно": pool.checkedin(),
+                "Сверх_размера": max(pool.overflow(), 0),
+                "Загрузка": round(checked_out / size, 2) if size else None,
+            }
+        )
+    return stats
+
+
+def cache_state(engine) -> dict:
+    """Какие кэши в памяти уже построены для базы данных движка."""
+    key = str(engine.url)
+    return {
+        "Индекс_имён": name_index_loaded(key),
+        "Колонки_статистики": columns_loaded(key),
+        "Хранилище_в_памяти": memory_serving.enabled,
+        "Медиа_в_кэше": len(media_prefetcher.entries),
+    }
+
+
+# Состояние запуска процесса
+readiness = Readiness()
@@ -0,0 +1,203 @@
+import json
+import time
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from config import CHANGES_TOMBSTONE_RETENTION_DAYS
+from models.creature import ChangeSequenceDB, CreatureDB, CreatureTombstoneDB
+from services import tenants
+from services.changes import database_key
+
+# Сколько строк читается из курсора за один шаг (и уходит одним куском)
+BATCH_SIZE = 200
+# Как часто (в секундах) удалять устаревшие надгробия одной базы
+PRUNE_INTERVAL = 3600
+
+
+class AheadOfServer(ValueError):
+    """Номер клиента больше последнего номера базы (база восстановлена из копии)."""
+
+    def __init__(self, latest: int):
+        super().__init__(latest)
+        self.latest = latest
+
+
+class HistoryPruned(ValueError):
+    """Надгробия после номера клиента уже удалены по сроку хранения."""
+
+    def __init__(self, latest: int, pruned_through: int):
+        super().__init__(latest, pruned_through)
+        self.latest = latest
+        self.pruned_through = pruned_through
+
+
+def _line(data: dict) -> str:
+    return json.dumps(data, ensure_ascii=False) + "\n"
+
+
+async def change_bounds(session: AsyncSession) -> tuple:
+    """Последний выданный номер изменения и граница удалённых надгробий.
+
+    Returns:
+        tuple: (последний номер, pruned_through); (0, 0) для пустой базы.
+    """
+    result = await session.execute(
+        select(ChangeSequenceDB.value, ChangeSequenceDB.pruned_through).where(
+            ChangeSequenceDB.id == 1
+        )
+    )
+    row = result.first()
+    return (row.value, row.pruned_through) if row is not None else (0, 0)
+
+
+async def prune_tombstones(
+    session: AsyncSession, retention_days: float, now: float = None
+) -> int:
+    """Удаляет надгробия старше retention_days дней (без коммита).
+
+    Удаляются надгробия с номером не больше наибольшего номера среди
+    устаревших, и этот номер запоминается в change_sequence.pruned_through:
+    синхронизация с меньшего since получит 410 вместо ответа без удалений.
+
+    Returns:
+        int: Сколько надгробий удалено.
+    """
+    now = time.time() if now is None else now
+    through = (
+        await session.execute(
+            select(func.max(CreatureTombstoneDB.change_seq)).where(
+                CreatureTombstoneDB.deleted_at < now - retention_days * 86400
+            )
+        )
+    ).scalar()
+    if through is None:
+        return 0
+    await session.execute(
+        update(ChangeSequenceDB)
+        .where(ChangeSequenceDB.id == 1)
+        .values(pruned_through=func.max(ChangeSequenceDB.pruned_through, through))
+    )
+    result = await session.execute(
+        delete(CreatureTombstoneDB).where(CreatureTombstoneDB.change_seq <= through)
+    )
+    return result.rowcount
+
+
+# Когда (time.monotonic) надгробия базы удалялись в последний раз, по ключу базы
+_pruned_at = {}
+
+
+async def prune_tombstones_periodically(
+    session: AsyncSession, retention_days: float = CHANGES_TOMBSTONE_RETENTION_DAYS
+) -> int:
+    """prune_tombstones не чаще раза в PRUNE_INTERVAL секунд на базу.
+
+    Вызывается маршрутами удаления в их транзакции; retention_days = 0
+    отключает удаление.
+    """
+    if retention_days <= 0:
+        return 0
+    key = database_key(session)
+    now = time.monotonic()
+    if key in _pruned_at and now - _pruned_at[key] < PRUNE_INTERVAL:
+        return 0
+    _pruned_at[key] = now
+    return await prune_tombstones(session, retention_days)
+
+
+async def open_changes(bind, since: int, serialize) -> tuple:
+    """Изменения существ с номером больше since в виде строк NDJSON.
+
+    Строка - это итоговое состояние существа ({"Номер", "Действие":
+    "upsert", "Существо"}) или его удаление ({"Номер", "Действие":
+    "remove", "Имя"}), по возрастанию номера. Промежуточные версии не
+    хранятся: существо, изменённое несколько раз, приходит один раз.
+    Выдаются только номера не больше последнего на момент запроса, поэтому
+    всё, что записано во время чтения, клиент получит при следующей
+    синхронизации с since = возвращённому номеру. При since = 0 надгробия
+    не нужны (у клиента ещё ничего нет) и не читаются.
+
+    Номер, надгробия и строки читаются в одной явной транзакции, то есть
+    из одного снимка базы: запись, завершённая между этими запросами, не
+    попадёт в ответ частично.
+
+    Args:
+        bind: Движок (db.bind) сессии запроса.
+        since (int): Последний номер, который есть у клиента.
+        serialize (callable): Преобразование строки CreatureDB в словарь.
+
+    Returns:
+        tuple: (последний номер базы, генератор строк NDJSON).
+
+    Raises:
+        AheadOfServer: Если since больше последнего номера базы.
+        HistoryPruned: Если надгробия после since уже удалены по сроку.
+    """
+    # Сессия своя: сессия из get_db закрывается раньше, чем ответ дочитывается
+    lease = await tenants.tenant_engines.lease(bind)
+    session = AsyncSession(bind)
+    try:
+        # pysqlite не начинает транзакцию перед SELECT - начинаем её сами;
+        # закрытие сессии выполнит ROLLBACK и отпустит снимок
+        connection = await session.connection()
+        await connection.exec_driver_sql("BEGIN")
+        latest, pruned_through = await change_bounds(session)
+        if since > latest:
+            raise AheadOfServer(latest)
+        if 0 < since < pruned_through:
+            raise HistoryPruned(latest, pruned_through)
+        tombstones = []
+        if since:
+            tombstones = (
+                await session.execute(
+                    select(CreatureTombstoneDB.name, CreatureTombstoneDB.change_seq)
+                    .where(CreatureTombstoneDB.change_seq.between(since + 1, latest))
+                    .order_by(CreatureTombstoneDB.change_seq)
+                )
+            ).all()
+        result = await session.stream(
+            select(CreatureDB)
+            .where(CreatureDB.change_seq.between(since + 1, latest))
+            .order_by(CreatureDB.change_seq)
+            .execution_options(yield_per=BATCH_SIZE)
+        )
+    except BaseException:
+        await session.close()
+        lease.release()
+        raise
+
+    def removal(tombstone) -> str:
+        return _line(
+            {"Номер": tombstone.change_seq, "Действие": "remove", "Имя": tombstone.name}
+        )
+
+    async def lines():
+        removed = iter(tombstones)
+        pending = next(removed, None)
+        try:
+            async for batch in result.scalars().partitions(BATCH_SIZE):
+                chunk = []
+                for creature in batch:
+                    # Удаления встают между строками по своим номерам
+                    while pending is not None and pending.change_seq < creature.change_seq:
+                        chunk.append(removal(pending))
+                        pending = next(removed, None)
+                    chunk.append(
+                        _line(
+                            {
+                                "Номер": creature.change_seq,
+                                "Действие": "upsert",
+                                "Существо": serialize(creature),
+                            }
+                        )
+                    )
+                yield "".join(chunk)
+            rest = [] if pending is None else [removal(pending)]
+            rest.extend(removal(tombstone) for tombstone in removed)
+            if rest:
+                yield "".join(rest)
+        finally:
+            await result.close()
+            await session.close()
+            lease.release()
+
+    return latest, lines()
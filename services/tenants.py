@@ -0,0 +1,320 @@
+import asyncio
+import logging
+import os
+import re
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from config import (
+    TENANT_CREATE,
+    TENANT_MAX_CONNECTIONS,
+    TENANT_MAX_ENGINES,
+    TENANT_POOL_OVERFLOW,
+    TENANT_POOL_SIZE,
+    TENANTS_DIR,
+)
+from services.changes import invalidate
+
+logger = logging.getLogger(__name__)
+
+# Заголовок с именем бестиария; без него запрос идёт в основную базу
+TENANT_HEADER = "x-bestiary-tenant"
+# Имя бестиария - это имя файла: только буквы, цифры, '-' и '_'
+TENANT_NAME = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+# Префикс пути /tenants/{имя}/beastiary/... - то же, что заголовок
+TENANT_PATH = re.compile(r"^/tenants/([^/]+)(/.*)$")
+
+
+# Действия перед закрытием движка бестиария: await hook(engine)
+_close_hooks = []
+# Место в лимите сессий, занятое текущим запросом (его делят вложенные сессии)
+_request_slot = ContextVar("tenant_request_slot", default=None)
+
+
+def on_engine_close(hook):
+    """Регистрирует корутину hook(engine), вызываемую перед закрытием движка
+    бестиария (можно как декоратор).
+
+    Компоненты, которые пишут в базу в фоне, дописывают в ней накопленное и
+    забывают движок: закрытый движок открыл бы соединения заново, мимо LRU
+    и лимита сессий.
+    """
+    _close_hooks.append(hook)
+    return hook
+
+
+class InvalidTenant(ValueError):
+    """Имя бестиария не подходит для имени файла."""
+
+
+class UnknownTenant(LookupError):
+    """Файла бестиария нет, а создание новых выключено."""
+
+
+class _Tenant:
+    """Открытый движок бестиария и число запросов, которые его используют."""
+
+    __slots__ = ("name", "engine", "active")
+
+    def __init__(self, name: str, engine):
+        self.name = name
+        self.engine = engine
+        self.active = 0
+
+
+class _Slot:
+    """Место в общем лимите сессий и число сессий, которые его делят."""
+
+    __slots__ = ("users",)
+
+    def __init__(self):
+        self.users = 1
+
+
+class _Lease:
+    """Сессия на движке бестиария: место в лимите и защита движка от вытеснения."""
+
+    __slots__ = ("engines", "tenant", "slot")
+
+    def __init__(self, engines, tenant: _Tenant, slot: _Slot):
+        self.engines = engines
+        self.tenant = tenant
+        self.slot = slot
+
+    def release(self):
+        if self.tenant is None:
+            return
+        self.engines.sessions -= 1
+        if self.slot is not None:
+            self.engines._give_slot(self.slot)
+        self.engines.release(self.tenant)
+        self.tenant = None
+
+
+class TenantEngines:
+    """Движки бестиариев (файлов SQLite в каталоге) с вытеснением по LRU.
+
+    Движок открывается при первом запросе к бестиарию: схема проверяется
+    и при необходимости создаётся (services.schema). Пул каждого движка
+    маленький (pool_size + max_overflow), а открытых движков не больше
+    max_engines: при открытии нового закрываются давно не использованные
+    и свободные, вместе с их кэшами в памяти. Общее число одновременных
+    сессий всех бестиариев ограничено max_connections.
+    """
+
+    def __init__(
+        self,
+        directory: str = TENANTS_DIR,
+        max_engines: int = TENANT_MAX_ENGINES,
+        max_connections: int = TENANT_MAX_CONNECTIONS,
+        create: bool = TENANT_CREATE,
+    ):
+        self.directory = directory
+        self.max_engines = max_engines
+        self.create = create
+        self.engines = OrderedDict()
+        self.opened = 0
+        self.evicted = 0
+        self.sessions = 0
+        self._connections = asyncio.Semaphore(max_connections)
+        self._lock = asyncio.Lock()
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.db")
+
+    async def acquire(self, name: str) -> _Tenant:
+        """Возвращает движок бестиария (открывает при необходимости).
+
+        Raises:
+            InvalidTenant: Если имя некорректно.
+            UnknownTenant: Если файла нет и create=False.
+        """
+        if not TENANT_NAME.match(name):
+            raise InvalidTenant(name)
+        tenant = self.engines.get(name)
+        if tenant is None:
+            async with self._lock:
+                tenant = self.engines.get(name)
+                if tenant is None:
+                    tenant = await self._open(name)
+        self.engines.move_to_end(name)
+        tenant.active += 1
+        return tenant
+
+    def release(self, tenant: _Tenant):
+        tenant.active -= 1
+
+    async def _take_slot(self) -> _Slot:
+        shared = _request_slot.get()
+        if shared is not None and shared.users:
+            # Вложенная сессия запроса: второе место она ждала бы вечно, если
+            # все места заняли такие же запросы
+            shared.users += 1
+            return shared
+        await self._connections.acquire()
+        return _Slot()
+
+    def _give_slot(self, slot: _Slot):
+        slot.users -= 1
+        if not slot.users:
+            self._connections.release()
+
+    @asynccontextmanager
+    async def slot(self):
+        """Место в общем лимите одновременных сессий всех бестиариев.
+
+        Сессии, открытые внутри (свои сессии потоковых ответов, запись
+        просмотров из /top), делят это место, а оно освобождается, когда
+        закроется последняя из них.
+        """
+        slot = await self._take_slot()
+        token = _request_slot.set(slot)
+        self.sessions += 1
+        try:
+            yield
+        finally:
+            self.sessions -= 1
+            _request_slot.reset(token)
+            self._give_slot(slot)
+
+    def _owner(self, bind) -> _Tenant:
+        for tenant in self.engines.values():
+            if tenant.engine is bind:
+                return tenant
+        return None
+
+    async def lease(self, bind, slot: bool = True) -> _Lease:
+        """Учитывает сессию на движке bind, которая живёт дольше запроса.
+
+        Для движка бестиария сессия занимает место в лимите (или делит место
+        текущего запроса) и не даёт закрыть движок, пока не вызван release();
+        для основной базы ничего не делает.
+
+        Args:
+            bind: Движок сессии.
+            slot (bool): Занимать ли место. False - для сессий, которые пишут
+                за запросы, уже занявшие места и ждущие результата
+                (групповой коммит): иначе они ждали бы друг друга.
+
+        Returns:
+            _Lease: Учёт сессии; release() возвращает место.
+        """
+        tenant = self._owner(bind)
+        if tenant is None:
+            return _Lease(self, None, None)
+        tenant.active += 1
+        try:
+            taken = await self._take_slot() if slot else None
+        except BaseException:
+            self.release(tenant)
+            raise
+        self.sessions += 1
+        return _Lease(self, tenant, taken)
+
+    @asynccontextmanager
+    async def session(self, bind, slot: bool = True, **kwargs):
+        """AsyncSession(bind, **kwargs) с учётом lease() на время сессии."""
+        lease = await self.lease(bind, slot)
+        try:
+            async with AsyncSession(bind, **kwargs) as session:
+                yield session
+        finally:
+            lease.release()
+
+    async def _open(self, name: str) -> _Tenant:
+        # Импорт здесь: services.schema импортирует модели, а те - database,
+        # который сам импортирует этот модуль
+        from services.schema import ensure_schema
+
+        path = self.path(name)
+        if not os.path.exists(path):
+            if not self.create:
+                raise UnknownTenant(name)
+            os.makedirs(self.directory, exist_ok=True)
+        engine = create_async_engine(
+            f"sqlite+aiosqlite:///{path}",
+            pool_size=TENANT_POOL_SIZE,
+            max_overflow=TENANT_POOL_OVERFLOW,
+        )
+        try:
+            await ensure_schema(engine)
+        except BaseException:
+            await engine.dispose()
+            raise
+        tenant = self.engines[name] = _Tenant(name, engine)
+        self.opened += 1
+        logger.info(f"Открыт бестиарий '{name}' ({path})")
+        await self._evict_idle(keep=name)
+        return tenant
+
+    async def _before_close(self, tenant: _Tenant):
+        for hook in _close_hooks:
+            try:
+                await hook(tenant.engine)
+            except Exception as e:
+                logger.error(f"Ошибка перед закрытием бестиария '{tenant.name}': {e}")
+
+    async def _evict_idle(self, keep: str = None):
+        """Закрывает самые давние свободные движки сверх max_engines."""
+        for name in list(self.engines):
+            if len(self.engines) <= self.max_engines:
+                break
+            tenant = self.engines.get(name)
+            if tenant is None or tenant.active or name == keep:
+                continue
+            await self._before_close(tenant)
+            if tenant.active:
+                # Бестиарий снова понадобился, пока выполнялись hook
+                continue
+            del self.engines[name]
+            await tenant.engine.dispose()
+            # Кэши закрытого бестиария построятся заново при следующем открытии
+            invalidate(str(tenant.engine.url))
+            self.evicted += 1
+
+    def stats(self) -> dict:
+        return {
+            "Открыто": len(self.engines),
+            "Используется": sum(1 for t in self.engines.values() if t.active),
+            "Сессий": self.sessions,
+            "Открыто_всего": self.opened,
+            "Вытеснено": self.evicted,
+        }
+
+    async def close(self):
+        """Закрывает все движки (при остановке приложения)."""
+        while self.engines:
+            _, tenant = self.engines.popitem(last=False)
+            await self._before_close(tenant)
+            await tenant.engine.dispose()
+
+
+class TenantPathMiddleware:
+    """ASGI-middleware: /tenants/{имя}/... превращается в ... с заголовком TENANT_HEADER.
+
+    Дальше по цепочке (допуск, объединение запросов, маршруты) путь
+    выглядит обычным, а бестиарий выбирается по заголовку.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            match = TENANT_PATH.match(scope["path"])
+            if match:
+                name, path = match.groups()
+                headers = [
+                    (key, value)
+                    for key, value in scope["headers"]
+                    if key != TENANT_HEADER.encode()
+                ]
+                headers.append((TENANT_HEADER.encode(), name.encode("utf-8")))
+                scope = dict(scope, path=path, headers=headers)
+                scope.pop("raw_path", None)
+        await self.app(scope, receive, send)
+
+
+# Движки бестиариев процесса
+tenant_engines = TenantEngines()
@@ -6,6 +6,9 @@ from sqlalchemy.orm import sessionmaker
 from sqlalchemy import select, func
 from database import Base, get_db
 from models.creature import CreatureDB
+from services.admission import admission
+from services.changes import invalidate
+from services.popularity import view_counters
 from main import app
 
 # Создаём тестовую базу данных
@@ -21,7 +24,13 @@ async def db_session():
     async with test_engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
         await conn.run_sync(Base.metadata.create_all)
-    
+    # Индексы в памяти относятся к старой базе - сбрасываем их
+    invalidate()
+    # Лимиты частоты не должны переноситься между тестами
+    admission.reset()
+    # Незаписанные просмотры относятся к старой базе
+    view_counters.reset()
+
     # Создаём сессию
     async with TestSessionLocal() as session:
         yield session
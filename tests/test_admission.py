@@ -0,0 +1,95 @@
+import asyncio
+import pytest
+from services.admission import (
+    ConcurrencyLimiter,
+    EndpointClass,
+    Rejected,
+    TokenBucket,
+    admission,
+    classify,
+)
+
+
+def test_classify():
+    assert classify("GET", "/beastiary/info/Ктулху") == "cheap"
+    assert classify("GET", "/beastiary/export") == "heavy"
+    assert classify("GET", "/beastiary/search", b"min_danger=10") == "heavy"
+    assert classify("GET", "/beastiary/search", b"q=%D0%99") == "cheap"
+    assert classify("GET", "/beastiary/changes") == "heavy"
+    assert classify("GET", "/beastiary/changes", b"since=120") == "cheap"
+    assert classify("GET", "/beastiary/stats/distribution") == "heavy"
+    assert classify("GET", "/beastiary/feed") is None
+    assert classify("GET", "/docs") is None
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=2, burst=2, now=0.0)
+    assert bucket.take(0.0) == 0
+    assert bucket.take(0.0) == 0
+    assert bucket.take(0.0) == pytest.approx(0.5)
+    assert bucket.take(0.5) == 0
+
+
+async def test_concurrency_limiter_queue():
+    limiter = ConcurrencyLimiter(concurrency=1, queue_size=1, timeout=5)
+    assert await limiter.acquire() is False
+
+    waiting = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    assert limiter.queued == 1
+    with pytest.raises(Rejected) as error:
+        await limiter.acquire()
+    assert error.value.status_code == 503
+
+    # Освободившийся слот достаётся ждущему
+    limiter.release()
+    assert await waiting is True
+    assert limiter.active == 1
+    limiter.release()
+    assert limiter.active == 0
+
+
+async def test_concurrency_limiter_timeout():
+    limiter = ConcurrencyLimiter(concurrency=1, queue_size=4, timeout=0.01)
+    await limiter.acquire()
+    with pytest.raises(Rejected):
+        await limiter.acquire()
+    assert limiter.queued == 0
+
+
+def test_rate_limited_request(client, setup_test_data, monkeypatch):
+    monkeypatch.setitem(
+        admission.classes,
+        "heavy",
+        EndpointClass("heavy", concurrency=1, queue=0, rate=0.1, burst=1, timeout=1),
+    )
+    assert client.get("/beastiary/dangerous?min=50").status_code == 200
+    response = client.get("/beastiary/dangerous?min=50")
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+    # Дешёвые маршруты этим не затронуты
+    assert client.get("/beastiary/info/Йог-Сотот").status_code == 200
+
+    stats = client.get("/beastiary/stats/admission").json()["Классы"]
+    heavy = next(s for s in stats if s["Класс"] == "heavy")
+    assert heavy["Принято"] == 1
+    assert heavy["Отклонено_лимитом_частоты"] == 1
+    assert heavy["Выполняется"] == 0
+
+
+def test_batch_is_rate_limited_like_direct_calls(client, setup_test_data, monkeypatch):
+    monkeypatch.setitem(
+        admission.classes,
+        "heavy",
+        EndpointClass("heavy", concurrency=4, queue=4, rate=0.1, burst=2, timeout=1),
+    )
+    body = {"requests": [{"path": f"/beastiary/dangerous?min={n}"} for n in (50, 60, 70)]}
+    response = client.post("/beastiary/batch", json=body)
+    # Три тяжёлых подзапроса - три токена 'heavy', как три прямых вызова
+    statuses = sorted(r["Статус"] for r in response.json()["Результаты"])
+    assert statuses == [200, 200, 429]
+    assert client.get("/beastiary/dangerous?min=50").status_code == 429
+    heavy = admission.classes["heavy"]
+    assert heavy.admitted == 2
+    assert heavy.rejected_rate == 2
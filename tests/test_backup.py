@@ -0,0 +1,116 @@
+import os
+import sqlite3
+import threading
+from fastapi.testclient import TestClient
+from services.backup import backup_file, backups, list_backups
+
+
+def _count(path):
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute("SELECT count(*) FROM creatures").fetchone()[0]
+    finally:
+        connection.close()
+
+
+def test_backup_to_directory_keeps_latest(
+    client: TestClient, setup_test_data, tmp_path, monkeypatch
+):
+    directory = str(tmp_path / "backups")
+    monkeypatch.setattr(backups, "directory", directory)
+    monkeypatch.setattr(backups, "keep", 2)
+
+    names = []
+    for _ in range(3):
+        response = client.post("/beastiary/backup")
+        assert response.status_code == 201
+        names.append(response.json()["Файл"])
+    assert response.json()["Удалено"] == [names[0]]
+    assert list_backups(directory) == names[1:]
+    assert _count(os.path.join(directory, names[-1])) == 3
+
+
+def test_backup_download(client: TestClient, setup_test_data, tmp_path):
+    response = client.get("/beastiary/backup")
+    assert response.status_code == 200
+    assert response.content.startswith(b"SQLite format 3\x00")
+    path = tmp_path / "downloaded.db"
+    path.write_bytes(response.content)
+    assert _count(str(path)) == 3
+
+
+def test_backup_is_consistent_while_writing(setup_test_data, tmp_path):
+    source = "test_beastiary.db"
+
+    def write():
+        connection = sqlite3.connect(source, timeout=5)
+        columns = [
+            row[1]
+            for row in connection.execute("PRAGMA table_info(creatures)")
+            if row[1] not in ("id", "name")
+        ]
+        names = ", ".join(columns)
+        for i in range(20):
+            # Копия первого существа под новым именем
+            connection.execute(
+                f"INSERT INTO creatures (name, {names}) "
+                f"SELECT ?, {names} FROM creatures WHERE id = 1",
+                (f"Тварь {i}",),
+            )
+            connection.commit()
+        connection.close()
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    target = str(tmp_path / "copy.db")
+    info = backup_file(source, target, pages=1, sleep=0.001)
+    writer.join()
+
+    assert info["Шагов"] >= info["Страниц"] > 1
+    assert 3 <= _count(target) <= 23
+    connection = sqlite3.connect(target)
+    assert connection.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+    connection.close()
+
+
+def test_backup_falls_back_to_one_step_under_steady_writes(
+    setup_test_data, tmp_path, caplog
+):
+    source = "test_beastiary.db"
+    stop = threading.Event()
+
+    def write():
+        connection = sqlite3.connect(source, timeout=5)
+        columns = [
+            row[1]
+            for row in connection.execute("PRAGMA table_info(creatures)")
+            if row[1] not in ("id", "name")
+        ]
+        names = ", ".join(columns)
+        while not stop.is_set():
+            # Вставка и удаление: база меняется, но не растёт
+            connection.execute(
+                f"INSERT INTO creatures (name, {names}) "
+                f"SELECT 'Тварь', {names} FROM creatures WHERE id = 1"
+            )
+            connection.commit()
+            connection.execute("DELETE FROM creatures WHERE name = 'Тварь'")
+            connection.commit()
+        connection.close()
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    target = str(tmp_path / "copy.db")
+    try:
+        # Запись между каждыми шагами: пошаговое копирование не закончилось бы
+        info = backup_file(source, target, pages=1, sleep=0.02, max_restarts=2)
+    finally:
+        stop.set()
+        writer.join()
+
+    assert info["Перезапусков"] == 3
+    assert "копируется за один шаг" in caplog.text
+    assert 3 <= _count(target) <= 4
+    connection = sqlite3.connect(target)
+    assert connection.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+    connection.close()
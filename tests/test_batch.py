@@ -0,0 +1,53 @@
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db
+from main import app
+from tests.conftest import test_engine
+
+LANDING = [
+    "/beastiary/stats",
+    "/beastiary/categories",
+    "/beastiary/random?category=Раса",
+    "/beastiary/dangerous?min=90",
+    "/beastiary/list?limit=2",
+    "/beastiary/info/Шуб-Ниггурат",
+]
+
+
+def test_batch_matches_separate_requests(
+    client: TestClient, setup_test_data, monkeypatch
+):
+    # Подзапросы выполняются одновременно: у каждого своя сессия из пула
+    async def _session_per_request():
+        async with AsyncSession(test_engine, expire_on_commit=False) as db:
+            yield db
+
+    monkeypatch.setitem(app.dependency_overrides, get_db, _session_per_request)
+
+    body = {"requests": [{"id": str(i), "path": path} for i, path in enumerate(LANDING)]}
+    response = client.post("/beastiary/batch", json=body)
+    assert response.status_code == 200
+    results = response.json()["Результаты"]
+    assert [r["Id"] for r in results] == [str(i) for i in range(len(LANDING))]
+    for path, result in zip(LANDING, results):
+        expected = client.get(path)
+        assert result["Статус"] == expected.status_code, path
+        assert result["Тело"] == expected.json(), path
+
+
+def test_batch_item_errors_are_per_item(client: TestClient, setup_test_data):
+    response = client.post(
+        "/beastiary/batch",
+        json={
+            "requests": [
+                {"path": "/beastiary/info/Ктулху"},
+                {"path": "/beastiary/list?limit=1000"},
+                {"path": "/beastiary/export"},
+                {"path": "/beastiary/categories"},
+            ]
+        },
+    )
+    assert [r["Статус"] for r in response.json()["Результаты"]] == [404, 422, 400, 200]
+
+    too_many = {"requests": [{"path": "/beastiary/stats"}] * 21}
+    assert client.post("/beastiary/batch", json=too_many).status_code == 400
@@ -1,4 +1,5 @@
 from fastapi.testclient import TestClient
+from models.creature import CreatureDB
 
 
 # Тест для корневого маршрута
@@ -197,3 +198,330 @@ def test_add_update_remove_creature(client: TestClient, db_session):
     response = client.get("/beastiary/info/Ктулху")
     assert response.status_code == 404
     assert response.json()["detail"] == "Существо не найдено в бестиарии!"
+
+
+def test_add_duplicate_and_upsert_creature(client: TestClient, setup_test_data):
+    duplicate = {
+        "name": "Йог-Сотот",
+        "description": "Всё-в-Одном и Один-во-Всём",
+        "danger_level": 99,
+        "habitat": "Везде",
+        "quote": "Йог-Сотот знает врата.",
+        "category": "Внешний Бог",
+        "status": "Вечен",
+    }
+    # Повторное добавление не приводит к ошибке 500
+    response = client.post("/beastiary/add", json=duplicate)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Это существо уже есть в бестиарии!"
+
+    # Upsert заменяет данные существующего существа
+    response = client.put("/beastiary/upsert", json=duplicate)
+    assert response.status_code == 200
+    assert response.json()["Сообщение"] == "Существо сохранено в бестиарии!"
+    data = client.get("/beastiary/info/Йог-Сотот").json()
+    assert data["Уровень_опасности"] == 99
+    assert data["Среда_обитания"] == "Везде"
+
+    # Upsert добавляет новое существо
+    response = client.put("/beastiary/upsert", json={**duplicate, "name": "Азатот"})
+    assert response.status_code == 200
+    assert client.get("/beastiary/info/Азатот").status_code == 200
+
+    # Обновление и удаление несуществующего существа
+    response = client.put("/beastiary/update/Ктулху", json={"danger_level": 50})
+    assert response.status_code == 404
+    response = client.delete("/beastiary/remove/Ктулху")
+    assert response.status_code == 404
+
+
+def test_bulk_update_and_remove(client: TestClient, setup_test_data):
+    # Без фильтров массовая операция запрещена
+    response = client.delete("/beastiary/bulk")
+    assert response.status_code == 400
+
+    # Пробный запуск ничего не меняет
+    response = client.patch(
+        "/beastiary/bulk?category=Внешний Бог&dry_run=true", json={"status": "Спит"}
+    )
+    assert response.status_code == 200
+    assert response.json()["Затронуто"] == 2
+    assert response.json()["Пробный_запуск"] is True
+    assert client.get("/beastiary/info/Йог-Сотот").json()["Статус"] != "Спит"
+
+    response = client.patch(
+        "/beastiary/bulk?category=Внешний Бог", json={"status": "Спит"}
+    )
+    assert response.json()["Затронуто"] == 2
+    assert client.get("/beastiary/info/Шуб-Ниггурат").json()["Статус"] == "Спит"
+
+    response = client.delete("/beastiary/bulk?max_danger=90")
+    assert response.status_code == 200
+    assert response.json()["Затронуто"] == 2
+    assert client.get("/beastiary/info/Глубоководные").status_code == 404
+    assert client.get("/beastiary/info/Йог-Сотот").status_code == 200
+
+
+def test_fuzzy_search(client: TestClient, setup_test_data):
+    # Опечатки и пробел вместо дефиса
+    response = client.get("/beastiary/search?q=Шуб Ниггурат&fuzzy=true")
+    assert response.status_code == 200
+    assert response.json()["Существа"][0]["Имя"] == "Шуб-Ниггурат"
+
+    response = client.get("/beastiary/search?q=Глубокводные&fuzzy=true")
+    assert response.json()["Существа"][0]["Имя"] == "Глубоководные"
+
+    # Индекс обновляется при добавлении и удалении
+    new_creature = {
+        "name": "Ньярлатотеп",
+        "description": "Ползущий Хаос с тысячью ликов",
+        "danger_level": 95,
+        "habitat": "Межпространственные врата",
+        "quote": "Я — голос Азатота.",
+        "category": "Внешний Бог",
+        "status": "Активен",
+    }
+    client.post("/beastiary/add", json=new_creature)
+    response = client.get("/beastiary/search?q=Ньярлатотэп&fuzzy=true")
+    assert response.json()["Существа"][0]["Имя"] == "Ньярлатотеп"
+
+    client.delete("/beastiary/remove/Ньярлатотеп")
+    response = client.get("/beastiary/search?q=Ньярлатотэп&fuzzy=true")
+    assert response.status_code == 404
+
+
+async def test_fuzzy_search_filters_beyond_first_candidates(
+    client: TestClient, db_session
+):
+    # 60 более похожих имён другой категории не вытесняют подходящее по фильтру
+    creatures = [
+        CreatureDB(
+            name=f"Дагон {i:02d}",
+            description="Отражение Отца Дагона",
+            danger_level=10,
+            habitat="Океан",
+            category="Отражение",
+            status="Спит",
+            min_insanity=0,
+        )
+        for i in range(60)
+    ]
+    creatures.append(
+        CreatureDB(
+            name="Дагон Великий Отец",
+            description="Владыка Глубоководных",
+            danger_level=80,
+            habitat="Океан",
+            category="Древний",
+            status="Спит",
+            min_insanity=0,
+        )
+    )
+    db_session.add_all(creatures)
+    await db_session.commit()
+
+    response = client.get("/beastiary/search?q=Дагон&fuzzy=true&category=Древний")
+    assert response.status_code == 200
+    assert [c["Имя"] for c in response.json()["Существа"]] == ["Дагон Великий Отец"]
+    response = client.get("/beastiary/search?q=Дагон&fuzzy=true&min_danger=50")
+    assert [c["Имя"] for c in response.json()["Существа"]] == ["Дагон Великий Отец"]
+    # Без фильтров - не больше 50 самых похожих
+    response = client.get("/beastiary/search?q=Дагон&fuzzy=true")
+    assert len(response.json()["Существа"]) == 50
+
+
+def test_suggest(client: TestClient, setup_test_data):
+    # Регистр кириллицы не важен
+    response = client.get("/beastiary/suggest?q=шу")
+    assert response.status_code == 200
+    assert response.json()["Подсказки"] == ["Шуб-Ниггурат"]
+
+    # Сортировка по опасности учитывает обновления
+    client.put(
+        "/beastiary/upsert",
+        json={
+            "name": "Гхатанотхоа",
+            "description": "Тёмный бог с Му, обращающий в камень",
+            "danger_level": 70,
+            "habitat": "Гора Яддитх-Го",
+            "quote": "Никто не смеет взглянуть на него.",
+            "category": "Древний",
+            "status": "Спит",
+        },
+    )
+    response = client.get("/beastiary/suggest?q=г")
+    assert response.json()["Подсказки"] == ["Глубоководные", "Гхатанотхоа"]
+    response = client.get("/beastiary/suggest?q=г&by=danger")
+    assert response.json()["Подсказки"] == ["Гхатанотхоа", "Глубоководные"]
+    client.put("/beastiary/update/Глубоководные", json={"danger_level": 100})
+    response = client.get("/beastiary/suggest?q=г&by=danger&limit=1")
+    assert response.json()["Подсказки"] == ["Глубоководные"]
+    response = client.get("/beastiary/suggest?q=%D0%B9")  # "й"
+    assert response.json()["Подсказки"] == ["Йог-Сотот"]
+
+    client.delete("/beastiary/remove/Йог-Сотот")
+    assert client.get("/beastiary/suggest?q=йог").json()["Подсказки"] == []
+
+
+def test_search_facets(client: TestClient, setup_test_data):
+    # Без facets=true ключа нет
+    response = client.get("/beastiary/search?min_danger=1")
+    assert "Фасеты" not in response.json()
+
+    response = client.get("/beastiary/search?min_danger=1&facets=true")
+    assert response.status_code == 200
+    facets = response.json()["Фасеты"]
+    assert facets["Категории"] == [
+        {"Имя": "Внешний Бог", "Количество": 2},
+        {"Имя": "Раса", "Количество": 1},
+    ]
+    assert len(facets["Статусы"]) == 3
+    assert facets["Уровни_опасности"] == [
+        {"Имя": "31-40", "Количество": 1},
+        {"Имя": "81-90", "Количество": 1},
+        {"Имя": "91-100", "Количество": 1},
+    ]
+
+    # Фасеты учитывают текущие фильтры
+    response = client.get("/beastiary/search?category=Раса&facets=true")
+    assert response.json()["Фасеты"]["Категории"] == [{"Имя": "Раса", "Количество": 1}]
+
+
+def test_stats_distribution(client: TestClient, setup_test_data):
+    response = client.get("/beastiary/stats/distribution")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["Всего"] == 3
+    danger = data["Уровень_опасности"]
+    assert danger["Минимум"] == 40
+    assert danger["Максимум"] == 100
+    assert danger["Среднее"] == 75.0
+    assert danger["Процентили"]["p50"] == 85
+    assert danger["Гистограмма"] == [
+        {"Диапазон": "40-49", "Количество": 1},
+        {"Диапазон": "80-89", "Количество": 1},
+        {"Диапазон": "100-100", "Количество": 1},
+    ]
+    assert data["Минимальное_безумие"]["Максимум"] == 90
+    assert [c["Имя"] for c in data["По_категориям"]] == ["Внешний Бог", "Раса"]
+
+    # Колонки обновляются при записи
+    client.put("/beastiary/update/Глубоководные", json={"min_insanity": 10})
+    client.delete("/beastiary/remove/Йог-Сотот")
+    data = client.get("/beastiary/stats/distribution").json()
+    assert data["Всего"] == 2
+    assert data["Уровень_опасности"]["Максимум"] == 85
+    assert data["Минимальное_безумие"]["Максимум"] == 10
+
+
+def test_export_columnar(client: TestClient, setup_test_data, tmp_path):
+    from services.columnar_snapshot import SnapshotReader
+
+    response = client.get("/beastiary/export?format=columnar")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.bestiary.columnar"
+    path = tmp_path / "bestiary.bstc"
+    path.write_bytes(response.content)
+
+    with SnapshotReader(str(path)) as snapshot:
+        assert snapshot.num_rows == 3
+        assert list(snapshot.column("danger_level", 0)) == [100, 85, 40]
+        assert snapshot.dictionaries["category"] == ["Внешний Бог", "Раса"]
+        assert list(snapshot.column("category", 0)) == [0, 0, 1]
+        names = snapshot.column("name", 0)
+        assert names[1] == "Шуб-Ниггурат"
+        assert snapshot.column("audio_url", 0)[1] is None
+        assert list(snapshot.values("status"))[2] == "Живые"
+
+
+async def test_name_index_keeps_writes_during_load():
+    from services.name_index import NameIndex
+
+    index = NameIndex()
+
+    class Result:
+        def all(self):
+            return [("Дагон", 10), ("Ктулху", 95)]
+
+    class Session:
+        async def execute(self, query):
+            # Записи, опубликованные, пока загрузка ждёт базу
+            index.add("Гидра", 20)
+            index.remove("Ктулху")
+            return Result()
+
+    await index.load(Session())
+    assert sorted(name for name, _ in index.search("Гидра")) == ["Гидра"]
+    assert index.search("Ктулху") == []
+    assert index.suggest("д") == ["Дагон"]
+
+
+async def test_distribution_keeps_writes_during_load():
+    from services.distribution import CreatureColumns
+
+    columns = CreatureColumns()
+
+    class Result:
+        def all(self):
+            return [("Дагон", "Древний", 10, 0), ("Ктулху", "Древний", 95, 50)]
+
+    class Session:
+        async def execute(self, query):
+            # Записи, опубликованные, пока загрузка ждёт базу
+            columns.upsert("Гидра", "Древний", 20, 5)
+            columns.upsert("Дагон", "Древний", 30, 0)
+            columns.remove("Ктулху")
+            return Result()
+
+    await columns.load(Session())
+    data = columns.distribution()
+    assert data["Всего"] == 2
+    assert data["Уровень_опасности"]["Максимум"] == 30
+    assert data["Минимальное_безумие"]["Максимум"] == 5
+    # До загрузки изменения не копятся
+    columns = CreatureColumns()
+    columns.upsert("Гидра", "Древний", 20, 5)
+    assert len(columns) == 0
+
+
+def test_suggest_by_danger_matches_for_any_prefix():
+    import random
+    from services.name_index import NameIndex, normalize_name
+
+    generator = random.Random(7)
+    index = NameIndex()
+    index.rebuild(
+        (f"{generator.choice('абв')}{generator.choice('абвгд')}-{i}", generator.randint(1, 100))
+        for i in range(300)
+    )
+    assert index.suggest("-") == [] and index.suggest("  ") == []
+    for prefix in ("а", "аб", "в-", "вд-1", "г"):
+        # Обход по опасности (короткий префикс) и куча по диапазону дают одно и то же
+        key = normalize_name(prefix)
+        names = [n for n in index._danger if normalize_name(n).startswith(key)]
+        expected = sorted(names, key=lambda n: (-index._danger[n], normalize_name(n)))
+        assert index.suggest(prefix, limit=5, by="danger") == expected[:5]
+
+
+def test_suggest_by_danger_caps_the_walk():
+    from services.name_index import WALK_FACTOR, NameIndex
+
+    class Counting(list):
+        steps = 0
+
+        def __iter__(self):
+            for entry in super().__iter__():
+                Counting.steps += 1
+                yield entry
+
+    # Подходящих имён много, но все они в самом низу списка по опасности
+    index = NameIndex()
+    index.rebuild(
+        [(f"Азатот {i:03d}", 50 + i % 50) for i in range(800)]
+        + [(f"Ядовитый {i:03d}", i % 40) for i in range(200)]
+    )
+    index._by_danger = Counting(index._by_danger)
+    names = index.suggest("я", limit=10, by="danger")
+    top = (39, 79, 119, 159, 199, 38, 78, 118, 158, 198)
+    assert names == [f"Ядовитый {i:03d}" for i in top]
+    assert Counting.steps <= WALK_FACTOR * 10 * 1000 // 200
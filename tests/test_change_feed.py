@@ -0,0 +1,79 @@
+import asyncio
+import config
+from services.change_feed import ChangeFeed, FeedFull, stream_events
+
+
+async def test_feed_delivers_and_resumes():
+    feed = ChangeFeed(queue_size=8, history_size=3)
+    stream = stream_events(feed, feed.seq)
+
+    # Событие между запросом и первым чтением потока не теряется
+    feed.publish("add", {"Имя": "Ктулху"})
+    message = await anext(stream)
+    assert message.startswith("id: 1\nevent: add\n")
+    assert "Ктулху" in message
+
+    # Возобновление с номера из истории
+    for name in ("Дагон", "Гидра", "Азатот"):
+        feed.publish("update", {"Имя": name})
+    _, backlog = feed.subscribe(since=2)
+    assert [event.seq for event in backlog] == [3, 4]
+
+    # История уже не покрывает разрыв или номера начались заново
+    assert feed.subscribe(since=0)[1] is None
+    assert feed.subscribe(since=100)[1] is None
+    await stream.aclose()
+
+
+async def test_unread_stream_does_not_subscribe():
+    feed = ChangeFeed()
+    stream = stream_events(feed)
+    # Клиент ушёл до начала ответа: генератор так и не прочитан
+    feed.publish("add", {"Имя": "Ктулху"})
+    assert not feed.subscribers
+    await stream.aclose()
+
+    stream = stream_events(feed)
+    task = asyncio.ensure_future(anext(stream))
+    await asyncio.sleep(0)
+    assert len(feed.subscribers) == 1
+    # Отмена ответа (разрыв соединения) снимает подписку
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    assert not feed.subscribers
+
+
+async def test_slow_subscriber_is_evicted():
+    feed = ChangeFeed(queue_size=2, max_subscribers=2)
+    stream = stream_events(feed)
+    fast, _ = feed.subscribe()
+    # Поток подписывается при первом чтении
+    first = asyncio.ensure_future(anext(stream))
+    await asyncio.sleep(0)
+    try:
+        feed.check_capacity()
+        assert False, "ожидался FeedFull"
+    except FeedFull:
+        pass
+    assert await anext(stream_events(feed)) == "event: full\ndata: \n\n"
+
+    slow = next(s for s in feed.subscribers if s is not fast)
+    for seq in range(3):
+        feed.publish("add", {"Id": seq})
+        assert fast.queue.get_nowait().seq == seq + 1
+    assert slow.evicted and not fast.evicted
+    message = await asyncio.wait_for(first, timeout=1)
+    assert message == "event: evicted\ndata: 0\n\n"
+    await stream.aclose()
+    assert slow not in feed.subscribers
+
+
+def test_feed_is_rejected_with_several_workers(client, monkeypatch):
+    # Лента одного воркера не видит записей других
+    monkeypatch.setattr(config, "WORKERS", 2)
+    response = client.get("/beastiary/feed")
+    assert response.status_code == 501
+    assert "/beastiary/changes" in response.json()["detail"]
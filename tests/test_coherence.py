@@ -0,0 +1,78 @@
+import sqlite3
+from sqlalchemy.ext.asyncio import create_async_engine
+from services.changes import dataset_version
+from services.coherence import DataVersionWatcher
+from services.schema import ensure_schema
+from services.tenants import TenantEngines
+
+
+async def test_watcher_detects_write_from_other_process(tmp_path):
+    path = tmp_path / "shared.db"
+    other = sqlite3.connect(path)
+    other.execute("CREATE TABLE change_sequence (id INTEGER PRIMARY KEY, value INTEGER)")
+    other.execute("INSERT INTO change_sequence VALUES (1, 0)")
+    other.execute("CREATE TABLE creature_views (name TEXT, views INTEGER)")
+    other.commit()
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    watcher = DataVersionWatcher(engine)
+    key = str(engine.url)
+    try:
+        assert await watcher.check() is False
+        assert await watcher.check() is False
+
+        # Запись просмотров другим воркером данные существ не меняет
+        other.execute("INSERT INTO creature_views VALUES ('Дагон', 1)")
+        other.commit()
+        assert await watcher.check() is False
+
+        # Запись существ через другое соединение (как из другого воркера)
+        other.execute("UPDATE change_sequence SET value = value + 1")
+        other.commit()
+        version = dataset_version(key)
+        assert await watcher.check() is True
+        assert dataset_version(key) == version + 1
+        assert await watcher.check() is False
+        assert watcher.invalidations == 1
+    finally:
+        await watcher.stop()
+        other.close()
+        await engine.dispose()
+
+
+async def test_watcher_follows_open_tenants(tmp_path):
+    main = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'main.db'}")
+    tenants = TenantEngines(directory=str(tmp_path / "tenants"), create=True)
+    watcher = DataVersionWatcher(main, tenants=tenants)
+    try:
+        await ensure_schema(main)
+        await watcher.check()
+        tenant = await tenants.acquire("miskatonic")
+        tenants.release(tenant)
+        key = str(tenant.engine.url)
+
+        # Только что открытый бестиарий сбрасывает кэши при первом опросе
+        version = dataset_version(key)
+        assert await watcher.check() is True
+        assert dataset_version(key) == version + 1
+        assert await watcher.check() is False
+
+        other = sqlite3.connect(tenant.engine.url.database)
+        other.execute(
+            "INSERT INTO creatures (name, description, danger_level, habitat, "
+            "category, status, min_insanity) "
+            "VALUES ('Дагон', 'Глубоководный', 50, 'Океан', 'Древний', 'Спит', 10)"
+        )
+        other.commit()
+        other.close()
+        assert await watcher.check() is True
+        assert dataset_version(key) == version + 2
+
+        # Закрытый бестиарий больше не опрашивается
+        await tenants.close()
+        assert await watcher.check() is False
+        assert list(watcher._watched) == [watcher.key]
+    finally:
+        await watcher.stop()
+        await tenants.close()
+        await main.dispose()
@@ -0,0 +1,164 @@
+import gzip
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import text
+from main import app
+from services.export_jobs import ExportJobs, export_jobs
+
+
+async def test_export_job_lifecycle(
+    override_get_db, setup_test_data, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(export_jobs, "directory", str(tmp_path))
+    # Фоновая задача должна жить в том же цикле событий, что и тест
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        response = await client.post("/beastiary/export/jobs?format=json")
+        assert response.status_code == 202
+        job_id = response.json()["Id"]
+
+        # Та же версия данных и формат - та же задача
+        response = await client.post("/beastiary/export/jobs?format=json")
+        assert response.status_code == 200
+        assert response.json()["Id"] == job_id
+
+        await export_jobs.get(job_id).task
+        status = (await client.get(f"/beastiary/export/jobs/{job_id}")).json()
+        assert status["Статус"] == "done"
+        assert status["Записано"] == 3
+        # Другой воркер видит задачу по файлу состояния в общем каталоге
+        other = ExportJobs(directory=str(tmp_path))
+        assert other.get(job_id).as_dict() == status
+        assert other.get("../" + job_id) is None
+
+        response = await client.get(f"/beastiary/export/jobs/{job_id}/download")
+        assert response.status_code == 200
+        full = response.content
+        data = json.loads(full)
+        assert data["Всего"] == 3
+        assert [c["Имя"] for c in data["Существа"]][0] == "Йог-Сотот"
+
+        # Докачка с заданной позиции
+        response = await client.get(
+            f"/beastiary/export/jobs/{job_id}/download", headers={"Range": "bytes=10-"}
+        )
+        assert response.status_code == 206
+        assert response.content == full[10:]
+
+        # Сжатый CSV
+        response = await client.post("/beastiary/export/jobs?format=csv&compress=true")
+        job = export_jobs.get(response.json()["Id"])
+        await job.task
+        response = await client.get(f"/beastiary/export/jobs/{job.id}/download")
+        content = gzip.decompress(response.content).decode("utf-8")
+        assert content.startswith("Id,Имя,")
+        assert "Глубоководные" in content
+
+        response = await client.get("/beastiary/export/jobs/unknown")
+        assert response.status_code == 404
+
+
+async def test_export_job_follows_database_changes(
+    override_get_db, setup_test_data, db_session, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(export_jobs, "directory", str(tmp_path))
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        first = (await client.post("/beastiary/export/jobs?format=csv")).json()
+        await export_jobs.get(first["Id"]).task
+
+        # Запись мимо API (другой процесс или скрипт) этот процесс не видит,
+        # но номер изменения в базе растёт - старая задача не переиспользуется
+        await db_session.execute(
+            text("UPDATE creatures SET danger_level = 1 WHERE name = 'Йог-Сотот'")
+        )
+        await db_session.commit()
+        response = await client.post("/beastiary/export/jobs?format=csv")
+        assert response.status_code == 202
+        assert response.json()["Версия_данных"] == first["Версия_данных"] + 1
+        await export_jobs.get(response.json()["Id"]).task
+
+
+async def test_abandoned_export_job_is_not_reused(
+    override_get_db, setup_test_data, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(export_jobs, "directory", str(tmp_path))
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        first = (await client.post("/beastiary/export/jobs?format=json")).json()
+        await export_jobs.get(first["Id"]).task
+        state_path = tmp_path / (first["Id"] + ".job.json")
+        state = json.loads(state_path.read_text(encoding="utf-8"))
+        assert state["pid"] == os.getpid()
+
+        # Воркер-владелец упал посреди задачи
+        dead_pid = subprocess.Popen([sys.executable, "-c", "pass"]).pid
+        os.waitpid(dead_pid, 0)
+        state.update(status="running", pid=dead_pid, path=None)
+        state_path.write_text(json.dumps(state), encoding="utf-8")
+        response = await client.post("/beastiary/export/jobs?format=json")
+        assert response.status_code == 202
+        second = response.json()["Id"]
+        assert second != first["Id"]
+        await export_jobs.get(second).task
+
+        # Живой владелец со свежей отметкой - задача переиспользуется
+        state_path = tmp_path / (second + ".job.json")
+        state = json.loads(state_path.read_text(encoding="utf-8"))
+        state.update(status="running", updated_at=time.time())
+        state_path.write_text(json.dumps(state), encoding="utf-8")
+        response = await client.post("/beastiary/export/jobs?format=json")
+        assert response.status_code == 200
+        assert response.json()["Id"] == second
+
+        # Живой владелец, но давно не отмечался (завис или на другом хосте)
+        state.update(updated_at=time.time() - 3600)
+        state_path.write_text(json.dumps(state), encoding="utf-8")
+        response = await client.post("/beastiary/export/jobs?format=json")
+        assert response.status_code == 202
+        await export_jobs.get(response.json()["Id"]).task
+
+
+def test_abandoned_export_jobs_are_recovered(tmp_path):
+    # Состояние задачи, оставшееся от воркера, упавшего посреди экспорта
+    dead_pid = subprocess.Popen([sys.executable, "-c", "pass"]).pid
+    os.waitpid(dead_pid, 0)
+    job_ids = ["a" * 32, "b" * 32]
+    for job_id in job_ids:
+        state = {
+            "id": job_id,
+            "key": "sqlite+aiosqlite:///beastiary.db",
+            "version": 1,
+            "format": "json",
+            "compress": False,
+            "status": "running",
+            "written": 500,
+            "total": 1000,
+            "size": None,
+            "error": None,
+            "created_at": time.time(),
+            "path": None,
+            "host": socket.gethostname(),
+            "pid": dead_pid,
+            "updated_at": time.time(),
+        }
+        (tmp_path / f"{job_id}.job.json").write_text(json.dumps(state))
+
+    jobs = ExportJobs(directory=str(tmp_path))
+    # При чтении статуса
+    assert jobs.get(job_ids[0]).as_dict()["Статус"] == "failed"
+    stored = json.loads((tmp_path / f"{job_ids[0]}.job.json").read_text())
+    assert stored["status"] == "failed"
+    assert "прервана" in stored["error"]
+    # При запуске воркера
+    assert jobs.recover() == 1
+    assert jobs.get(job_ids[1]).status == "failed"
+    assert jobs.recover() == 0
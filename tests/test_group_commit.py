@@ -0,0 +1,72 @@
+import asyncio
+from httpx import ASGITransport, AsyncClient
+import config
+from main import app
+from services.group_commit import GroupCommitter, group_commit
+
+
+def creature(name: str) -> dict:
+    return {
+        "name": name,
+        "description": "Тварь из тёмных глубин",
+        "danger_level": 40,
+        "habitat": "Океан",
+        "quote": "Иа! Иа!",
+        "category": "Древний",
+        "abilities": ["плавание"],
+        "related_works": ["Тень над Иннсмутом"],
+        "status": "Активен",
+        "min_insanity": 30,
+        "relations": [],
+    }
+
+
+async def test_concurrent_writes_share_one_commit(
+    override_get_db, setup_test_data, monkeypatch
+):
+    monkeypatch.setattr(config, "GROUP_COMMIT", True)
+    monkeypatch.setattr(group_commit, "window", 0.05)
+    batches = group_commit.batches
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        names = ["Глубоководный", "Дагон", "Гидра", "Дагон"]
+        responses = await asyncio.gather(
+            *(client.post("/beastiary/add", json=creature(n)) for n in names),
+            client.put("/beastiary/update/Гидра", json={"danger_level": 70}),
+            client.put("/beastiary/update/Ктулху", json={"danger_level": 70}),
+            client.put("/beastiary/update/Йог-Сотот", json={"danger_level": 99}),
+        )
+        codes = [response.status_code for response in responses]
+        # Второй 'Дагон' - дубликат, 'Ктулху' нет: ошибки только у них
+        assert codes == [200, 200, 200, 400, 200, 404, 200]
+        assert responses[4].json()["Существо"]["Уровень_опасности"] == 70
+        assert responses[6].json()["Существо"]["Уровень_опасности"] == 99
+        assert group_commit.batches == batches + 1
+
+        info = (await client.get("/beastiary/info/Гидра")).json()
+        assert info["Уровень_опасности"] == 70
+        stats = (await client.get("/beastiary/stats/writes")).json()
+        assert stats["Включён"] is True
+        assert stats["Наибольший_размер"] >= 7
+
+
+async def test_failed_write_is_isolated(db_session):
+    engine = db_session.bind
+    committer = GroupCommitter(window=0.01)
+
+    async def ok(session, value):
+        return value
+
+    async def broken(session):
+        raise RuntimeError("сломано")
+
+    results = await asyncio.gather(
+        committer.submit(engine, ok, 1),
+        committer.submit(engine, broken),
+        committer.submit(engine, ok, 3),
+        return_exceptions=True,
+    )
+    assert results[0] == 1 and results[2] == 3
+    assert isinstance(results[1], RuntimeError)
+    assert committer.stats()["Повторено_по_одной"] == 1
@@ -0,0 +1,26 @@
+import asyncio
+import logging
+import time
+from services.loop_monitor import LoopLagMonitor
+
+
+def _block_loop():
+    time.sleep(0.15)
+
+
+async def test_blocking_code_is_measured_and_logged(caplog):
+    monitor = LoopLagMonitor(interval=0.01, threshold=0.05, window=100)
+    monitor.start()
+    try:
+        await asyncio.sleep(0.05)
+        with caplog.at_level(logging.WARNING, logger="services.loop_monitor"):
+            _block_loop()
+            await asyncio.sleep(0.05)
+    finally:
+        await monitor.stop()
+
+    stats = monitor.stats()
+    assert stats["Максимальная_мс"] >= 100
+    assert stats["p50_мс"] < 50
+    assert stats["Блокировок"] == 1
+    assert "_block_loop" in caplog.text
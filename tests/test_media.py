@@ -0,0 +1,209 @@
+import struct
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from httpx import ASGITransport, AsyncClient
+from main import app
+from services.media import (
+    MediaPrefetcher,
+    image_size,
+    is_public_address,
+    media_prefetcher,
+)
+
+
+def _png(width: int, height: int) -> bytes:
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return (
+            struct.pack(">I", len(data))
+            + kind
+            + data
+            + struct.pack(">I", zlib.crc32(kind + data))
+        )
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    rows = b"".join(b"\0" + b"\0\0\0" * width for _ in range(height))
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(rows))
+        + chunk(b"IEND", b"")
+    )
+
+
+RESOURCES = {
+    "/image.png": ("image/png", _png(40, 30)),
+    "/audio.mp3": ("audio/mpeg", b"ID3" + b"\0" * 997),
+}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    requests = 0
+
+    def do_GET(self):
+        StubHandler.requests += 1
+        if self.path not in RESOURCES:
+            self.send_error(404)
+            return
+        content_type, body = RESOURCES[self.path]
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_image_size():
+    assert image_size(_png(40, 30)) == (40, 30)
+    assert image_size(b"GIF89a" + struct.pack("<HH", 7, 9)) == (7, 9)
+    jpeg = (
+        b"\xff\xd8"
+        + b"\xff\xe0\x00\x04\x00\x00"
+        + b"\xff\xc0\x00\x11\x08"
+        + struct.pack(">HH", 480, 640)
+        + b"\x03" + b"\0" * 9
+    )
+    assert image_size(jpeg) == (640, 480)
+    assert image_size(b"not an image") is None
+
+
+async def test_prefetcher_probes_and_caches(stub_server, tmp_path):
+    # Заглушка слушает 127.0.0.1: частные адреса разрешены явно
+    prefetcher = MediaPrefetcher(
+        directory=str(tmp_path), concurrency=2, ttl=60, allow_private=True
+    )
+    await prefetcher.start()
+    try:
+        image = await prefetcher.refresh(f"{stub_server}/image.png")
+        assert image["ok"] is True
+        assert image["content_type"] == "image/png"
+        assert image["size"] == len(RESOURCES["/image.png"][1])
+        assert (image["width"], image["height"]) == (40, 30)
+
+        audio = await prefetcher.refresh(f"{stub_server}/audio.mp3")
+        assert (audio["status"], audio["size"]) == (200, 1000)
+        assert audio["width"] is None
+
+        missing = await prefetcher.refresh(f"{stub_server}/missing.ogg")
+        assert (missing["ok"], missing["status"]) == (False, 404)
+
+        unreachable = await prefetcher.refresh("http://127.0.0.1:9/none.png")
+        assert unreachable["status"] is None
+        assert unreachable["error"]
+    finally:
+        await prefetcher.stop()
+
+    # Новый экземпляр читает результаты с диска и не ходит в сеть
+    requests = StubHandler.requests
+    reloaded = MediaPrefetcher(directory=str(tmp_path), ttl=60)
+    assert reloaded.get(f"{stub_server}/image.png")["width"] == 40
+    assert StubHandler.requests == requests
+
+    # Устаревшая запись возвращается, но ставится в очередь на проверку
+    expired = MediaPrefetcher(directory=str(tmp_path), ttl=0)
+    await expired.start()
+    try:
+        assert expired.get(f"{stub_server}/image.png")["ok"] is True
+        assert f"{stub_server}/image.png" in expired._pending
+    finally:
+        await expired.stop()
+
+
+def test_is_public_address():
+    assert is_public_address("93.184.216.34")
+    assert is_public_address("2606:2800:220:1:248:1893:25c8:1946")
+    for address in (
+        "127.0.0.1",
+        "10.1.2.3",
+        "192.168.0.1",
+        "169.254.169.254",
+        "100.64.0.1",
+        "0.0.0.0",
+        "::1",
+        "fe80::1%eth0",
+        "::ffff:127.0.0.1",
+    ):
+        assert not is_public_address(address), address
+
+
+async def test_private_addresses_are_not_fetched(stub_server, tmp_path):
+    prefetcher = MediaPrefetcher(directory=str(tmp_path))
+    await prefetcher.start()
+    try:
+        requests = StubHandler.requests
+        for url in (f"{stub_server}/image.png", "http://localhost:9/x.png"):
+            entry = await prefetcher.refresh(url)
+            assert entry["status"] is None and "не публичный" in entry["error"], url
+        assert StubHandler.requests == requests
+
+        entry = await prefetcher.refresh("file:///etc/passwd")
+        assert entry["error"] == "Схема адреса не поддерживается"
+    finally:
+        await prefetcher.stop()
+
+    # Отсутствие записи на диске запоминается: файл не открывается повторно
+    fresh = MediaPrefetcher(directory=str(tmp_path / "empty"))
+    assert fresh.get("https://example.com/a.png") is None
+    assert "https://example.com/a.png" in fresh._missing
+
+
+async def test_info_with_media(
+    override_get_db, setup_test_data, stub_server, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(media_prefetcher, "directory", str(tmp_path))
+    monkeypatch.setattr(media_prefetcher, "entries", {})
+    monkeypatch.setattr(media_prefetcher, "_missing", set())
+    monkeypatch.setattr(media_prefetcher, "allow_private", True)
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        await client.put(
+            "/beastiary/update/Глубоководные",
+            json={
+                "image_url": f"{stub_server}/image.png",
+                "audio_url": f"{stub_server}/audio.mp3",
+            },
+        )
+        response = await client.get("/beastiary/info/Глубоководные")
+        assert "Медиа" not in response.json()
+
+        # Подсистема не запущена: адреса ещё не проверены
+        media = (await client.get("/beastiary/info/Глубоководные?media=true")).json()[
+            "Медиа"
+        ]
+        assert media["Изображение"] == {
+            "Url": f"{stub_server}/image.png",
+            "Проверено": None,
+        }
+
+        await media_prefetcher.start()
+        try:
+            await media_prefetcher.refresh(f"{stub_server}/image.png")
+            await media_prefetcher.refresh(f"{stub_server}/audio.mp3")
+        finally:
+            await media_prefetcher.stop()
+
+        media = (await client.get("/beastiary/info/Глубоководные?media=true")).json()[
+            "Медиа"
+        ]
+        assert media["Изображение"]["Доступен"] is True
+        assert (media["Изображение"]["Ширина"], media["Изображение"]["Высота"]) == (
+            40,
+            30,
+        )
+        assert media["Аудио"]["Тип"] == "audio/mpeg"
+        assert "Видео" in media
@@ -0,0 +1,137 @@
+import sqlite3
+import config
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import create_async_engine
+from models.creature import CreatureDB
+from routers import beastiary, beastiary_memory
+from services.memory_store import MemoryServing, build_store, memory_serving
+from services.schema import ensure_schema
+
+
+async def test_memory_routes_match_database(
+    client, db_session, setup_test_data, monkeypatch
+):
+    store = await build_store(db_session.bind, beastiary.serialize_creature)
+    assert len(store) == 3
+    monkeypatch.setattr(memory_serving, "store", store)
+
+    memory_app = FastAPI()
+    memory_app.include_router(beastiary_memory.router, prefix="/beastiary")
+    memory_client = TestClient(memory_app)
+
+    for url in [
+        "/beastiary/list?limit=2&offset=1",
+        "/beastiary/list?offset=10",
+        "/beastiary/info/Шуб-Ниггурат",
+        "/beastiary/info/Ктулху",
+        "/beastiary/search?q=Йог",
+        # Регистр кириллицы не важен в обоих режимах
+        "/beastiary/search?q=шуб",
+        "/beastiary/search?q=ЙОГ-с",
+        "/beastiary/search?q=%25",
+        "/beastiary/search?category=Внешний Бог&min_danger=90&facets=true",
+        "/beastiary/search?q=Шуб Нигурат&fuzzy=true",
+        "/beastiary/search?max_danger=10",
+        "/beastiary/suggest?q=Ш",
+        "/beastiary/category/Раса",
+        "/beastiary/category/Монстр",
+        "/beastiary/categories",
+        "/beastiary/dangerous?min=50&max=90",
+        "/beastiary/random?category=Монстр",
+        "/beastiary/stats",
+    ]:
+        expected = client.get(url)
+        response = memory_client.get(url)
+        assert response.status_code == expected.status_code, url
+        assert response.json() == expected.json(), url
+
+    assert memory_client.get("/beastiary/list").json()["Всего"] == 3
+    response = memory_client.get("/beastiary/random?category=Раса")
+    assert response.json()["Существо"]["Имя"] == "Глубоководные"
+
+
+async def test_memory_fuzzy_search_filters_beyond_first_candidates(
+    db_session, monkeypatch
+):
+    # 60 более похожих имён другой категории не вытесняют подходящее по фильтру
+    creatures = [
+        CreatureDB(
+            name=f"Дагон {i:02d}",
+            description="Отражение Отца Дагона",
+            danger_level=10,
+            habitat="Океан",
+            category="Отражение",
+            status="Спит",
+            min_insanity=0,
+        )
+        for i in range(60)
+    ]
+    creatures.append(
+        CreatureDB(
+            name="Дагон Великий Отец",
+            description="Владыка Глубоководных",
+            danger_level=80,
+            habitat="Океан",
+            category="Древний",
+            status="Спит",
+            min_insanity=0,
+        )
+    )
+    db_session.add_all(creatures)
+    await db_session.commit()
+    store = await build_store(db_session.bind, beastiary.serialize_creature)
+    monkeypatch.setattr(memory_serving, "store", store)
+    memory_app = FastAPI()
+    memory_app.include_router(beastiary_memory.router, prefix="/beastiary")
+    memory_client = TestClient(memory_app)
+
+    ranked = [name for name, _ in store.name_index.search("Дагон", limit=50)]
+    assert "Дагон Великий Отец" not in ranked
+    for url in [
+        "/beastiary/search?q=Дагон&fuzzy=true&category=Древний",
+        "/beastiary/search?q=Дагон&fuzzy=true&min_danger=50",
+    ]:
+        response = memory_client.get(url)
+        assert response.status_code == 200, url
+        assert [c["Имя"] for c in response.json()["Существа"]] == [
+            "Дагон Великий Отец"
+        ], url
+    response = memory_client.get("/beastiary/search?q=Дагон&fuzzy=true")
+    assert len(response.json()["Существа"]) == 50
+
+
+def test_read_only_rejects_writes(client, monkeypatch):
+    monkeypatch.setattr(config, "READ_ONLY", True)
+    response = client.delete("/beastiary/remove/Йог-Сотот")
+    assert response.status_code == 403
+    assert response.json()["detail"] == "Бестиарий открыт только для чтения"
+
+
+async def test_view_writes_do_not_reload_store(tmp_path):
+    path = tmp_path / "memory.db"
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    serving = MemoryServing()
+    other = None
+    try:
+        await ensure_schema(engine)
+        await serving.start(engine, beastiary.serialize_creature, snapshot_path=None)
+        other = sqlite3.connect(path)
+        other.execute(
+            "INSERT INTO creature_views (name, bucket, views) VALUES ('Дагон', 0, 1)"
+        )
+        other.commit()
+        assert await serving._changed() is False
+
+        other.execute(
+            "INSERT INTO creatures (name, description, danger_level, habitat, "
+            "category, status, min_insanity) "
+            "VALUES ('Дагон', 'Глубоководный', 50, 'Океан', 'Древний', 'Спит', 10)"
+        )
+        other.commit()
+        assert await serving._changed() is True
+    finally:
+        if other is not None:
+            other.close()
+        await serving.stop()
+        await engine.dispose()
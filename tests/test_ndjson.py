@@ -0,0 +1,68 @@
+import json
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from routers import beastiary, beastiary_memory
+from services.memory_store import build_store, memory_serving
+from services.ndjson import wants_ndjson
+
+NDJSON = {"Accept": "application/x-ndjson"}
+# URL -> ключ списка существ в обычном JSON-ответе
+CASES = {
+    "/beastiary/list?limit=2&offset=1": "Существа",
+    "/beastiary/search?category=Внешний Бог": "Существа",
+    "/beastiary/search?q=Шуб Нигурат&fuzzy=true": "Существа",
+    "/beastiary/category/Раса": "Существа",
+    "/beastiary/dangerous?min=50": "Опасные_существа",
+}
+
+
+def _lines(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_wants_ndjson():
+    assert wants_ndjson("application/json, application/x-ndjson;q=0.9")
+    assert not wants_ndjson("application/json")
+    assert not wants_ndjson(None)
+
+
+def _check_streams(client: TestClient):
+    for url, key in CASES.items():
+        expected = client.get(url).json()[key]
+        response = client.get(url, headers=NDJSON)
+        assert response.status_code == 200, url
+        assert response.headers["content-type"] == "application/x-ndjson", url
+        assert _lines(response) == expected, url
+
+    response = client.get("/beastiary/list?limit=1", headers=NDJSON)
+    assert response.headers["x-total-count"] == "3"
+    assert client.get("/beastiary/search?q=Нет", headers=NDJSON).status_code == 404
+    assert client.get("/beastiary/category/Нет", headers=NDJSON).status_code == 404
+    empty = client.get("/beastiary/dangerous?min=50&max=60", headers=NDJSON)
+    assert empty.status_code == 200 and empty.text == ""
+
+
+def test_database_routes_stream_ndjson(client: TestClient, setup_test_data):
+    _check_streams(client)
+
+    export = client.get("/beastiary/export?format=json", headers=NDJSON)
+    assert (
+        _lines(export)
+        == client.get("/beastiary/export?format=json").json()["Существа"]
+    )
+
+
+async def test_memory_routes_stream_ndjson(
+    client, db_session, setup_test_data, monkeypatch
+):
+    store = await build_store(db_session.bind, beastiary.serialize_creature)
+    monkeypatch.setattr(memory_serving, "store", store)
+
+    memory_app = FastAPI()
+    memory_app.include_router(beastiary_memory.router, prefix="/beastiary")
+    memory_client = TestClient(memory_app)
+    _check_streams(memory_client)
+    for url in CASES:
+        assert _lines(memory_client.get(url, headers=NDJSON)) == _lines(
+            client.get(url, headers=NDJSON)
+        ), url
@@ -0,0 +1,26 @@
+import json
+import pytest
+from fastapi.testclient import TestClient
+from services.offload import offload
+
+
+@pytest.mark.parametrize("mode", ["inline", "thread", "process"])
+def test_export_is_same_in_every_mode(
+    client: TestClient, setup_test_data, monkeypatch, mode
+):
+    monkeypatch.setattr(offload, "mode", mode)
+    try:
+        exported = client.get("/beastiary/export?format=json")
+        csv_text = client.get("/beastiary/export?format=csv").text
+    finally:
+        offload.shutdown()
+
+    # Те же байты, что отдавал JSONResponse
+    data = exported.json()
+    assert exported.content == json.dumps(
+        data, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+    assert data["Всего"] == data["Лимит"] == len(data["Существа"]) == 3
+    lines = csv_text.splitlines()
+    assert lines[0].startswith("Id,Имя,")
+    assert len(lines) == 4
@@ -0,0 +1,57 @@
+import time
+import pytest
+import config
+from fastapi.testclient import TestClient
+from services.popularity import view_counters, window_seconds
+
+
+def test_window_seconds():
+    assert window_seconds("24h") == 86400
+    assert window_seconds("7d") == 7 * 86400
+    assert window_seconds("all") is None
+    with pytest.raises(ValueError):
+        window_seconds("week")
+
+
+def test_top_counts_views_in_batches(
+    client: TestClient, db_session, setup_test_data
+):
+    for name in ["Йог-Сотот"] * 3 + ["Шуб-Ниггурат"]:
+        assert client.get(f"/beastiary/info/{name}").status_code == 200
+    client.get("/beastiary/info/Ктулху")  # 404 не считается
+    assert view_counters.stats()["В_памяти"] == 2
+
+    top = client.get("/beastiary/top?window=24h").json()
+    assert top["Существа"] == [
+        {"Имя": "Йог-Сотот", "Просмотры": 3},
+        {"Имя": "Шуб-Ниггурат", "Просмотры": 1},
+    ]
+    # Просмотры записаны одной пачкой: строка на существо и интервал
+    assert view_counters.stats()["В_памяти"] == 0
+
+    # Старые просмотры видны только в широком окне и складываются с новыми
+    ten_days_ago = time.time() - 10 * 86400
+    for _ in range(5):
+        view_counters.record(db_session.bind, "Шуб-Ниггурат", now=ten_days_ago)
+    assert client.get("/beastiary/top?window=7d&limit=1").json()["Существа"] == [
+        {"Имя": "Йог-Сотот", "Просмотры": 3}
+    ]
+    assert client.get("/beastiary/top?window=all&limit=1").json()["Существа"] == [
+        {"Имя": "Шуб-Ниггурат", "Просмотры": 6}
+    ]
+
+    # Удалённые существа выпадают из рейтинга
+    client.delete("/beastiary/remove/Шуб-Ниггурат")
+    names = [c["Имя"] for c in client.get("/beastiary/top?window=all").json()["Существа"]]
+    assert names == ["Йог-Сотот"]
+    assert client.get("/beastiary/top?window=week").status_code == 422
+
+
+async def test_read_only_does_not_count_views(db_session, monkeypatch):
+    monkeypatch.setattr(config, "READ_ONLY", True)
+    view_counters.record_view({}, db_session.bind, "Йог-Сотот")
+    assert view_counters.stats()["В_памяти"] == 0
+    # Накопленное до включения режима тоже не записывается
+    view_counters.record(db_session.bind, "Йог-Сотот")
+    assert await view_counters.flush() == 0
+    assert view_counters.stats()["В_памяти"] == 1
@@ -0,0 +1,44 @@
+import config
+from fastapi.testclient import TestClient
+from services.serialization import normalize_url
+
+
+def test_normalize_url():
+    assert normalize_url("https://example.com") == "https://example.com/"
+    assert normalize_url("not a url") == "not a url"
+
+
+def test_trusted_responses_match_validated(
+    client: TestClient, setup_test_data, monkeypatch
+):
+    client.put(
+        "/beastiary/update/Глубоководные",
+        json={"image_url": "https://example.com", "audio_url": "http://Example.com/a b"},
+    )
+    urls = [
+        "/beastiary/list?limit=100",
+        "/beastiary/info/Глубоководные",
+        "/beastiary/info/Глубоководные?media=true",
+        "/beastiary/search?category=Раса&facets=true",
+        "/beastiary/search?q=Йог",
+        "/beastiary/category/Внешний Бог",
+        "/beastiary/dangerous?min=30",
+        "/beastiary/random?category=Раса",
+    ]
+    trusted = [client.get(url) for url in urls]
+    monkeypatch.setattr(config, "VALIDATE_RESPONSES", True)
+    validated = [client.get(url) for url in urls]
+    for url, fast, checked in zip(urls, trusted, validated):
+        assert fast.status_code == checked.status_code == 200, url
+        assert fast.content == checked.content, url
+
+    creature = trusted[1].json()
+    assert creature["Url_изображения"] == "https://example.com/"
+
+
+def test_openapi_keeps_response_models(client: TestClient):
+    paths = client.get("/openapi.json").json()["paths"]
+    schema = paths["/beastiary/list"]["get"]["responses"]["200"]["content"][
+        "application/json"
+    ]["schema"]
+    assert schema == {"$ref": "#/components/schemas/ListBestiaryResponse"}
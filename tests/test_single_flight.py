@@ -0,0 +1,128 @@
+import asyncio
+from httpx import ASGITransport, AsyncClient
+from services.changes import invalidate
+from services.single_flight import SingleFlight, SingleFlightMiddleware, on_shared
+
+
+def _stub_app(statuses):
+    """ASGI-приложение, которое ждёт gate и отвечает кодами из statuses по очереди."""
+    gate = asyncio.Event()
+    calls = []
+
+    async def app(scope, receive, send):
+        calls.append(scope["path"])
+        number = len(calls)
+        await gate.wait()
+        status = statuses[min(number, len(statuses)) - 1]
+        body = f'{{"call": {number}}}'.encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [(b"content-type", b"application/json")],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+    return app, gate, calls
+
+
+async def _gather(app, urls):
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        return await asyncio.gather(*(client.get(url) for url in urls))
+
+
+async def test_identical_requests_share_one_execution():
+    app, gate, calls = _stub_app([200])
+    state = SingleFlight()
+    middleware = SingleFlightMiddleware(app, state)
+
+    async def release():
+        await asyncio.sleep(0.05)
+        gate.set()
+
+    responses, _ = await asyncio.gather(
+        _gather(
+            middleware,
+            ["/beastiary/stats"] * 5 + ["/beastiary/list?offset=0&limit=5"] * 2,
+        ),
+        release(),
+    )
+    assert len(calls) == 2
+    assert {r.json()["call"] for r in responses[:5]} == {1}
+    assert state.stats() == {
+        "Выполнено": 2,
+        "Объединено": 5,
+        "Выполнено_повторно": 0,
+        "В_процессе": 0,
+    }
+
+    # Случайное существо и запись не объединяются
+    await _gather(middleware, ["/beastiary/random"] * 2)
+    assert len(calls) == 4
+    # Экспорт идёт потоком: ждущие не должны ждать, пока ведущий дочитает всё
+    await _gather(middleware, ["/beastiary/export?format=json"] * 2)
+    assert len(calls) == 6
+
+
+async def test_new_data_version_starts_new_execution():
+    app, gate, calls = _stub_app([200])
+    middleware = SingleFlightMiddleware(app, SingleFlight())
+
+    async def write_then_release():
+        await asyncio.sleep(0.02)
+        invalidate("sqlite+aiosqlite:///other.db")
+        late = asyncio.ensure_future(_gather(middleware, ["/beastiary/stats"]))
+        await asyncio.sleep(0.02)
+        gate.set()
+        return await late
+
+    first, late = await asyncio.gather(
+        _gather(middleware, ["/beastiary/stats"] * 2), write_then_release()
+    )
+    assert len(calls) == 2
+    assert late[0].json()["call"] == 2
+
+
+async def test_rejected_response_is_not_shared():
+    app, gate, calls = _stub_app([429, 200, 200])
+    state = SingleFlight()
+    middleware = SingleFlightMiddleware(app, state)
+
+    async def release():
+        await asyncio.sleep(0.05)
+        gate.set()
+
+    responses, _ = await asyncio.gather(
+        _gather(middleware, ["/beastiary/categories"] * 3), release()
+    )
+    # Отказ допуска получил только ведущий, остальные выполнились сами
+    assert sorted(r.status_code for r in responses) == [200, 200, 429]
+    assert len(calls) == 3
+    assert state.fallbacks == 2
+
+
+async def test_followers_run_share_callbacks():
+    app, gate, calls = _stub_app([200])
+    shared = []
+
+    async def counting_app(scope, receive, send):
+        # Маршрут выполняется один раз, а учёт нужен за каждый запрос
+        on_shared(scope, lambda: shared.append(scope["path"]))
+        await app(scope, receive, send)
+
+    async def release():
+        await asyncio.sleep(0.05)
+        gate.set()
+
+    await asyncio.gather(
+        _gather(
+            SingleFlightMiddleware(counting_app, SingleFlight()),
+            ["/beastiary/info/Дагон"] * 4,
+        ),
+        release(),
+    )
+    assert len(calls) == 1
+    assert len(shared) == 3
@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+from services.schema import SCHEMA_VERSION, ensure_schema, get_schema_version
+from services.startup import readiness, warm_pool
+
+
+async def test_schema_version_check(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'schema.db'}")
+    try:
+        assert await ensure_schema(engine) == "created"
+        assert await ensure_schema(engine) == "current"
+        assert await warm_pool(engine) >= 1
+
+        async with engine.begin() as conn:
+            assert await get_schema_version(conn) == SCHEMA_VERSION
+            await conn.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION + 1}")
+        with pytest.raises(RuntimeError):
+            await ensure_schema(engine)
+    finally:
+        await engine.dispose()
+
+
+async def test_schema_of_unversioned_database(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'old.db'}")
+    try:
+        await ensure_schema(engine)
+        # База, созданная до учёта версий: таблицы есть, user_version = 0
+        async with engine.begin() as conn:
+            await conn.exec_driver_sql("PRAGMA user_version = 0")
+        assert await ensure_schema(engine) == "migrated"
+        assert await ensure_schema(engine) == "current"
+    finally:
+        await engine.dispose()
+
+
+def test_ready_only_when_warm(client, monkeypatch):
+    monkeypatch.setattr(readiness, "ready", False)
+    assert client.get("/ready").status_code == 503
+
+    monkeypatch.setattr(readiness, "ready", True)
+    monkeypatch.setattr(readiness, "time_to_ready", 0.25)
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["Время_до_готовности"] == 0.25
+
+
+def test_health_and_ready_report_pool_and_caches(client):
+    assert client.get("/health").json()["Статус"] == "ok"
+    content = client.get("/ready").json()
+    assert content["Пул"]["Размер"] >= 1
+    assert set(content["Кэши"]) == {
+        "Индекс_имён",
+        "Колонки_статистики",
+        "Хранилище_в_памяти",
+        "Медиа_в_кэше",
+    }
+    assert "p99_мс" in content["Задержка_цикла"]
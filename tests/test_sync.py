@@ -0,0 +1,131 @@
+import json
+import time
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from services.schema import ensure_schema
+from services.sync import HistoryPruned, open_changes, prune_tombstones
+
+
+def read_changes(client: TestClient, since: int = 0):
+    response = client.get(f"/beastiary/changes?since={since}")
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    return int(response.headers["X-Change-Seq"]), lines
+
+
+def test_changes_since(client: TestClient, setup_test_data):
+    latest, lines = read_changes(client)
+    assert latest == 3
+    assert [line["Номер"] for line in lines] == [1, 2, 3]
+    assert {line["Действие"] for line in lines} == {"upsert"}
+    assert lines[0]["Существо"]["Имя"] == "Йог-Сотот"
+
+    new_creature = {
+        "name": "Ктулху",
+        "description": "Великий Древний, спящий в Р'льехе",
+        "danger_level": 95,
+        "habitat": "Океан",
+        "category": "Древний",
+        "status": "Спит",
+        "min_insanity": 80,
+    }
+    assert client.post("/beastiary/add", json=new_creature).status_code == 200
+    client.put("/beastiary/update/Йог-Сотот", json={"danger_level": 99})
+    client.delete("/beastiary/remove/Шуб-Ниггурат")
+
+    # Только изменённое после since, удаление - надгробием
+    latest, lines = read_changes(client, since=3)
+    assert latest == 6
+    assert [(line["Номер"], line["Действие"]) for line in lines] == [
+        (4, "upsert"),
+        (5, "upsert"),
+        (6, "remove"),
+    ]
+    assert lines[1]["Существо"]["Уровень_опасности"] == 99
+    assert lines[2]["Имя"] == "Шуб-Ниггурат"
+    # Первая синхронизация надгробий не получает
+    assert "remove" not in {line["Действие"] for line in read_changes(client)[1]}
+
+    assert read_changes(client, since=6) == (6, [])
+    assert client.get("/beastiary/changes?since=7").status_code == 410
+
+    # Повторно добавленное существо больше не числится удалённым
+    client.post("/beastiary/add", json={**new_creature, "name": "Шуб-Ниггурат"})
+    latest, lines = read_changes(client, since=6)
+    assert [(line["Номер"], line["Действие"]) for line in lines] == [(7, "upsert")]
+
+
+async def test_migration_numbers_existing_rows(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'v2.db'}")
+    try:
+        # Схема версии 2: таблица существ без номеров изменений
+        async with engine.begin() as conn:
+            await conn.exec_driver_sql(
+                "CREATE TABLE creatures (id INTEGER PRIMARY KEY, name VARCHAR(50) "
+                "UNIQUE NOT NULL, description TEXT NOT NULL, danger_level INTEGER "
+                "NOT NULL, habitat VARCHAR(100) NOT NULL, quote VARCHAR(400), "
+                "category VARCHAR(30) NOT NULL, abilities TEXT, related_works TEXT, "
+                "image_url VARCHAR(350), status VARCHAR(30) NOT NULL, min_insanity "
+                "INTEGER NOT NULL, relations TEXT, audio_url VARCHAR(350), "
+                "video_url VARCHAR(350))"
+            )
+            for name in ("Дагон", "Гидра"):
+                await conn.exec_driver_sql(
+                    "INSERT INTO creatures (name, description, danger_level, habitat, "
+                    "category, status, min_insanity) "
+                    f"VALUES ('{name}', 'Глубоководный', 50, 'Океан', 'Древний', 'Спит', 10)"
+                )
+            await conn.exec_driver_sql("PRAGMA user_version = 2")
+
+        assert await ensure_schema(engine) == "migrated"
+        async with engine.begin() as conn:
+            await conn.exec_driver_sql("DELETE FROM creatures WHERE name = 'Дагон'")
+            rows = (
+                await conn.exec_driver_sql(
+                    "SELECT name, change_seq FROM creatures "
+                    "UNION ALL SELECT name, change_seq FROM creature_tombstones "
+                    "ORDER BY change_seq"
+                )
+            ).all()
+        assert rows == [("Гидра", 2), ("Дагон", 3)]
+        async with engine.connect() as conn:
+            pruned = await conn.exec_driver_sql("SELECT pruned_through FROM change_sequence")
+            assert pruned.scalar() == 0
+    finally:
+        await engine.dispose()
+
+
+async def test_pruned_tombstones_require_full_sync(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'sync.db'}")
+    try:
+        await ensure_schema(engine)
+        async with engine.begin() as conn:
+            for name in ("Дагон", "Гидра", "Ктулху"):
+                await conn.exec_driver_sql(
+                    "INSERT INTO creatures (name, description, danger_level, habitat, "
+                    "category, status, min_insanity) "
+                    f"VALUES ('{name}', 'Глубоководный', 50, 'Океан', 'Древний', 'Спит', 10)"
+                )
+            await conn.exec_driver_sql("DELETE FROM creatures WHERE name = 'Дагон'")
+
+        async with AsyncSession(engine) as session:
+            # Надгробие ещё не устарело
+            assert await prune_tombstones(session, retention_days=30) == 0
+            later = time.time() + 31 * 86400
+            assert await prune_tombstones(session, retention_days=30, now=later) == 1
+            await session.commit()
+
+        # Зеркало с номером до удаления пропустило бы его
+        with pytest.raises(HistoryPruned) as error:
+            await open_changes(engine, 2, dict)
+        assert error.value.pruned_through == 4
+
+        # С номера удаления и с нуля синхронизация по-прежнему возможна
+        for since, expected in ((4, []), (0, [2, 3])):
+            latest, lines = await open_changes(engine, since, lambda c: c.name)
+            body = "".join([chunk async for chunk in lines])
+            assert latest == 4
+            assert [json.loads(line)["Номер"] for line in body.splitlines()] == expected
+    finally:
+        await engine.dispose()
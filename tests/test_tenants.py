@@ -0,0 +1,108 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+import database
+import services.tenants
+from main import app
+from services.popularity import view_counters
+from services.tenants import TenantEngines
+
+CREATURE = {
+    "name": "Дагон",
+    "description": "Отец Глубоководных",
+    "danger_level": 70,
+    "habitat": "Океан",
+    "category": "Древний",
+    "status": "Спит",
+}
+
+
+@pytest.fixture
+def tenants(tmp_path, monkeypatch):
+    engines = TenantEngines(str(tmp_path), max_engines=2, create=True)
+    monkeypatch.setattr(database, "tenant_engines", engines)
+    monkeypatch.setattr(services.tenants, "tenant_engines", engines)
+    yield engines
+    asyncio.run(engines.close())
+
+
+def test_tenants_are_separate_files(tenants, tmp_path):
+    client = TestClient(app)
+    greek = {"X-Bestiary-Tenant": "greek"}
+    assert client.post("/beastiary/add", json=CREATURE, headers=greek).status_code == 200
+    assert client.get("/beastiary/info/Дагон", headers=greek).status_code == 200
+    # Тот же бестиарий через префикс пути
+    assert client.get("/tenants/greek/beastiary/info/Дагон").status_code == 200
+    assert client.get("/tenants/norse/beastiary/info/Дагон").status_code == 404
+    assert (tmp_path / "greek.db").exists()
+
+    # Третий бестиарий вытесняет самый давний свободный движок
+    client.get("/beastiary/list", headers={"X-Bestiary-Tenant": "egypt"})
+    assert list(tenants.engines) == ["norse", "egypt"]
+    assert tenants.evicted == 1
+    # После вытеснения бестиарий открывается снова с теми же данными
+    assert client.get("/tenants/greek/beastiary/info/Дагон").status_code == 200
+    assert tenants.opened == 4
+
+
+def test_unknown_and_invalid_tenants(tenants, monkeypatch):
+    client = TestClient(app)
+    monkeypatch.setattr(tenants, "create", False)
+    response = client.get("/beastiary/list", headers={"X-Bestiary-Tenant": "atlantis"})
+    assert response.status_code == 404
+    response = client.get("/beastiary/list", headers={"X-Bestiary-Tenant": "../etc"})
+    assert response.status_code == 400
+
+
+def test_batch_reaches_tenants(tenants):
+    client = TestClient(app)
+    client.post("/beastiary/add", json=CREATURE, headers={"X-Bestiary-Tenant": "greek"})
+    body = {
+        "requests": [
+            {"path": "/tenants/greek/beastiary/info/Дагон"},
+            {"path": "/tenants/norse/beastiary/info/Дагон"},
+            {"path": "/tenants/greek/beastiary/export"},
+        ]
+    }
+    response = client.post("/beastiary/batch", json=body)
+    assert [r["Статус"] for r in response.json()["Результаты"]] == [200, 404, 400]
+
+
+def test_streams_share_the_request_slot(tmp_path, monkeypatch):
+    # Одно место на все бестиарии: своя сессия потока не должна ждать второго
+    engines = TenantEngines(str(tmp_path), max_connections=1, create=True)
+    monkeypatch.setattr(database, "tenant_engines", engines)
+    monkeypatch.setattr(services.tenants, "tenant_engines", engines)
+    try:
+        client = TestClient(app)
+        greek = {"X-Bestiary-Tenant": "greek"}
+        client.post("/beastiary/add", json=CREATURE, headers=greek)
+        response = client.get(
+            "/beastiary/list", headers={**greek, "Accept": "application/x-ndjson"}
+        )
+        assert response.status_code == 200
+        assert client.get("/beastiary/changes?since=0", headers=greek).status_code == 200
+        assert client.get("/beastiary/export?format=csv", headers=greek).status_code == 200
+        # Все места возвращены
+        assert engines.sessions == 0
+        assert client.get("/beastiary/top", headers=greek).status_code == 200
+    finally:
+        asyncio.run(engines.close())
+
+
+def test_view_counters_forget_closed_engines(tenants, monkeypatch):
+    monkeypatch.setattr(view_counters, "flush_interval", 3600)
+    client = TestClient(app)
+    greek = {"X-Bestiary-Tenant": "greek"}
+    client.post("/beastiary/add", json=CREATURE, headers=greek)
+    client.get("/beastiary/info/Дагон", headers=greek)
+    key = str(tenants.engines["greek"].engine.url)
+    assert key in view_counters.binds
+
+    # Вытеснение записывает просмотры и забывает движок
+    client.get("/beastiary/list", headers={"X-Bestiary-Tenant": "norse"})
+    client.get("/beastiary/list", headers={"X-Bestiary-Tenant": "egypt"})
+    assert "greek" not in tenants.engines
+    assert key not in view_counters.binds
+    top = client.get("/beastiary/top?window=all", headers=greek).json()
+    assert top["Существа"][0]["Просмотры"] == 1